@@ -4,7 +4,7 @@ import numpy as np
 
 from .cross_validation_model import CrossValidationModel
 from .cross_validation_predictor import CrossValidationPredictor
-from .cross_validation_preprocessing import PreSplitPreprocessing, PreprocessingOnSplitData
+from .cross_validation_preprocessing import PreSplitPreprocessing, PreprocessingOnSplitData, split_supervised
 from .cross_validation_split import CrossValidationSplit
 
 from me3cs.metrics.regression.metrics import MetricsRegression
@@ -36,6 +36,11 @@ class CrossValidationRegression:
         Metrics to evaluate the performance of the regression model.
     percentage_left_out : float, optional, default=0.1
         The percentage of data to leave out for validation during cross-validation.
+    pre_split_x : np.ndarray or None, optional, default=None
+        The input data with the non-scaling preprocessing methods already applied, e.g. shared between several
+        cross-validations. If None, the methods are applied to x.
+    verbose : bool, optional, default=True
+        Whether the progress of the fitting of the models is printed.
 
     Attributes
     ----------
@@ -55,6 +60,10 @@ class CrossValidationRegression:
         The type of cross-validation to perform.
     cv_metrics : MetricsRegression
         Metrics to evaluate the performance of the regression model.
+    pre_split_x : np.ndarray or None
+        The input data with the non-scaling preprocessing methods already applied, or None.
+    verbose : bool
+        Whether the progress of the fitting of the models is printed.
     results : MetricsRegression or None
         The performance metrics of the fitted model, or None if the model is not yet fitted.
     """
@@ -68,6 +77,8 @@ class CrossValidationRegression:
             cv_type: str,
             cv_metrics: MetricsRegression,
             percentage_left_out: float = 0.1,
+            pre_split_x: [np.ndarray, None] = None,
+            verbose: bool = True,
     ) -> None:
 
         self.x = x
@@ -78,6 +89,8 @@ class CrossValidationRegression:
         self.n_components = n_components
         self.cv_type = cv_type
         self.cv_metrics = cv_metrics
+        self.pre_split_x = pre_split_x
+        self.verbose = verbose
         self.results = None
         self.fit()
 
@@ -93,10 +106,16 @@ class CrossValidationRegression:
             return
 
         x_called, y_called = self.called_preprocessing
+        # Methods fitted to y, and the non-scaling methods after them, are fitted to each fold after the split
+        pre_split_called, fold_called = split_supervised(x_called)
+
         # Preprocess with non scaling methods:
-        partly_preprocessed_x = PreSplitPreprocessing(
-            data=self.x, called=x_called
-        ).data
+        if self.pre_split_x is None:
+            partly_preprocessed_x = PreSplitPreprocessing(
+                data=self.x, called=pre_split_called
+            ).data
+        else:
+            partly_preprocessed_x = self.pre_split_x
 
         # Split data based on the cross-validation type:
         split = CrossValidationSplit(
@@ -108,7 +127,7 @@ class CrossValidationRegression:
 
         # Preprocess split data based on reference data for the training data
         preprocessed_split = PreprocessingOnSplitData(
-            split=split, x_called=x_called, y_called=y_called
+            split=split, x_called=x_called, y_called=y_called, fold_called=fold_called
         )
         test_set = preprocessed_split.test_set
         training_set = preprocessed_split.training_set
@@ -118,6 +137,7 @@ class CrossValidationRegression:
             algorithm=self.algorithm,
             n_components=self.n_components,
             training=training_set,
+            verbose=self.verbose,
         )
 
         # Calculate y_hat for the test sets and x_scores
@@ -19,6 +19,8 @@ class CrossValidationModel:
     training : [tuple[list[np.ndarray, ...]], tuple[list[np.ndarray, ...], list[np.ndarray, ...]]]
         Tuple containing the lists of preprocessed training input data (x_training) and output
         data (y_training).
+    verbose : bool, optional
+        Whether the progress of the fitting is printed, by default True.
 
     Attributes
     ----------
@@ -29,6 +31,8 @@ class CrossValidationModel:
     training : [tuple[list[np.ndarray, ...]], tuple[list[np.ndarray, ...], list[np.ndarray, ...]]]
         Tuple containing the lists of preprocessed training input data (x_training) and output
         data (y_training).
+    verbose : bool
+        Whether the progress of the fitting is printed.
     cv_models : [None, list[..., "TYPING_ALGORITHM_REGRESSION"]]
         List of trained regression models for each fold in cross-validation.
     """
@@ -38,10 +42,12 @@ class CrossValidationModel:
                  training: [
                      tuple[list[np.ndarray, ...]],
                      tuple[list[np.ndarray, ...], list[np.ndarray, ...]],
-                 ]) -> None:
+                 ],
+                 verbose: bool = True) -> None:
         self.algorithm = algorithm
         self.n_components = n_components
         self.training = training
+        self.verbose = verbose
 
         self.cv_models: [None, list[..., "TYPING_ALGORITHM_REGRESSION"]] = None
 
@@ -62,5 +68,5 @@ class CrossValidationModel:
                 x=x_training[i], y=y_training[i], n_components=self.n_components
             )
             for i in range(n_splits)
-            if print(f"Model {i + 1} of {n_splits}") or True
+            if not self.verbose or print(f"Model {i + 1} of {n_splits}") or True
         ]
@@ -44,6 +44,6 @@ class CrossValidationPredictor:
         x_test = self.test_set[0]
         for i, model in enumerate(self.models):
             reg = model.reg
-            predictor_results.append(np.dot(x_test[i], reg))
+            predictor_results.append(x_test[i] @ reg)
 
         self.predictor_results = np.concatenate(predictor_results)
@@ -1,10 +1,12 @@
 import numpy as np
 
 from me3cs.cross_validation.cross_validation_split import CrossValidationSplit
+from me3cs.framework.data import Data, Index
 from me3cs.misc.handle_data import transform_array_1d_to_2d
 from me3cs.preprocessing.called import Called
 from me3cs.preprocessing.filtering import Filtering
 from me3cs.preprocessing.normalisation import Normalisation
+from me3cs.preprocessing.plan import SUPERVISED_METHODS, compile_plan
 from me3cs.preprocessing.scaling import Scaling
 from me3cs.preprocessing.standardisation import Standardisation
 
@@ -19,9 +21,14 @@ class PreSplitPreprocessing(Normalisation, Filtering, Standardisation):
         The input data to preprocess.
     called : Called
         The preprocessing methods to apply on the data.
+    response : np.ndarray or None, optional
+        The reference data, which methods such as osc are fitted to, by default None.
     """
-    def __init__(self, data: np.ndarray, called: Called) -> None:
+    def __init__(self, data: np.ndarray, called: Called, response: [np.ndarray, None] = None) -> None:
         super(PreSplitPreprocessing, self).__init__(transform_array_1d_to_2d(data))
+        if response is not None:
+            response = transform_array_1d_to_2d(response)
+            self.response = Data(response, Index(response.shape[0]), Index(response.shape[1]))
         self.called = called
         self.call_in_order()
 
@@ -29,12 +36,34 @@ class PreSplitPreprocessing(Normalisation, Filtering, Standardisation):
         """
         Applies the preprocessing methods in the order specified by the called attribute.
         """
-        for function, args, kwargs in zip(
-                self.called.function, self.called.args, self.called.kwargs
-        ):
-            prep_type, function_string = function.__qualname__.split(".")
-            if prep_type in ["Normalisation", "Filtering", "Standardisation"]:
-                function(self, *args, **kwargs)
+        compile_plan(self.called, include=("Normalisation", "Filtering", "Standardisation")).execute(self)
+
+
+def split_supervised(called: Called) -> tuple[Called, Called]:
+    """
+    Split the called preprocessing methods at the first method fitted to the reference data, e.g. osc. The methods
+    before it are applied before the cross-validation split. It and the following non-scaling methods are fitted to
+    the training set of each fold, see apply_supervised_on_split_data, since fitting them to all samples would leak the
+    reference data of the test sets into the training sets.
+
+    Parameters
+    ----------
+    called : Called
+        The preprocessing methods.
+
+    Returns
+    -------
+    tuple[Called, Called]
+        The methods applied before the split, and the non-scaling methods fitted to each fold.
+    """
+    names = [function.__name__ for function in called.function]
+    first = next((i for i, name in enumerate(names) if name in SUPERVISED_METHODS), len(names))
+    per_fold = [i for i in range(first, len(names)) if called.function[i].__qualname__.split(".")[0] != "Scaling"]
+
+    pre_split = Called(called.function[:first], called.args[:first], called.kwargs[:first])
+    fold = Called([called.function[i] for i in per_fold], [called.args[i] for i in per_fold],
+                  [called.kwargs[i] for i in per_fold])
+    return pre_split, fold
 
 
 class PostSplitPreprocessing(Scaling):
@@ -79,6 +108,8 @@ class PreprocessingOnSplitData:
         The preprocessing methods to apply on the input feature matrix.
     y_called : [None, Called], optional, default=None
         The preprocessing methods to apply on the output target array, if any.
+    fold_called : [None, Called], optional, default=None
+        The non-scaling preprocessing methods fitted to each fold, see split_supervised, if any.
 
     Attributes
     ----------
@@ -88,6 +119,8 @@ class PreprocessingOnSplitData:
         The preprocessing methods to apply on the input feature matrix.
     y_called : [None, Called]
         The preprocessing methods to apply on the output target array, if any.
+    fold_called : [None, Called]
+        The non-scaling preprocessing methods fitted to each fold, if any.
     training_set : None, tuple[list[np.ndarray], list[np.ndarray]]
         Tuple containing the lists of preprocessed training input data (x_training) and output
         data (y_training), if any.
@@ -100,10 +133,12 @@ class PreprocessingOnSplitData:
             split: CrossValidationSplit,
             x_called: Called,
             y_called: [None, Called] = None,
+            fold_called: [None, Called] = None,
     ) -> None:
         self.split = split
         self.x_called = x_called
         self.y_called = y_called
+        self.fold_called = fold_called
         self.training_set = None
         self.test_set = None
         self.apply_preprocessing()
@@ -117,6 +152,13 @@ class PreprocessingOnSplitData:
         x_training, y_training = split.training
         x_test, y_test = split.test
 
+        if self.fold_called is not None and self.fold_called.function:
+            # The models are fitted to the sets stored in training_set below, which are the split.test sets, so the
+            # methods are fitted to these sets with their reference data, and applied to the other sets
+            x_test, x_training = apply_supervised_on_split_data(
+                fit_set=x_test, fit_response=y_test, apply_set=x_training, called=self.fold_called
+            )
+
         (
             preprocessed_training_set_x,
             preprocessed_test_set_x,
@@ -173,3 +215,39 @@ def apply_preprocessing_on_split_data(
             ).data
         )
     return preprocessed_training_set, preprocessed_test_set
+
+
+def apply_supervised_on_split_data(
+        fit_set: list[np.ndarray, ...],
+        fit_response: list[np.ndarray, ...],
+        apply_set: list[np.ndarray, ...],
+        called: Called,
+) -> tuple[list[np.ndarray], list[np.ndarray]]:
+    """
+    Fits the specified preprocessing methods to a set of each fold with its reference data, e.g. the components of osc,
+    and applies them with the fitted parameters to the other set of the fold, as a FrozenPipeline.
+
+    Parameters
+    ----------
+    fit_set : list[np.ndarray, ...]
+        The input data the methods are fitted to, for each fold.
+    fit_response : list[np.ndarray, ...]
+        The reference data of fit_set, for each fold.
+    apply_set : list[np.ndarray, ...]
+        The input data the fitted methods are applied to, for each fold.
+    called : Called
+        The non-scaling preprocessing methods.
+
+    Returns
+    -------
+    tuple[list[np.ndarray], list[np.ndarray]]
+        A tuple containing the lists of preprocessed fit_set and apply_set data.
+    """
+    preprocessed_fit_set = []
+    preprocessed_apply_set = []
+
+    for fit, response, other in zip(fit_set, fit_response, apply_set):
+        prep = PreSplitPreprocessing(data=fit, called=called, response=response)
+        preprocessed_fit_set.append(prep.data)
+        preprocessed_apply_set.append(prep.freeze().transform(other))
+    return preprocessed_fit_set, preprocessed_apply_set
@@ -1,14 +1,18 @@
+from __future__ import annotations
+
 import numpy as np
 import pandas as pd
 
 from me3cs.framework.branch import Branch
 from me3cs.framework.data import Data, Index
+from me3cs.framework.helper_classes.handle_input import get_array_and_labels, validate_data
 from me3cs.framework.helper_classes.options import Options
 from me3cs.framework.log import Log
 from me3cs.framework.outlier_detection import OutlierDetection
 from me3cs.framework.results import Results
 from me3cs.framework.variable_selection import VariableSelection
 from me3cs.misc.handle_data import transform_array_1d_to_2d
+from me3cs.misc.read_data import read_hdf5, read_npy, read_parquet
 
 
 class BaseModel:
@@ -18,9 +22,9 @@ class BaseModel:
 
     Parameters
     ----------
-    x : np.ndarray, pd.Series, or pd.DataFrame
-        The input data array for the model.
-    y : np.ndarray, pd.Series, or pd.DataFrame, optional
+    x : np.ndarray, pd.Series, pd.DataFrame or pyarrow.Table
+        The input data array for the model. Labels of pandas and Arrow input are kept in the indices of the data.
+    y : np.ndarray, pd.Series, pd.DataFrame or pyarrow.Table, optional
         The reference data array for the model, by default None.
 
     Attributes
@@ -47,31 +51,132 @@ class BaseModel:
             x: [np.ndarray | pd.Series | pd.DataFrame],
             y: [np.ndarray | pd.Series | pd.DataFrame] = None,
     ) -> None:
-        x_data = Data(x, Index(x.shape[0]), Index(x.shape[1]))
+        self.results = Results()
+        self.options = Options()
+
+        validate_data(x)
+        x, row_labels, variable_labels = get_array_and_labels(x)
+        x = transform_array_1d_to_2d(x)
+        x_data = Data(x, Index(x.shape[0], row_labels), Index(x.shape[1], variable_labels), dtype=self.options.dtype)
 
         self.branches = []
-        self.x = Branch(x_data, self.branches)
+        self.x = Branch(x_data, self.branches, self.options)
         self.branches.append(self.x)
         self.single_branch = True
         if y is not None:
+            validate_data(y)
+            y, _, y_labels = get_array_and_labels(y)
             if x.shape[0] != y.shape[0]:
                 raise ValueError(f"x and y need to have the same number of rows. "
                                  f"\nx rows {x.shape[0]}"
                                  f"\ny rows {y.shape[0]}")
 
             y = transform_array_1d_to_2d(y)
-            y_data = Data(y, Index(y.shape[0]), Index(y.shape[1]))
+            y_data = Data(y, Index(y.shape[0], row_labels), Index(y.shape[1], y_labels), dtype=self.options.dtype)
 
-            self.y = Branch(y_data, self.branches)
+            self.y = Branch(y_data, self.branches, self.options)
             self.branches.append(self.y)
             self.single_branch = False
+            self.x.preprocessing.response = y_data
 
-        self.results = Results()
-        self.options = Options()
         self.log = Log(self, self.results, self.options)
         self.outlier_detection = OutlierDetection(self)
         self.variable_selection = VariableSelection(self)
 
+    @classmethod
+    def from_npy(cls, x_path: str, y_path: [str, None] = None, mmap_mode: [str, None] = "r") -> BaseModel:
+        """
+        Create a model from .npy files. By default the files are memory-mapped, so data larger than the memory can be
+        used. Derived data is written to scratch memory-mapped arrays only when rows or variables are removed.
+
+        Parameters
+        ----------
+        x_path : str
+            The path to the .npy file with the input data.
+        y_path : str, optional
+            The path to the .npy file with the reference data, by default None.
+        mmap_mode : str or None, optional
+            The mode used to memory-map the files, see `numpy.load`. None loads the data into memory, by default "r".
+
+        Returns
+        -------
+        BaseModel
+            The model created from the files.
+        """
+        x = read_npy(x_path, mmap_mode=mmap_mode)
+        y = read_npy(y_path, mmap_mode=mmap_mode) if y_path is not None else None
+        return cls(x, y)
+
+    @classmethod
+    def from_hdf5(cls, path: str, x_key: str, y_key: [str, None] = None) -> BaseModel:
+        """
+        Create a model from datasets in an HDF5 file. Contiguous and uncompressed datasets are memory-mapped. Requires
+        the optional dependency h5py.
+
+        Parameters
+        ----------
+        path : str
+            The path to the HDF5 file.
+        x_key : str
+            The name of the dataset with the input data.
+        y_key : str, optional
+            The name of the dataset with the reference data, by default None.
+
+        Returns
+        -------
+        BaseModel
+            The model created from the file.
+        """
+        x = read_hdf5(path, x_key)
+        y = read_hdf5(path, y_key) if y_key is not None else None
+        return cls(x, y)
+
+    @classmethod
+    def from_parquet(
+            cls,
+            path: str,
+            y_columns: [list[str], None] = None,
+            x_columns: [list[str], None] = None,
+    ) -> BaseModel:
+        """
+        Create a model from a Parquet file. The columns are read into Arrow buffers and wrapped without a further copy
+        where possible. Requires the optional dependency pyarrow.
+
+        Parameters
+        ----------
+        path : str
+            The path to the Parquet file.
+        y_columns : list[str], optional
+            The names of the columns with the reference data, by default None.
+        x_columns : list[str], optional
+            The names of the columns with the input data. By default all columns not in y_columns.
+
+        Returns
+        -------
+        BaseModel
+            The model created from the file.
+        """
+        table = read_parquet(path)
+        index_columns = (table.schema.pandas_metadata or {}).get("index_columns", [])
+        index_columns = [column for column in index_columns if isinstance(column, str)]
+        y_columns = [] if y_columns is None else list(y_columns)
+        if x_columns is None:
+            x_columns = [column for column in table.column_names if column not in y_columns + index_columns]
+        x = table.select(index_columns + list(x_columns))
+        y = table.select(index_columns + y_columns) if y_columns else None
+        return cls(x, y)
+
+    def _apply_options(self) -> None:
+        """
+        Apply the options, which are stored in the data of the branches. If the floating point precision has changed,
+        the data is converted and the preprocessing is applied again in the new precision. The number of threads and
+        block size are read from the options by the preprocessing of the branches when a method is called.
+        """
+        for branch in self.branches:
+            if branch.data_class.dtype != self.options.dtype:
+                branch.data_class.dtype = self.options.dtype
+                branch.preprocessing.call_in_order()
+
     def reset(self):
         """
         Reset the model by clearing the outlier detection, last model called,
@@ -1,14 +1,12 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import numpy as np
 
 from me3cs.framework.data import Data
+from me3cs.framework.helper_classes.options import Options
 from me3cs.missing_data.missing_data import MissingData
 from me3cs.preprocessing.preprocessing import get_preprocessing_from_dimension
 
-if TYPE_CHECKING:
-    import numpy as np
-
 
 class Branch:
     """
@@ -21,6 +19,9 @@ class Branch:
         The Data object containing the data for the branch.
     branches : list
         A list of Branch objects for each data array.
+    options : Options, optional
+        The options of the model, which the preprocessing reads the number of threads and block size from, by default
+        None.
 
     Attributes
     ----------
@@ -34,13 +35,14 @@ class Branch:
         The MissingData object for the branch.
     """
 
-    def __init__(self, data: Data, branches: list) -> None:
+    def __init__(self, data: Data, branches: list, options: [Options, None] = None) -> None:
         preprocessing_type = get_preprocessing_from_dimension(data.data)
 
         self.data_class = data
         self._branches = branches
 
         self.preprocessing = preprocessing_type(data)
+        self.preprocessing.options = options
         self.missing_data = MissingData(data, self._branches)
 
     @property
@@ -92,21 +94,22 @@ class Branch:
                f"Preprocessing - {self.preprocessing.called}\n" \
                f""
 
-    def __getitem__(self, key: [int, slice]) -> Branch:
+    def __getitem__(self, key: [int, slice, tuple]) -> BranchView:
         """
-        Get a new Branch object with a subset of the data array using the given key.
+        Get a read-only view of a subset of the data array using the given key. The view shares the data and indices
+        of the branch, and the subset is only computed when the data of the view is read.
 
         Parameters
         ----------
-        key : int or slice
+        key : int, slice or tuple
             The index or slice to subset the data array.
 
         Returns
         -------
-        Branch
-            A new Branch object with the subset of the data array.
+        BranchView
+            A read-only view of the subset of the data array.
         """
-        return Branch(self.data[key], self._branches)
+        return BranchView(self, key)
 
     def __array__(self) -> np.ndarray:
         """
@@ -129,3 +132,118 @@ class Branch:
             The length of the data array of the branch.
         """
         return len(self.data)
+
+
+class BranchView:
+    """
+    A read-only view of a subset of the data of a Branch. Creating a view only stores the branch and the key, so no
+    data, indices or preprocessing objects are built. The subset is computed from the current data of the branch every
+    time the data of the view is read, so the view follows later changes to the branch.
+
+    Parameters
+    ----------
+    branch : Branch or BranchView
+        The branch to view.
+    key : int, slice or tuple
+        The index or slice of the data of the branch.
+
+    Attributes
+    ----------
+    branch : Branch or BranchView
+        The viewed branch.
+    key : int, slice or tuple
+        The index or slice of the data of the branch.
+    """
+
+    def __init__(self, branch: [Branch, BranchView], key: [int, slice, tuple]) -> None:
+        self.branch = branch
+        self.key = key
+
+    @property
+    def data(self) -> np.ndarray:
+        """
+        Get the subset of the data array of the branch. Basic slices are views of the data of the branch.
+
+        Returns
+        -------
+        np.ndarray
+            The read-only subset of the data array.
+        """
+        data = self.branch.data[self.key]
+        if isinstance(data, np.ndarray):
+            data = data.view()
+            data.flags.writeable = False
+        return data
+
+    @property
+    def data_class(self) -> Data:
+        """
+        Get the Data object of the viewed branch.
+
+        Returns
+        -------
+        Data
+            The Data object of the viewed branch.
+        """
+        return self.branch.data_class
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """
+        Get the shape of the subset of the data array.
+
+        Returns
+        -------
+        tuple[int, ...]
+            The shape of the subset.
+        """
+        return np.shape(self.data)
+
+    def __repr__(self) -> str:
+        """
+        Return a string representation of the BranchView object.
+
+        Returns
+        -------
+        str
+            A string representation of the BranchView object.
+        """
+        return f"View of data shape: {self.shape}\n"
+
+    def __getitem__(self, key: [int, slice, tuple]) -> BranchView:
+        """
+        Get a read-only view of a subset of the view.
+
+        Parameters
+        ----------
+        key : int, slice or tuple
+            The index or slice to subset the data array of the view.
+
+        Returns
+        -------
+        BranchView
+            A read-only view of the subset.
+        """
+        return BranchView(self, key)
+
+    def __array__(self) -> np.ndarray:
+        """
+        Return the subset of the data array.
+
+        Returns
+        -------
+        np.ndarray
+            The read-only subset of the data array.
+        """
+        return self.data
+
+    def __len__(self) -> int:
+        """
+        Get the length of the subset of the data array.
+
+        Returns
+        -------
+        int
+            The length of the subset of the data array.
+        """
+        return len(self.data)
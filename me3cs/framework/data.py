@@ -1,8 +1,18 @@
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Callable, Hashable, Iterator
+
 import numpy as np
+import pandas as pd
+from scipy import sparse
 
-from me3cs.framework.helper_classes.handle_input import validate_data
-from me3cs.framework.helper_classes.link import Link
-from me3cs.misc.handle_data import transform_array_1d_to_2d
+from me3cs.framework.helper_classes.handle_input import get_array_and_labels, validate_data
+from me3cs.framework.helper_classes.link import LazyLink, Link
+from me3cs.misc.fingerprint import combine, hash_array
+from me3cs.misc.handle_data import FLOAT_DTYPES, as_float_array, scratch_memmap, transform_array_1d_to_2d
+from me3cs.misc.statistics import EXACT_MEDIAN_ELEMENTS, SKETCH_COMPRESSION, QuantileSketch, RunningCrossProducts, \
+    RunningHistogram, RunningMoments
 
 
 class Index:
@@ -13,46 +23,156 @@ class Index:
     ----------
     length : int
         The number of elements in the index.
+    labels : pandas.Index or array_like, optional
+        The labels of the elements, e.g. sample IDs or wavelengths. By default the positions of the elements.
 
     Attributes
     ----------
-    missing_data : list[bool]
-        A list of boolean values indicating the presence of missing data for each element.
-    outlier_detection : list[bool]
-        A list of boolean values indicating the presence of outliers for each element.
+    missing_data : numpy.ndarray
+        A boolean array indicating the presence of missing data for each element.
+    outlier_detection : numpy.ndarray
+        A boolean array indicating the presence of outliers for each element.
+    version : int
+        A counter which is incremented every time one of the indices is changed. Used to invalidate cached masks.
+    module_version : dict[str, int]
+        A counter for each of the indices, which is incremented every time that index is changed.
+    labels : pandas.Index
+        The labels of all elements.
     """
 
     _TYPES = ["missing_data", "outlier_detection"]
 
-    def __init__(self, length: int) -> None:
-        index = [True for _ in range(length)]
-        self.missing_data = index.copy()
-        self.outlier_detection = index.copy()
+    def __init__(self, length: int, labels: [pd.Index, None] = None) -> None:
+        self.version = 0
+        self.module_version = {module: 0 for module in self._TYPES}
+        self._total = None
+        self._length_of_rows = None
+        self._total_labels = None
+        self._fingerprint = None
+        self.missing_data = np.ones(length, dtype=bool)
+        self.outlier_detection = np.ones(length, dtype=bool)
+        self.labels = labels
 
     @property
-    def total(self) -> list[..., bool]:
+    def labels(self) -> pd.Index:
         """
-        Returns the merged index of missing data and outlier detection.
+        Returns the labels of all elements.
 
         Returns
         -------
-        list[bool]
-            A list of boolean values representing the merged index.
+        pandas.Index
+            The labels of all elements.
         """
-        return self._merge_index()
+        return self._labels
 
-    @total.getter
-    def total(self) -> list[..., bool]:
+    @labels.setter
+    def labels(self, labels: [pd.Index, None]) -> None:
+        """
+        Sets the labels of all elements. None sets the labels to the positions of the elements.
 
-        return self._merge_index()
+        Parameters
+        ----------
+        labels : pandas.Index, array_like or None
+            The labels of the elements.
+
+        Raises
+        ------
+        ValueError
+            If the number of labels does not match the number of elements.
+        """
+        length = self._missing_data.shape[0]
+        labels = pd.RangeIndex(length) if labels is None else pd.Index(labels)
+        if labels.shape[0] != length:
+            raise ValueError(f"The number of labels ({labels.shape[0]}) does not match the number of elements "
+                             f"({length})")
+        self._labels = labels
+        self._total_labels = None
 
     @property
-    def length_of_rows(self) -> int:
-        return sum(self.total)
+    def total_labels(self) -> pd.Index:
+        """
+        Returns the labels of the elements kept in the merged index. The labels are cached until one of the indices
+        is changed.
+
+        Returns
+        -------
+        pandas.Index
+            The labels of the kept elements.
+        """
+        if self._total_labels is None:
+            self._total_labels = self._labels[self.total]
+        return self._total_labels
+
+    @property
+    def missing_data(self) -> np.ndarray:
+        """
+        Returns the boolean index of the missing_data module.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean array, where False marks an element removed by the missing_data module.
+        """
+        return self._missing_data
+
+    @missing_data.setter
+    def missing_data(self, index: [np.ndarray, list[..., bool]]) -> None:
+        self._missing_data = as_boolean_index(index)
+        self._invalidate("missing_data")
+
+    @property
+    def outlier_detection(self) -> np.ndarray:
+        """
+        Returns the boolean index of the outlier_detection module.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean array, where False marks an element removed by the outlier_detection module.
+        """
+        return self._outlier_detection
+
+    @outlier_detection.setter
+    def outlier_detection(self, index: [np.ndarray, list[..., bool]]) -> None:
+        self._outlier_detection = as_boolean_index(index)
+        self._invalidate("outlier_detection")
+
+    @property
+    def total(self) -> np.ndarray:
+        """
+        Returns the merged index of missing data and outlier detection. The merged index is cached until one of the
+        indices is changed.
+
+        Returns
+        -------
+        numpy.ndarray
+            A read-only boolean array representing the merged index.
+        """
+        if self._total is None:
+            self._total = self._merge_index()
+            self._length_of_rows = int(np.count_nonzero(self._total))
+        return self._total
 
-    @length_of_rows.getter
+    @property
     def length_of_rows(self) -> int:
-        return sum(self.total)
+        if self._length_of_rows is None:
+            self._length_of_rows = int(np.count_nonzero(self.total))
+        return self._length_of_rows
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Returns a fingerprint of the contents of the missing_data and outlier_detection indices. The fingerprint is
+        cached until one of the indices is changed, and indices with the same contents have the same fingerprint.
+
+        Returns
+        -------
+        str
+            The fingerprint as a hexadecimal string.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = combine(*(hash_array(np.packbits(getattr(self, module))) for module in self._TYPES))
+        return self._fingerprint
 
     def set_index(self, module: str, missing_values: [tuple[..., int], int]) -> None:
         """
@@ -63,21 +183,20 @@ class Index:
         module : str
             The name of the index to update. Must be one of "missing_data" or "outlier_detection".
         missing_values : tuple[int] or int
-            The indices of the elements to be marked as missing or outliers.
+            The indices of the elements to be marked as missing or outliers. The indices refer to the elements which
+            are currently kept in the merged index.
         """
         if not isinstance(module, str):
             raise TypeError("The module needs to be a string")
         if module not in self._TYPES:
             raise ValueError(f"module needs to be one of: {', '.join(self._TYPES)}")
 
-        if isinstance(missing_values, int):
-            if missing_values >= self.length_of_rows:
-                raise ValueError("missing_values is out of bounds")
-            updated_missing_values = check_index(count_false(self.total), missing_values)
-        else:
-            if any(elem >= self.length_of_rows for elem in missing_values):
-                raise ValueError("missing_values is out of bounds")
-            updated_missing_values = check_index(count_false(self.total), missing_values)
+        positions = np.asarray(missing_values, dtype=int).reshape(-1)
+        if positions.size and positions.max() >= self.length_of_rows:
+            raise ValueError("missing_values is out of bounds")
+
+        # Map the positions in the currently kept elements to positions in the full index
+        updated_missing_values = np.flatnonzero(self.total)[positions]
         old_index = getattr(self, module)
         index = missing_values_to_boolean(updated_missing_values, old_index)
         setattr(self, module, index)
@@ -93,28 +212,42 @@ class Index:
         """
         if module not in self._TYPES:
             raise ValueError(f"module needs to be one of {' or '.join(self._TYPES)}")
-        reset_index = [True for _ in range(len(self.total))]
-        setattr(self, module, reset_index)
+        setattr(self, module, np.ones(len(self.total), dtype=bool))
 
     def reset_all(self) -> None:
         """
         Resets all indices (missing_data and outlier_detection) to their initial states.
         """
-        reset_index = [True for _ in range(len(self.total))]
-        [setattr(self, module, reset_index) for module in self._TYPES]
+        [setattr(self, module, np.ones(len(self.total), dtype=bool)) for module in self._TYPES]
 
-    def _merge_index(self) -> list[..., bool]:
+    def _merge_index(self) -> np.ndarray:
         """
-        Merges the missing_data and outlier_detection indices into a single list.
+        Merges the missing_data and outlier_detection indices into a single boolean array.
 
         Returns
         -------
-        list[bool]
-            A list of boolean values representing the merged index.
+        numpy.ndarray
+            A read-only boolean array representing the merged index.
+        """
+        merged = np.logical_and(self._missing_data, self._outlier_detection)
+        merged.flags.writeable = False
+        return merged
+
+    def _invalidate(self, module: str) -> None:
         """
-        merged_list = [a and b for a, b in zip(self.missing_data, self.outlier_detection)]
-        merged_list = [False if value is False else True for value in merged_list]
-        return merged_list
+        Clears the cached merged index and increments the version of the index and the changed module.
+
+        Parameters
+        ----------
+        module : str
+            The name of the index which was changed.
+        """
+        self._total = None
+        self._length_of_rows = None
+        self._total_labels = None
+        self._fingerprint = None
+        self.version += 1
+        self.module_version[module] += 1
 
     def __repr__(self):
         """
@@ -128,6 +261,25 @@ class Index:
         return f"Index: {self.length_of_rows}"
 
 
+def as_boolean_index(index: [np.ndarray, list[..., bool]]) -> np.ndarray:
+    """
+    Converts an index to a read-only, one-dimensional boolean array.
+
+    Parameters
+    ----------
+    index : numpy.ndarray or list[bool]
+        The index to convert.
+
+    Returns
+    -------
+    numpy.ndarray
+        A read-only boolean array.
+    """
+    index = np.array(index, dtype=bool).reshape(-1)
+    index.flags.writeable = False
+    return index
+
+
 def check_index(existing: tuple, new: [tuple, int]) -> tuple[int, ...]:
     """
     Adjusts the new indices based on the existing indices. This is useful when you need to
@@ -145,30 +297,23 @@ def check_index(existing: tuple, new: [tuple, int]) -> tuple[int, ...]:
     tuple[int]
         A tuple of the adjusted new indices.
     """
-    result = []
-    if isinstance(new, int):
-        for j in existing:
-            if j <= new:
-                new += 1
-        result.append(new)
-    else:
-        for index in new:
-            for j in existing:
-                # check if a smaller index already exists in the old
-                # for each one you find, increment by one
-                if j <= index:
-                    index += 1
-            result.append(index)
-    return tuple(result)
+    existing = np.sort(np.asarray(existing, dtype=int).reshape(-1))
+    new = np.asarray(new, dtype=int).reshape(-1)
+
+    # For each existing index, the position it would have had among the kept elements. Every existing index
+    # at or before a new index shifts the new index by one.
+    shifted = existing - np.arange(existing.shape[0])
+    result = new + np.searchsorted(shifted, new, side="right")
+    return tuple(result.tolist())
 
 
-def count_false(boolean: list[bool]) -> tuple:
+def count_false(boolean: [np.ndarray, list[bool]]) -> tuple:
     """
     Returns the indices of the False elements in a boolean list.
 
     Parameters
     ----------
-    boolean : list[bool]
+    boolean : numpy.ndarray or list[bool]
         A list of boolean values.
 
     Returns
@@ -176,52 +321,175 @@ def count_false(boolean: list[bool]) -> tuple:
     tuple
         A tuple containing the indices of the False elements in the input list.
     """
-    return tuple(filter(lambda i: not boolean[i], range(len(boolean))))
+    return tuple(np.flatnonzero(~np.asarray(boolean, dtype=bool)).tolist())
 
 
 class Data:
     """
-    Class for handling and storing data.
+    Class for handling and storing data. Only the raw data is stored. Every other level of the hierarchy records the
+    indices applied to it, and is materialized from the level above on the first read after the indices change.
+
+    The raw data is not copied, if it already is an array of floats. Memory-mapped arrays, e.g. from
+    `numpy.load(path, mmap_mode="r")`, therefore stay on disk, and the levels derived from them are written to scratch
+    memory-mapped arrays. pandas DataFrames and Series are wrapped through their values, and Arrow tables through the
+    buffers of their columns. Their row and column labels are stored in the rows and variables indices. Sparse
+    matrices are stored in CSR format, and every level derived from them stays sparse.
 
     Parameters
     ----------
-    data : numpy.ndarray
+    data : numpy.ndarray, pandas.DataFrame, pandas.Series, pyarrow.Table or scipy.sparse.spmatrix
         The input data to be preprocessed.
     rows : Index
         The index object for the rows of the data.
     variables : Index
         The index object for the columns of the data.
+    dtype : str or numpy.dtype, optional
+        The floating point precision of the data, either "float64" or "float32". By default the precision of the
+        input data, or float64 if the input data is not an array of floats.
 
     Attributes
     ----------
     raw : Link
         An instance of the Link class for the raw data.
-    missing_data : Link
-        An instance of the Link class for the data with missing data removed.
-    preprocessing_data : Link
-        An instance of the Link class for the data with preprocessing operations applied.
-    outlier_detection : Link
-        An instance of the Link class for the data with outliers removed.
+    missing_data : LazyLink
+        An instance of the LazyLink class for the data with missing data removed.
+    preprocessing_data : LazyLink
+        An instance of the LazyLink class for the data with preprocessing operations applied.
+    outlier_detection : LazyLink
+        An instance of the LazyLink class for the data with outliers removed.
     rows : Index
         The index object for the rows of the data.
     variables : Index
         The index object for the columns of the data.
+    dtype : numpy.dtype
+        The floating point precision of every level, except the raw data.
+    raw_fingerprint : str
+        A fingerprint of the contents of the raw data, computed on first access.
+    pipelines : dict[str, Called]
+        The recorded method calls of the modules changing the data, e.g. preprocessing and missing data.
     """
 
     _HIERARCHY = ["raw", "missing_data", "outlier_detection", "preprocessing_data"]
 
-    def __init__(self, data: np.ndarray, rows: Index, variables: Index) -> None:
+    def __init__(self, data: np.ndarray, rows: Index, variables: Index, dtype: [str, np.dtype, None] = None) -> None:
         validate_data(data)
-        data = transform_array_1d_to_2d(data)
-        data = data.astype("float")
+        data, row_labels, variable_labels = get_array_and_labels(data)
+        data = transform_array_1d_to_2d(as_float_array(data))
+        if isinstance(data, np.ndarray):
+            data = data.view()
+            data.flags.writeable = False
+        if row_labels is not None:
+            rows.labels = row_labels
+        if variable_labels is not None:
+            variables.labels = variable_labels
 
         self.raw = Link(data)
-        self.missing_data = Link(data)
-        self.preprocessing_data = Link(data)
-        self.outlier_detection = Link(data)
+        self._raw_fingerprint = None
+        self.pipelines = {}
+        self.dtype = data.dtype if dtype is None else dtype
+        self._raw_data = None
+        self._raw_data_version = None
+        self.missing_data = LazyLink(self, "missing_data")
+        self.outlier_detection = LazyLink(self, "outlier_detection")
+        self.preprocessing_data = LazyLink(self, "preprocessing_data")
         self.rows = rows
         self.variables = variables
 
+    def __deepcopy__(self, memo: dict) -> Data:
+        """
+        Returns a deep copy of the Data instance. The raw data is read-only, and is shared with the copy instead of
+        being copied. Cached selections of the raw data are not copied.
+
+        Parameters
+        ----------
+        memo : dict
+            A dictionary to memoize objects for deep copying.
+
+        Returns
+        -------
+        Data
+            A deep copy of the Data instance.
+        """
+        raw = self.raw.get()
+        memo[id(raw)] = raw
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        state = {key: value for key, value in self.__dict__.items() if key not in ("_raw_data", "_raw_data_version")}
+        new.__dict__.update(deepcopy(state, memo))
+        new._raw_data = None
+        new._raw_data_version = None
+        return new
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Returns the floating point precision of the data.
+
+        Returns
+        -------
+        numpy.dtype
+            The floating point precision of the data.
+        """
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, dtype: [str, np.dtype]) -> None:
+        """
+        Sets the floating point precision of the data. Every level is materialized again in the new precision, except
+        data set on the missing_data level, which is converted.
+
+        Parameters
+        ----------
+        dtype : str or numpy.dtype
+            The floating point precision, either "float64" or "float32".
+
+        Raises
+        ------
+        ValueError
+            If dtype is not float64 or float32.
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in FLOAT_DTYPES:
+            raise ValueError(f"Please input float64 or float32 as dtype. {dtype} was input")
+
+        missing_data = self.missing_data.get() if hasattr(self, "missing_data") and self.missing_data.is_set else None
+        self._dtype = dtype
+        if missing_data is not None:
+            self.missing_data.set(missing_data.astype(dtype))
+
+    @property
+    def raw_fingerprint(self) -> str:
+        """
+        Returns a fingerprint of the contents of the raw data. It is computed on first access and then kept, since the
+        raw data is read-only, so Data which is never fingerprinted, e.g. the temporary Data of the cross-validation,
+        and memory-mapped data is not read in full when it is created.
+
+        Returns
+        -------
+        str
+            The fingerprint as a hexadecimal string.
+        """
+        if self._raw_fingerprint is None:
+            self._raw_fingerprint = hash_array(self.raw.get())
+        return self._raw_fingerprint
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Returns a fingerprint of the data. It combines the fingerprint of the raw data, which is computed once on first
+        access, with the data type, the indices of the rows and variables and the recorded pipelines, e.g. the
+        called preprocessing methods. Data with the same fingerprint has the same contents, also across processes, so
+        the fingerprint can be used as a key to cache fitted models and results.
+
+        Returns
+        -------
+        str
+            The fingerprint as a hexadecimal string.
+        """
+        pipelines = [combine(name, called.fingerprint) for name, called in sorted(self.pipelines.items())]
+        return combine(self.raw_fingerprint, self.dtype.str, self.rows.fingerprint, self.variables.fingerprint,
+                       *pipelines)
+
     @property
     def data(self) -> np.ndarray:
         """
@@ -254,7 +522,6 @@ class Data:
             The indices of the rows to remove.
         """
         self.rows.set_index(module, missing_values)
-        set_data_from_index(self, module)
 
     def remove_columns(self, module: str, missing_values: [tuple[..., int], int]) -> None:
         """
@@ -268,7 +535,6 @@ class Data:
             The indices of the columns to remove.
         """
         self.variables.set_index(module, missing_values)
-        set_data_from_index(self, module)
 
     def reset_index(self, module: str, dimension: str) -> None:
         """
@@ -307,108 +573,422 @@ class Data:
                 else:
                     self.variables.reset_index(module)
 
-        set_data_from_index(self, module)
-
     def get_raw_data(self) -> np.ndarray:
         """
-        Returns the raw data with missing data and outlier detection applied.
+        Returns the raw data with missing data and outlier detection applied. The rows and variables are selected
+        with a single gather, and the result is cached until the indices or the data type change.
 
         Returns
         -------
         numpy.ndarray
-            The raw data with missing data and outlier detection applied.
+            The read-only raw data with missing data and outlier detection applied.
         """
-        data = self.raw.get()
-        data = data[self.rows.total, :]
-        data = data[:, self.variables.total]
-        return data
+        version = self.dtype, self.rows.version, self.variables.version
+        if self._raw_data is None or self._raw_data_version != version:
+            self._raw_data = gather(self.raw.get(), self.rows.total, self.variables.total, self.dtype)
+            self._raw_data_version = version
+        return self._raw_data
 
+    def get_missing_data(self) -> np.ndarray:
+        """
+        Returns the raw data with only the missing data index applied.
+
+        Returns
+        -------
+        numpy.ndarray
+            The raw data with the missing data index applied.
+        """
+        return gather(self.raw.get(), self.rows.missing_data, self.variables.missing_data, self.dtype)
+
+    def _level_version(self, level: str) -> tuple:
+        """
+        Returns the version of a level in the hierarchy. When the version changes, the level is materialized again.
+
+        Parameters
+        ----------
+        level : str
+            The name of the level.
+
+        Returns
+        -------
+        tuple
+            The version of the level.
+        """
+        match level:
+            case "missing_data":
+                return self.dtype, self.rows.module_version["missing_data"], \
+                    self.variables.module_version["missing_data"]
+            case "outlier_detection":
+                return self.dtype, self.rows.version, self.variables.version, self.missing_data.revision
+            case "preprocessing_data":
+                return self.dtype, self.rows.version, self.variables.version, self.missing_data.revision, \
+                    self.outlier_detection.revision
+
+    def _materialize(self, level: str) -> np.ndarray:
+        """
+        Materializes a level in the hierarchy from the level above it.
 
-def set_data_from_index(self, module: str):
+        Parameters
+        ----------
+        level : str
+            The name of the level.
+
+        Returns
+        -------
+        numpy.ndarray
+            The read-only data of the level.
+        """
+        match level:
+            case "missing_data":
+                return self.get_missing_data()
+            case "outlier_detection":
+                if not self.missing_data.is_set:
+                    return self.get_raw_data()
+                rows = remove_from_one_list(self.rows.missing_data, self.rows.outlier_detection)
+                variables = remove_from_one_list(self.variables.missing_data, self.variables.outlier_detection)
+                return gather(self.missing_data.get(), rows, variables, self.dtype)
+            case "preprocessing_data":
+                return self.outlier_detection.get()
+
+
+class ChunkedData(Data):
     """
-    Sets the data attribute of the Data class based on the specified module and dimension.
+    Class for handling tall data, with more rows than can be held in memory. The data is read in blocks of rows, and
+    column statistics and cross-products are computed by streaming over the blocks, so the full matrix is never
+    materialized. The statistics are cached until the indices or the data type change. Every level of the hierarchy
+    can still be read as in Data, but is then materialized in full.
 
     Parameters
     ----------
-    self : Data
-        The Data class instance.
-    module : str
-        The name of the module to set data from.
+    data : numpy.ndarray, pandas.DataFrame, pandas.Series or pyarrow.Table
+        The input data, usually a memory-mapped array.
+    rows : Index
+        The index object for the rows of the data.
+    variables : Index
+        The index object for the columns of the data.
+    dtype : str or numpy.dtype, optional
+        The floating point precision of the data, by default the precision of the input data.
+    block_size : int, optional
+        The number of raw rows read at a time, by default 65536.
+
+    Attributes
+    ----------
+    block_size : int
+        The number of raw rows read at a time.
     """
 
-    if module == "all":
-        module = "missing_data"
+    def __init__(self, data: np.ndarray, rows: Index, variables: Index, dtype: [str, np.dtype, None] = None,
+                 block_size: int = 65536) -> None:
+        super().__init__(data, rows, variables, dtype)
+        if block_size < 1:
+            raise ValueError(f"block_size needs to be a positive integer, not {block_size}")
+        self.block_size = block_size
+        self._statistics = {}
+        self._statistics_version = None
+
+    @property
+    def levels_are_raw(self) -> bool:
+        """
+        Returns whether no level below the raw data has been set, so the statistics streamed over the blocks are the
+        statistics of every level.
+
+        Returns
+        -------
+        bool
+            True if the levels only select rows and variables of the raw data.
+        """
+        return not any(link.is_set for link in (self.missing_data, self.outlier_detection, self.preprocessing_data))
+
+    def iter_blocks(self, block_size: [int, None] = None) -> Iterator[np.ndarray]:
+        """
+        Iterates over the raw data in blocks of rows, with missing data and outlier detection applied. Blocks where
+        every row is removed are skipped.
 
-    match module:
-        case "missing_data":
-            data = self.raw.get()
+        Parameters
+        ----------
+        block_size : int, optional
+            The number of raw rows read at a time, by default block_size of the instance.
 
-            rows = self.rows.total
-            variables = self.variables.total
-            new_data = data[np.ix_(rows, variables)]
+        Yields
+        ------
+        numpy.ndarray
+            A block of the selected rows and variables, in the data type of the instance.
+        """
+        block_size = self.block_size if block_size is None else block_size
+        raw, rows, variables = self.raw.get(), self.rows.total, self.variables.total
+        for start in range(0, raw.shape[0], block_size):
+            block_rows = rows[start: start + block_size]
+            if block_rows.any():
+                yield gather(np.asarray(raw[start: start + block_size]), block_rows, variables, self.dtype)
+
+    def _cached_statistic(self, key: Hashable, compute: Callable[[], any]) -> any:
+        """
+        Returns a cached statistic, which is computed when the indices or the data type have changed.
 
-            for hierarchy in self._HIERARCHY[1:]:
-                data_type = getattr(self, hierarchy)
-                data_type.set(new_data)
+        Parameters
+        ----------
+        key : Hashable
+            The key of the statistic.
+        compute : Callable
+            The function computing the statistic.
 
-        case "outlier_detection":
-            data = self.missing_data.get()
+        Returns
+        -------
+        any
+            The statistic.
+        """
+        version = self.dtype, self.rows.version, self.variables.version
+        if self._statistics_version != version:
+            self._statistics = {}
+            self._statistics_version = version
+        if key not in self._statistics:
+            self._statistics[key] = compute()
+        return self._statistics[key]
+
+    def moments(self) -> RunningMoments:
+        """
+        Returns the column means and variances, computed in one pass over the blocks.
 
-            rows = remove_from_one_list(self.rows.missing_data, self.rows.outlier_detection)
-            variables = remove_from_one_list(self.variables.missing_data, self.variables.outlier_detection)
-            new_data = data[np.ix_(rows, variables)]
+        Returns
+        -------
+        RunningMoments
+            The moments of the columns.
+        """
+        def compute():
+            moments = RunningMoments()
+            for block in self.iter_blocks():
+                moments.update(block)
+            return moments
 
-            for hierarchy in self._HIERARCHY[2:]:
-                data_type = getattr(self, hierarchy)
-                data_type.set(new_data)
+        return self._cached_statistic("moments", compute)
 
+    def mean(self) -> np.ndarray:
+        """
+        Returns the mean of each column.
 
-def remove_from_one_list(remove: list, keep: list) -> list:
+        Returns
+        -------
+        numpy.ndarray
+            The mean of each column, in float64.
+        """
+        return self.moments().mean
+
+    def std(self, ddof: int = 0) -> np.ndarray:
+        """
+        Returns the standard deviation of each column.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            The delta degrees of freedom, by default 0 as in numpy.std.
+
+        Returns
+        -------
+        numpy.ndarray
+            The standard deviation of each column, in float64.
+        """
+        return self.moments().std(ddof)
+
+    def median(self, n_bins: int = 2048, method: str = "auto", compression: int = SKETCH_COMPRESSION) -> np.ndarray:
+        """
+        Returns the median of each column. The exact median needs the selected data in memory. The approximate
+        medians are computed over the blocks, either from a t-digest of each column in one pass, or from histograms
+        of n_bins bins in a second pass after the minimum and maximum are taken from the moments. The error of the
+        histograms is at most the range of the column divided by n_bins.
+
+        Parameters
+        ----------
+        n_bins : int, optional
+            The number of bins of the histograms, by default 2048.
+        method : str, optional
+            "exact", "sketch", "histogram" or "auto", by default "auto", which is exact for data with at most
+            EXACT_MEDIAN_ELEMENTS elements, and sketch otherwise.
+        compression : int, optional
+            The compression of the t-digests, by default SKETCH_COMPRESSION.
+
+        Returns
+        -------
+        numpy.ndarray
+            The median of each column, in float64.
+
+        Raises
+        ------
+        ValueError
+            If method is not "exact", "sketch", "histogram" or "auto".
+        """
+        methods = ("exact", "sketch", "histogram", "auto")
+        if method not in methods:
+            raise ValueError(f"method needs to be one of {' or '.join(methods)}. {method} was input")
+        if method == "auto":
+            n_elements = self.rows.total.sum() * self.variables.total.sum()
+            method = "exact" if n_elements <= EXACT_MEDIAN_ELEMENTS else "sketch"
+
+        def compute():
+            match method:
+                case "exact":
+                    return np.median(self.get_raw_data(), axis=0).astype(np.float64)
+                case "sketch":
+                    sketch = QuantileSketch(compression)
+                    for block in self.iter_blocks():
+                        sketch.update(block)
+                    return sketch.quantile(0.5)
+            moments = self.moments()
+            histogram = RunningHistogram(moments.minimum, moments.maximum, n_bins)
+            for block in self.iter_blocks():
+                histogram.update(block)
+            return histogram.quantile(0.5)
+
+        return self._cached_statistic(("median", method, n_bins, compression), compute)
+
+    def cross_products(self, y: [ChunkedData, None] = None) -> RunningCrossProducts:
+        """
+        Returns the cross-products XᵀX, and Xᵀy if y is given, computed in one pass over the blocks. The rows of y
+        are read in the same blocks as the rows of x.
+
+        Parameters
+        ----------
+        y : ChunkedData, optional
+            The reference data, with the same rows as the data, by default None.
+
+        Returns
+        -------
+        RunningCrossProducts
+            The cross-products, which give XᵀX and Xᵀy with or without centering and scaling.
+
+        Raises
+        ------
+        ValueError
+            If y does not have the same number of rows as the data.
+        """
+        if y is None:
+            def compute():
+                cross_products = RunningCrossProducts()
+                for block in self.iter_blocks():
+                    cross_products.update(block)
+                return cross_products
+
+            return self._cached_statistic("cross_products", compute)
+
+        if not np.array_equal(self.rows.total, y.rows.total):
+            raise ValueError("x and y need to have the same rows")
+        cross_products = RunningCrossProducts()
+        for x_block, y_block in zip(self.iter_blocks(), y.iter_blocks(self.block_size)):
+            cross_products.update(x_block, y_block)
+        return cross_products
+
+    def project(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Projects the data onto weights one block at a time, e.g. to compute the scores of a model fitted from the
+        cross-products.
+
+        Parameters
+        ----------
+        weights : numpy.ndarray
+            The weights of shape (n_variables, n_components).
+
+        Returns
+        -------
+        numpy.ndarray
+            The projection of shape (n_rows, n_components).
+        """
+        weights = np.asarray(weights)
+        projection = np.empty((self.rows.length_of_rows, weights.shape[1]), dtype=np.result_type(self.dtype, weights))
+        start = 0
+        for block in self.iter_blocks():
+            projection[start: start + block.shape[0]] = block @ weights
+            start += block.shape[0]
+        return projection
+
+
+def gather(data: np.ndarray, rows: np.ndarray, variables: np.ndarray, dtype: [np.dtype, None] = None,
+           block_size: int = 4096) -> np.ndarray:
+    """
+    Selects the rows and variables of data with a single gather. If no rows or variables are removed and the data
+    type is unchanged, a view of data is returned instead of a copy. If data is memory-mapped or converted to another
+    data type, the selection is done one block of rows at a time, so only one block is held in a temporary array.
+    Memory-mapped data is gathered into a scratch memory-mapped array, so it never has to fit in memory. Sparse data
+    is selected as a sparse matrix, which is only copied if rows or variables are removed.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or scipy.sparse.csr_matrix
+        The data to select from.
+    rows : numpy.ndarray
+        A boolean array of the rows to keep.
+    variables : numpy.ndarray
+        A boolean array of the variables to keep.
+    dtype : numpy.dtype, optional
+        The data type of the selection, by default the data type of data.
+    block_size : int, optional
+        The number of rows gathered at a time for memory-mapped or converted data, by default 4096.
+
+    Returns
+    -------
+    numpy.ndarray
+        A read-only array with the selected rows and variables.
+    """
+    dtype = data.dtype if dtype is None else np.dtype(dtype)
+    all_rows, all_variables = rows.all(), variables.all()
+    if sparse.issparse(data):
+        new = data if all_rows else data[np.flatnonzero(rows)]
+        new = new if all_variables else new[:, np.flatnonzero(variables)]
+        return new.astype(dtype, copy=False)
+    if all_rows and all_variables and dtype == data.dtype:
+        new = data.view()
+    elif isinstance(data, np.memmap) or dtype != data.dtype:
+        row_index, variable_index = np.flatnonzero(rows), np.flatnonzero(variables)
+        shape = (row_index.shape[0], variable_index.shape[0])
+        new = scratch_memmap(shape, dtype) if isinstance(data, np.memmap) else np.empty(shape, dtype=dtype)
+        for start in range(0, row_index.shape[0], block_size):
+            block = row_index[start: start + block_size]
+            new[start: start + block_size] = data[block] if all_variables else data[np.ix_(block, variable_index)]
+    elif all_variables:
+        new = data[rows]
+    elif all_rows:
+        new = data[:, variables]
+    else:
+        new = data[np.ix_(rows, variables)]
+    new.flags.writeable = False
+    return new
+
+
+def remove_from_one_list(remove: [np.ndarray, list], keep: [np.ndarray, list]) -> np.ndarray:
     """
     Removes elements from the 'keep' list based on the boolean values in the 'remove' list.
 
     Parameters
     ----------
-    remove : list[bool]
+    remove : numpy.ndarray or list[bool]
         A list of boolean values to determine which elements to remove from the 'keep' list.
-    keep : list
+    keep : numpy.ndarray or list
         A list of elements to be filtered based on the 'remove' list.
 
     Returns
     -------
-    list
-        A list with elements removed based on the 'remove' list.
+    numpy.ndarray
+        An array with elements removed based on the 'remove' list.
     """
-    remove = remove.copy()
-    keep = keep.copy()
-    for i in range(len(keep)):
-        if not remove[i]:
-            keep[i] = None
-    return [i for i in keep if i is not None]
+    return np.asarray(keep)[np.asarray(remove, dtype=bool)]
 
 
-def missing_values_to_boolean(missing_values: [tuple[..., int], int],
-                              old_index: list[..., bool]) -> list[..., bool]:
+def missing_values_to_boolean(missing_values: [tuple[..., int], int, np.ndarray],
+                              old_index: [np.ndarray, list[..., bool]]) -> np.ndarray:
     """
-    Converts missing values to a boolean list, where False represents a missing value and True represents a present
+    Converts missing values to a boolean array, where False represents a missing value and True represents a present
     value.
 
     Parameters
     ----------
-    missing_values : tuple[int] or int
+    missing_values : tuple[int], int or numpy.ndarray
         The indices of the elements marked as missing.
-    old_index : list[bool]
-        The original boolean list representing the presence of missing values.
+    old_index : numpy.ndarray or list[bool]
+        The original boolean array representing the presence of missing values.
 
     Returns
     -------
-    list[bool]
-        A new boolean list representing the updated presence of missing values.
+    numpy.ndarray
+        A new boolean array representing the updated presence of missing values.
     """
-    new_index = old_index.copy()
-    if isinstance(missing_values, (tuple, list)):
-        for i in missing_values:
-            new_index[i] = False
-    else:
-        new_index[missing_values] = False
+    new_index = np.array(old_index, dtype=bool)
+    new_index[np.asarray(missing_values, dtype=int)] = False
     return new_index
@@ -13,6 +13,8 @@ class DecompositionModel(BaseModel):
         if not isinstance(algorithm, str):
             raise TypeError("algorithm has to be of type string.")
 
+        self._apply_options()
+
         # mean center if not mean centered
         if not self.x.preprocessing.data_is_centered:
             if self.options.mean_center:
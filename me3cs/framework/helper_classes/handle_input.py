@@ -1,23 +1,110 @@
 import numpy as np
 import pandas as pd
+from scipy import sparse
+
+from me3cs.misc.handle_data import FLOAT_DTYPES
 
 
 def validate_data(data: [np.ndarray | pd.Series | pd.DataFrame]) -> None:
     """
-    Validate the input data to ensure it is a NumPy array, Pandas DataFrame, or Pandas Series.
+    Validate the input data to ensure it is a NumPy array, Pandas DataFrame, Pandas Series, Arrow table or scipy
+    sparse matrix.
 
     This function checks if the input data is an instance of one of the supported types.
     If not, it raises a ValueError with an appropriate error message.
 
     Parameters
     ----------
-    data : np.ndarray, pd.Series, or pd.DataFrame
+    data : np.ndarray, pd.Series, pd.DataFrame, pyarrow.Table or scipy.sparse.spmatrix
         The data to be validated.
 
     Raises
     ------
     ValueError
-        If the input data is not an instance of np.ndarray, pd.Series, or pd.DataFrame.
+        If the input data is not an instance of np.ndarray, pd.Series, pd.DataFrame, an Arrow table or a sparse
+        matrix.
+    """
+    if not (isinstance(data, (np.ndarray, pd.Series, pd.DataFrame)) or is_arrow_table(data) or sparse.issparse(data)):
+        raise ValueError("Please input numpy array, pandas dataframe or series, arrow table or scipy sparse matrix")
+
+
+def is_arrow_table(data: any) -> bool:
+    """
+    Check if the data is an Arrow table or record batch, without importing pyarrow.
+
+    Parameters
+    ----------
+    data : any
+        The data to check.
+
+    Returns
+    -------
+    bool
+        True if the data is an Arrow table or record batch.
     """
-    if not isinstance(data, (np.ndarray, pd.Series, pd.DataFrame)):
-        raise ValueError("Please input numpy array or pandas dataframe or series")
+    return all(hasattr(data, attribute) for attribute in ("schema", "column_names", "column", "num_rows"))
+
+
+def get_array_and_labels(
+        data: [np.ndarray | pd.Series | pd.DataFrame],
+) -> tuple[np.ndarray, [pd.Index, None], [pd.Index, None]]:
+    """
+    Get the values of the input data as a numpy array together with the row and column labels. The values are not
+    copied when the underlying buffer can be wrapped directly. Sparse matrices are returned in CSR format.
+
+    Parameters
+    ----------
+    data : np.ndarray, pd.Series, pd.DataFrame, pyarrow.Table or scipy.sparse.spmatrix
+        The input data.
+
+    Returns
+    -------
+    tuple[np.ndarray or scipy.sparse.csr_matrix, pd.Index or None, pd.Index or None]
+        The values, the row labels and the column labels. The labels are None for numpy arrays and sparse matrices.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data.to_numpy(copy=False), data.index, data.columns
+    if isinstance(data, pd.Series):
+        return data.to_numpy(copy=False), data.index, pd.Index([data.name])
+    if is_arrow_table(data):
+        return arrow_to_numpy(data)
+    if sparse.issparse(data):
+        return sparse.csr_matrix(data), None, None
+    return data, None, None
+
+
+def arrow_to_numpy(table: any) -> tuple[np.ndarray, pd.Index, pd.Index]:
+    """
+    Convert an Arrow table or record batch to a numpy array through the buffers of its columns. A table with a single
+    column without missing values is wrapped without a copy. Otherwise, the columns are copied once into a single
+    array. Index columns stored by pandas are used as row labels.
+
+    Parameters
+    ----------
+    table : pyarrow.Table or pyarrow.RecordBatch
+        The table to convert.
+
+    Returns
+    -------
+    tuple[np.ndarray, pd.Index, pd.Index]
+        The values, the row labels and the column labels.
+    """
+    metadata = table.schema.pandas_metadata or {}
+    index_columns = [column for column in metadata.get("index_columns", []) if isinstance(column, str)]
+    columns = [column for column in table.column_names if column not in index_columns]
+
+    if index_columns:
+        row_labels = pd.Index(table.column(index_columns[0]).to_numpy(zero_copy_only=False))
+    else:
+        row_labels = pd.RangeIndex(table.num_rows)
+
+    values = [table.column(column).to_numpy(zero_copy_only=False) for column in columns]
+    if len(values) == 1:
+        array = values[0]
+    else:
+        dtype = np.result_type(*values)
+        dtype = dtype if dtype in FLOAT_DTYPES else np.dtype("float64")
+        array = np.empty((table.num_rows, len(values)), dtype=dtype, order="F")
+        for i, value in enumerate(values):
+            array[:, i] = value
+    return array, row_labels, pd.Index(columns)
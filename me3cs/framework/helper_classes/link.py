@@ -1,3 +1,6 @@
+from __future__ import annotations
+
+from copy import deepcopy
 from dataclasses import dataclass
 
 import numpy as np
@@ -37,3 +40,114 @@ class Link:
         """
         self.data = data
 
+
+class LazyLink:
+    """
+    A link between the modules in the branch class, where the data is not stored until it is read. On the first read
+    the data is materialized by the owner and cached under the current version of the owner. Data set on the link is
+    kept until the version changes, after which the link is materialized again.
+
+    Parameters
+    ----------
+    owner : object
+        The object materializing the data. Needs to implement `_materialize(level)` and `_level_version(level)`.
+    level : str
+        The name of the level the link represents in the owner.
+
+    Attributes
+    ----------
+    revision : int
+        A counter which is incremented every time data is set on the link.
+    """
+
+    def __init__(self, owner, level: str) -> None:
+        self._owner = owner
+        self._level = level
+        self._data = None
+        self._version = None
+        self._is_set = False
+        self.revision = 0
+
+    @property
+    def data(self):
+        return self.get()
+
+    @property
+    def is_set(self) -> bool:
+        """
+        Whether the data of the link has been set explicitly for the current version.
+
+        Returns
+        -------
+        bool
+            True if the data has been set and the version has not changed since.
+        """
+        return self._is_set and self._version == self._owner._level_version(self._level)
+
+    def get(self):
+        """
+        Return the data of the link, materializing it if it has not been read since the version changed.
+
+        Returns
+        -------
+        np.ndarray
+            The data of the link.
+        """
+        if self._data is None or self._version != self._owner._level_version(self._level):
+            self._data = self._owner._materialize(self._level)
+            self._version = self._owner._level_version(self._level)
+            self._is_set = False
+        return self._data
+
+    def set(self, data):
+        """
+        Set the data of the link. The data is kept until the version of the owner changes.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            The data to be stored in the link.
+        """
+        self.revision += 1
+        self._data = data
+        self._version = self._owner._level_version(self._level)
+        self._is_set = True
+
+    def reset(self) -> None:
+        """
+        Discard the data of the link, so it is materialized again on the next read.
+        """
+        if self._is_set:
+            self.revision += 1
+        self._data = None
+        self._version = None
+        self._is_set = False
+
+    def __deepcopy__(self, memo: dict) -> LazyLink:
+        """
+        Returns a deep copy of the LazyLink instance. Only data which has been set on the link is copied, since
+        materialized data can be materialized again from the copied owner.
+
+        Parameters
+        ----------
+        memo : dict
+            A dictionary to memoize objects for deep copying.
+
+        Returns
+        -------
+        LazyLink
+            A deep copy of the LazyLink instance.
+        """
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        new._owner = deepcopy(self._owner, memo)
+        new._level = self._level
+        new.revision = self.revision
+        new._is_set = self._is_set
+        new._data = deepcopy(self._data, memo) if self._is_set else None
+        new._version = self._version if self._is_set else None
+        return new
+
+    def __repr__(self) -> str:
+        state = "set" if self.is_set else "materialized" if self._data is not None else "not materialized"
+        return f"LazyLink({self._level}: {state})"
@@ -12,6 +12,12 @@ class Options:
         Whether to mean-center the data, default is True.
     percentage_left_out : float, optional
         The percentage of data to be left out in cross-validation, default is 0.1.
+    dtype : str, optional
+        The floating point precision of the data and models, either 'float64' or 'float32', default is 'float64'.
+    n_workers : int, optional
+        The number of threads row-wise preprocessing methods are applied on, default is 1.
+    block_size : int, optional
+        The number of elements of the blocks of rows distributed to the threads, default is 262144.
 
     Attributes
     ----------
@@ -23,6 +29,12 @@ class Options:
         Whether to mean-center the data.
     percentage_left_out : float
         The percentage of data to be left out in cross-validation.
+    dtype : str
+        The floating point precision of the data and models.
+    n_workers : int
+        The number of threads row-wise preprocessing methods are applied on.
+    block_size : int
+        The number of elements of the blocks of rows distributed to the threads.
     """
 
     def __init__(
@@ -31,11 +43,17 @@ class Options:
         n_components: int = 10,
         mean_center: bool = True,
         percentage_left_out: float = 0.1,
+        dtype: str = "float64",
+        n_workers: int = 1,
+        block_size: int = 262144,
     ) -> None:
         self.cross_validation = cross_validation
         self.n_components = n_components
         self.mean_center = mean_center
         self.percentage_left_out = percentage_left_out
+        self.dtype = dtype
+        self.n_workers = n_workers
+        self.block_size = block_size
 
     def __repr__(self) -> str:
         """
@@ -150,6 +168,110 @@ class Options:
             )
         self._percentage_left_out = left_out
 
+    @property
+    def dtype(self) -> str:
+        """
+        Get the floating point precision.
+
+        Returns
+        -------
+        str
+            The floating point precision.
+        """
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, dtype: str) -> None:
+        """
+        Set the floating point precision. float32 halves the memory of the data and models, while reductions such as
+        means, standard deviations and norms are still accumulated in float64.
+
+        Parameters
+        ----------
+        dtype : str
+            The floating point precision to be set.
+
+        Raises
+        ------
+        ValueError
+            If the input floating point precision is not valid.
+        """
+        dtype_options = ["float64", "float32"]
+        if dtype not in dtype_options:
+            raise ValueError(f"Please input {', '.join(dtype_options)}. {dtype} was input")
+        self._dtype = dtype
+
+    @property
+    def n_workers(self) -> int:
+        """
+        Get the number of threads of row-wise preprocessing methods.
+
+        Returns
+        -------
+        int
+            The number of threads.
+        """
+        return self._n_workers
+
+    @n_workers.setter
+    def n_workers(self, n_workers: int) -> None:
+        """
+        Set the number of threads row-wise preprocessing methods, e.g. snv, msc, savitzky_golay, baseline and glog,
+        are applied on. The rows are split into blocks, which are transformed in parallel.
+
+        Parameters
+        ----------
+        n_workers : int
+            The number of threads to be set.
+
+        Raises
+        ------
+        TypeError
+            If the input value is not an integer.
+        ValueError
+            If the input value is smaller than 1.
+        """
+        if not isinstance(n_workers, int) or isinstance(n_workers, bool):
+            raise TypeError(f"Please input an integer. {n_workers} was input.")
+        if n_workers < 1:
+            raise ValueError(f"Please input an integer greater than 0. {n_workers} was input.")
+        self._n_workers = n_workers
+
+    @property
+    def block_size(self) -> int:
+        """
+        Get the number of elements of the blocks of rows distributed to the threads.
+
+        Returns
+        -------
+        int
+            The number of elements of a block.
+        """
+        return self._block_size
+
+    @block_size.setter
+    def block_size(self, block_size: int) -> None:
+        """
+        Set the number of elements of the blocks of rows distributed to the threads. A block holds at least one row.
+
+        Parameters
+        ----------
+        block_size : int
+            The number of elements of a block to be set.
+
+        Raises
+        ------
+        TypeError
+            If the input value is not an integer.
+        ValueError
+            If the input value is smaller than 1.
+        """
+        if not isinstance(block_size, int) or isinstance(block_size, bool):
+            raise TypeError(f"Please input an integer. {block_size} was input.")
+        if block_size < 1:
+            raise ValueError(f"Please input an integer greater than 0. {block_size} was input.")
+        self._block_size = block_size
+
 
 def dict_to_string_with_newline(d) -> str:
     """
@@ -7,7 +7,7 @@ from copy import deepcopy
 import pandas as pd
 
 from me3cs.framework.branch import Branch
-from me3cs.framework.data import Data
+from me3cs.framework.data import Data, count_false
 from me3cs.framework.helper_classes.options import Options
 from me3cs.framework.results import Results
 from me3cs.preprocessing.base import ScalingAttributes
@@ -259,12 +259,13 @@ class Log:
         self._model.options = model_entry.options
         self.branches = []
         if not self._model.single_branch:
-            self._model.x = Branch(model_entry.data[0], self.branches)
-            self._model.y = Branch(model_entry.data[1], self.branches)
+            self._model.x = Branch(model_entry.data[0], self.branches, self._model.options)
+            self._model.y = Branch(model_entry.data[1], self.branches, self._model.options)
             self.branches.append(self._model.x)
             self.branches.append(self._model.y)
+            self._model.x.preprocessing.response = self._model.y.data_class
         else:
-            self._model.x = Branch(model_entry.data[0], self.branches)
+            self._model.x = Branch(model_entry.data[0], self.branches, self._model.options)
             self.branches.append(self._model.x)
 
         [setattr(prep.preprocessing, "called", model_entry.prep[i]) for i, prep in enumerate(self.branches)]
@@ -455,7 +456,3 @@ class Summary:
         df = pd.DataFrame().from_dict(self.__dict__)
         df.columns = df.columns.str.replace("_", " ")
         return df
-
-
-def count_false(boolean: list[bool]) -> tuple:
-    return tuple(filter(lambda i: not boolean[i], range(len(boolean))))
@@ -1,6 +1,7 @@
 import typing
 
 import numpy as np
+import pandas as pd
 import scipy.interpolate as interpolate
 from scipy.signal import argrelextrema
 
@@ -60,6 +61,41 @@ class OutlierDetection:
         [branch.preprocessing.call_in_order() for branch in self._branches]
         call_model(self)
 
+    def remove_outliers_by_label(self, labels: [list, tuple, pd.Index, any]) -> None:
+        """
+        Removes the samples with the given row labels, e.g. sample IDs from the index of a pandas DataFrame.
+
+        Parameters
+        ----------
+        labels : list, tuple, pd.Index or a single label
+            The row labels of the samples to be removed.
+
+        Raises
+        ------
+        ValueError
+            If a label is not the label of a sample in the model.
+        """
+        row_labels = self._model.x.data_class.rows.total_labels
+        labels = pd.Index(labels if pd.api.types.is_list_like(labels) else [labels])
+        missing = labels.difference(row_labels)
+        if len(missing) > 0:
+            raise ValueError(f"The labels {', '.join(map(str, missing))} are not row labels of samples in the model")
+
+        self.remove_outliers(tuple(int(i) for i in np.flatnonzero(row_labels.isin(labels))))
+
+    @property
+    def removed_labels(self) -> pd.Index:
+        """
+        Returns the row labels of the samples removed as outliers.
+
+        Returns
+        -------
+        pd.Index
+            The row labels of the removed samples.
+        """
+        rows = self._model.x.data_class.rows
+        return rows.labels[~rows.outlier_detection]
+
     def remove_outlier_from_q_residuals(self, number_of_outliers_to_remove: int = 1):
         """
         Removes the specified number of outliers from the data based on the Q residuals for the optimal component.
@@ -160,7 +196,7 @@ class FindKnee:
 
     def find_knee(self) -> int:
         # If no
-        if not self.maxima_indices:
+        if not self.maxima_indices.any():
             return 0
 
         # placeholder for which threshold region i is located in.
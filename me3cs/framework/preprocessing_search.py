@@ -0,0 +1,377 @@
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from me3cs.cross_validation.cross_validation import CrossValidationRegression
+from me3cs.framework.helper_classes.options import Options
+from me3cs.framework.outlier_detection import choose_optimal_component
+from me3cs.metrics.regression.metrics import MetricsRegression
+from me3cs.misc.fingerprint import hash_object
+from me3cs.misc.preprocessing import emsc_design
+from me3cs.preprocessing.called import Called
+from me3cs.preprocessing.frozen import APPLY, FREEZE
+from me3cs.preprocessing.plan import SCALING_METHODS, SUPERVISED_METHODS
+from me3cs.preprocessing.preprocessing import Preprocessing2D
+from me3cs.preprocessing.scaling import Scaling
+
+if TYPE_CHECKING:
+    from me3cs.models.regression import TYPING_ALGORITHM_REGRESSION
+    from me3cs.metrics.regression import TYPING_RESULTS_REGRESSION
+
+# The names of the preprocessing methods a pipeline can consist of. Methods fitted to y are excluded, since the steps
+# of the pipelines are applied once to all samples, before the cross-validation split
+METHODS = tuple(qualname.split(".")[1] for qualname in FREEZE
+                if qualname.split(".")[1] not in SUPERVISED_METHODS)
+
+# The qualified names of the preprocessing methods, by their name
+QUALNAMES = {qualname.split(".")[1]: qualname for qualname in FREEZE}
+
+
+def _fit_msc(data: np.ndarray, reference: [np.ndarray, None]) -> dict:
+    if reference is None:
+        return {"reference": data.mean(axis=0, dtype=np.float64)}
+    return {"reference": np.asarray(reference, dtype=np.float64).reshape(-1)}
+
+
+def _fit_emsc(data: np.ndarray, poly_order: int, interferents: [np.ndarray, None],
+              reference: [np.ndarray, None]) -> dict:
+    reference = data.mean(axis=0, dtype=np.float64) if reference is None else reference
+    design = emsc_design(reference, poly_order, interferents)
+    return {"design": design, "inverse": np.linalg.pinv(design)}
+
+
+# The steps whose parameters are fitted to the data they are applied to, as the preprocessing methods do in
+# preprocess mode. Each entry computes the parameters of the step in APPLY from the data and the arguments of the
+# method
+FIT = {
+    "msc": _fit_msc,
+    "emsc": _fit_emsc,
+}
+
+
+def parse_step(step: [str, tuple]) -> tuple[str, tuple, dict]:
+    """
+    Parse a step of a pipeline into the name, positional arguments and keyword arguments of a preprocessing method.
+
+    Parameters
+    ----------
+    step : str or tuple
+        The name of the method, e.g. "snv", or a tuple of the name followed by a tuple of positional arguments and/or a
+        dict of keyword arguments, e.g. ("savitzky_golay", {"width": 15, "deriv": 2}).
+
+    Returns
+    -------
+    tuple[str, tuple, dict]
+        The name, positional arguments and keyword arguments of the method.
+
+    Raises
+    ------
+    ValueError
+        If the step is not a preprocessing method, or is fitted to y, e.g. osc.
+    """
+    if isinstance(step, str):
+        name, args, kwargs = step, (), {}
+    else:
+        name, args, kwargs = step[0], (), {}
+        for element in step[1:]:
+            if isinstance(element, dict):
+                kwargs = element
+            else:
+                args = tuple(element)
+
+    if name in SUPERVISED_METHODS:
+        raise ValueError(f"{name} is fitted to y, so it cannot be applied before the cross-validation split of the "
+                         f"search. Call it on the model before pls, or use the opls model")
+    if name not in METHODS:
+        raise ValueError(f"{name} is not a preprocessing method. Please input one of {', '.join(METHODS)}")
+    return name, args, kwargs
+
+
+def parse_pipeline(pipeline: [Called, list]) -> tuple[list[tuple[str, tuple, dict]], [str, None]]:
+    """
+    Parse a pipeline into its non-scaling steps, in the order they are applied, and its scaling method. As in the
+    preprocessing module, scaling is applied last, and only the last scaling method is used.
+
+    Parameters
+    ----------
+    pipeline : Called or list
+        The called methods of a preprocessing module, or a list of steps, see parse_step.
+
+    Returns
+    -------
+    tuple[list[tuple[str, tuple, dict]], str or None]
+        The non-scaling steps, and the name of the scaling method, or None.
+    """
+    if isinstance(pipeline, Called):
+        steps = [parse_step((function.__name__, args, kwargs))
+                 for function, args, kwargs in zip(pipeline.function, pipeline.args, pipeline.kwargs)]
+    else:
+        steps = [parse_step(step) for step in pipeline]
+
+    scaling = [name for name, _, _ in steps if name in SCALING_METHODS]
+    steps = [step for step in steps if step[0] not in SCALING_METHODS]
+    return steps, scaling[-1] if scaling else None
+
+
+def describe_pipeline(steps: list[tuple[str, tuple, dict]], scaling: [str, None]) -> str:
+    """
+    Returns a description of a pipeline, e.g. "savitzky_golay(15, deriv=2) -> snv -> autoscale".
+    """
+    def describe_argument(value: any) -> str:
+        return f"array{value.shape}" if isinstance(value, np.ndarray) else repr(value)
+
+    descriptions = []
+    for name, args, kwargs in steps:
+        arguments = [describe_argument(value) for value in args]
+        arguments += [f"{key}={describe_argument(value)}" for key, value in kwargs.items()]
+        descriptions.append(f"{name}({', '.join(arguments)})" if arguments else name)
+    if scaling is not None:
+        descriptions.append(scaling)
+    return " -> ".join(descriptions) if descriptions else "None"
+
+
+class TrieNode:
+    """
+    A node of a PrefixTrie, i.e. a step following the steps of its ancestors.
+
+    Attributes
+    ----------
+    step : tuple[str, tuple, dict] or None
+        The step of the node, None for the root.
+    children : dict[str, TrieNode]
+        The nodes of the steps following the step, by the fingerprint of their step.
+    leaves : list[tuple[int, str or None]]
+        The index and scaling method of every pipeline, whose non-scaling steps end with the step.
+    """
+    def __init__(self, step: [tuple[str, tuple, dict], None] = None) -> None:
+        self.step = step
+        self.children: dict[str, TrieNode] = {}
+        self.leaves: list[tuple[int, [str, None]]] = []
+
+
+class PrefixTrie:
+    """
+    A trie of the non-scaling steps of pipelines. Pipelines which start with the same steps share the nodes of these
+    steps, so each distinct prefix is only applied to the data once.
+    """
+    def __init__(self) -> None:
+        self.root = TrieNode()
+        self.n_nodes = 0
+
+    def insert(self, steps: list[tuple[str, tuple, dict]], index: int, scaling: [str, None]) -> None:
+        """
+        Insert the non-scaling steps of a pipeline.
+
+        Parameters
+        ----------
+        steps : list[tuple[str, tuple, dict]]
+            The non-scaling steps of the pipeline.
+        index : int
+            The index of the pipeline.
+        scaling : str or None
+            The scaling method of the pipeline.
+        """
+        node = self.root
+        for step in steps:
+            key = hash_object(step)
+            if key not in node.children:
+                node.children[key] = TrieNode(step)
+                self.n_nodes += 1
+            node = node.children[key]
+        node.leaves.append((index, scaling))
+
+    def walk(self, data: np.ndarray, visit) -> None:
+        """
+        Apply the steps of the trie to the data depth first, and call visit with the data of every pipeline. Only the
+        data of the current path is kept, besides any references kept by visit.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            The data the steps are applied to.
+        visit : function
+            Called as visit(index, scaling, data) for every pipeline, with the data its non-scaling steps are applied
+            to.
+        """
+        self._walk(self.root, data, visit)
+
+    def _walk(self, node: TrieNode, data: np.ndarray, visit) -> None:
+        for index, scaling in node.leaves:
+            visit(index, scaling, data)
+        for child in node.children.values():
+            self._walk(child, apply_step(data, child.step), visit)
+
+
+def apply_step(data: np.ndarray, step: tuple[str, tuple, dict]) -> np.ndarray:
+    """
+    Apply a step to the data in preprocess mode, as in the preprocessing module. The step is applied with the
+    functions of the frozen pipeline, so no preprocessing object is created for the nodes of the trie. The data is
+    not changed.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The data.
+    step : tuple[str, tuple, dict]
+        The name, positional arguments and keyword arguments of the preprocessing method.
+
+    Returns
+    -------
+    np.ndarray
+        The preprocessed data.
+    """
+    name, args, kwargs = step
+    arguments = inspect.signature(getattr(Preprocessing2D, name)).bind(None, *args, **kwargs)
+    arguments.apply_defaults()
+    arguments = dict(list(arguments.arguments.items())[1:])
+
+    step_name, freeze = FREEZE[QUALNAMES[name]]
+    parameters = FIT[name](data, **arguments) if name in FIT else freeze(None, data.dtype, **arguments)
+    return APPLY[step_name](data, None, **parameters)
+
+
+def evaluate_pipeline(
+        x: np.ndarray,
+        y: np.ndarray,
+        y_prep: np.ndarray,
+        y_called: Called,
+        pre_split_x: np.ndarray,
+        scaling: [str, None],
+        algorithm: "TYPING_ALGORITHM_REGRESSION",
+        reg_results: "TYPING_RESULTS_REGRESSION",
+        options: Options,
+) -> dict:
+    """
+    Scale the data of a pipeline, then cross-validate and calibrate a regression model on it, as the regression
+    pipeline of RegressionModel does.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The raw input data.
+    y : np.ndarray
+        The raw reference data.
+    y_prep : np.ndarray
+        The preprocessed reference data.
+    y_called : Called
+        The preprocessing methods of the reference data.
+    pre_split_x : np.ndarray
+        The input data with the non-scaling steps of the pipeline applied.
+    scaling : str or None
+        The scaling method of the pipeline.
+    algorithm : TYPING_ALGORITHM_REGRESSION
+        The regression algorithm.
+    reg_results : TYPING_RESULTS_REGRESSION
+        The results container for the algorithm.
+    options : Options
+        The options of the model.
+
+    Returns
+    -------
+    dict
+        The optimal number of components, and the calibration and cross-validation metrics at it.
+    """
+    prep = Scaling(pre_split_x)
+    if scaling is not None:
+        getattr(prep, scaling)()
+    x_prep = prep.data
+
+    cv = CrossValidationRegression(
+        x=x,
+        y=y,
+        called_preprocessing=(prep.called, y_called),
+        algorithm=algorithm,
+        n_components=options.n_components,
+        cv_type=options.cross_validation,
+        cv_metrics=MetricsRegression,
+        percentage_left_out=options.percentage_left_out,
+        pre_split_x=pre_split_x,
+        verbose=False,
+    )
+    model = algorithm(x=x_prep, y=y_prep, n_components=options.n_components)
+    calibration = reg_results(x_prep, y_prep, model)
+    n_components = choose_optimal_component(calibration.rmse, cv.results.rmse)
+
+    if n_components is None:
+        return {"opt comp": None, "rmsec": np.nan, "rmsecv": np.nan, "msecv": np.nan, "biascv": np.nan}
+    component = n_components - 1
+    return {
+        "opt comp": n_components,
+        "rmsec": float(np.ravel(calibration.rmse[component])[0]),
+        "rmsecv": float(np.ravel(cv.results.rmse[component])[0]),
+        "msecv": float(np.ravel(cv.results.mse[component])[0]),
+        "biascv": float(np.ravel(cv.results.bias[component])[0]),
+    }
+
+
+def search_preprocessing(
+        x: np.ndarray,
+        y: np.ndarray,
+        y_prep: np.ndarray,
+        y_called: Called,
+        pipelines: list,
+        algorithm: "TYPING_ALGORITHM_REGRESSION",
+        reg_results: "TYPING_RESULTS_REGRESSION",
+        options: Options,
+        n_jobs: [int, None] = None,
+) -> pd.DataFrame:
+    """
+    Cross-validate and calibrate a regression model for each of several preprocessing pipelines of the input data.
+    The non-scaling steps of the pipelines are arranged in a PrefixTrie, so steps shared by the start of several
+    pipelines are applied once. The cross-validation and calibration of the pipelines run on a thread pool, while
+    the trie is walked.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The raw input data.
+    y : np.ndarray
+        The raw reference data.
+    y_prep : np.ndarray
+        The preprocessed reference data.
+    y_called : Called
+        The preprocessing methods of the reference data.
+    pipelines : list
+        The pipelines, each the called methods of a preprocessing module or a list of steps, see parse_step.
+        Pipelines without a scaling method are mean centered if options.mean_center is True.
+    algorithm : TYPING_ALGORITHM_REGRESSION
+        The regression algorithm.
+    reg_results : TYPING_RESULTS_REGRESSION
+        The results container for the algorithm.
+    options : Options
+        The options of the model.
+    n_jobs : int or None, optional
+        The number of threads, by default None, which uses the default of concurrent.futures.ThreadPoolExecutor.
+
+    Returns
+    -------
+    pd.DataFrame
+        A row for each pipeline, ranked by the RMSECV at the optimal number of components. The "pipeline" column is
+        the index of the pipeline in pipelines.
+    """
+    trie = PrefixTrie()
+    descriptions = []
+    for index, pipeline in enumerate(pipelines):
+        steps, scaling = parse_pipeline(pipeline)
+        if scaling is None and options.mean_center:
+            scaling = "mean_center"
+        trie.insert(steps, index, scaling)
+        descriptions.append(describe_pipeline(steps, scaling))
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        def visit(index: int, scaling: [str, None], pre_split_x: np.ndarray) -> None:
+            futures[index] = executor.submit(
+                evaluate_pipeline, x, y, y_prep, y_called, pre_split_x, scaling, algorithm, reg_results, options
+            )
+        trie.walk(x, visit)
+        results = [{"pipeline": index, "x prep": descriptions[index], **futures[index].result()}
+                   for index in range(len(descriptions))]
+
+    table = pd.DataFrame(results, columns=["pipeline", "x prep", "opt comp", "rmsec", "rmsecv", "msecv", "biascv"])
+    table = table.sort_values("rmsecv", kind="stable", na_position="last").reset_index(drop=True)
+    table.index.name = "rank"
+    return table
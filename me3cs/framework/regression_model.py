@@ -1,17 +1,24 @@
+from functools import partial
 from typing import TYPE_CHECKING
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 from me3cs.cross_validation.cross_validation import CrossValidationRegression
 from me3cs.framework.base_model import BaseModel
 from me3cs.framework.outlier_detection import choose_optimal_component
+from me3cs.framework.preprocessing_search import search_preprocessing
+from me3cs.framework.helper_classes.handle_input import get_array_and_labels, is_arrow_table
 from me3cs.metrics.regression.diagnostics import DiagnosticsPLS
 from me3cs.metrics.regression.metrics import MetricsRegression
 from me3cs.metrics.regression.results import RegressionResults
 from me3cs.misc.handle_data import transform_array_1d_to_2d
-from me3cs.models.regression import MLR, PCR, PLS
-from me3cs.preprocessing.preprocessing import Preprocessing2D
+from me3cs.misc.sparse import any_nan
+from me3cs.models.regression import MLR, OPLS, PCR, PLS
+from me3cs.preprocessing.called import Called
+from me3cs.preprocessing.frozen import FrozenPipeline
+from me3cs.preprocessing.scaling import Scaling
 
 if TYPE_CHECKING:
     from me3cs.models.regression import TYPING_ALGORITHM_REGRESSION
@@ -20,7 +27,7 @@ if TYPE_CHECKING:
 
 class RegressionModel(BaseModel):
     """
-    Class for regression model analysis, including PLS, PCR, MLR.
+    Class for regression model analysis, including PLS, OPLS, PCR, MLR.
     """
 
     def pls(
@@ -45,6 +52,30 @@ class RegressionModel(BaseModel):
 
         self.__regresion_pileline__(algorithm=algorithm, reg_results=reg_results)
 
+    def opls(self, n_orthogonal: [int, None] = None) -> None:
+        """
+        Perform orthogonal projections to latent structures (OPLS) regression analysis. The y-orthogonal variation of
+        the preprocessed x is removed before a SIMPLS model is fitted, in the calibration and in each cross-validation
+        model, so fewer predictive components are needed. The orthogonal components are folded into the regression
+        matrix, so new data is predicted as with pls.
+
+        Parameters
+        ----------
+        n_orthogonal : int or None, optional
+            The number of orthogonal components to remove, default is None, which uses the number of the last OPLS
+            model, or 1. The model is recalculated with it, e.g. when outliers are removed.
+        """
+        if n_orthogonal is None:
+            n_orthogonal = getattr(self, "_n_orthogonal", 1)
+        if not isinstance(n_orthogonal, (int, np.integer)) or n_orthogonal < 1:
+            raise ValueError(f"n_orthogonal needs to be a positive integer. {n_orthogonal} was input")
+        # Get algorithm
+        algorithm = partial(OPLS, n_orthogonal=n_orthogonal)
+        reg_results = RegressionResults["OPLS"]
+        self._n_orthogonal = n_orthogonal
+
+        self.__regresion_pileline__(algorithm=algorithm, reg_results=reg_results, model_type="OPLS")
+
     def pcr(self):
         """
         Perform principal component regression (PCR) analysis.
@@ -73,38 +104,138 @@ class RegressionModel(BaseModel):
         # TODO: implement svm algorithm
         pass
 
-    def predict(self, new_data: [pd.DataFrame, np.ndarray]) -> np.ndarray:
+    def predict(
+            self, new_data: [pd.DataFrame, np.ndarray, sparse.spmatrix]
+    ) -> [np.ndarray, pd.Series, pd.DataFrame]:
+        """
+        Predict the response of new data with the model at the optimal number of components. The new data is
+        preprocessed as the data of the model.
+
+        Parameters
+        ----------
+        new_data : pd.DataFrame, pyarrow.Table, np.ndarray or scipy.sparse.spmatrix
+            The new data, with the variables of the raw data of the model.
+
+        Returns
+        -------
+        np.ndarray, pd.Series or pd.DataFrame
+            The predicted response. For a DataFrame or an Arrow table it is labelled with the row labels of the new
+            data and the labels of y, as a Series for a single response and a DataFrame otherwise.
+        """
         if self.results.calibration is None:
             raise ValueError("A model is needed to predict from")
 
-        if isinstance(new_data, pd.DataFrame):
-            new_data = new_data.values
-        if not isinstance(new_data, np.ndarray):
-            raise TypeError("Data should be a pandas DataFrame or numpy ndarray")
-
-        variable_index = self.x.data_class.variables.total
-
-        if new_data.flatten().shape == new_data.shape:
-            x = transform_array_1d_to_2d(new_data)
-            x = x[variable_index, :].T
-        else:
-            x = new_data[:, variable_index]
+        row_labels = None
+        if isinstance(new_data, pd.DataFrame) or is_arrow_table(new_data) or sparse.issparse(new_data):
+            new_data, row_labels, _ = get_array_and_labels(new_data)
+        if not isinstance(new_data, np.ndarray) and not sparse.issparse(new_data):
+            raise TypeError("Data should be a pandas DataFrame, an Arrow table, a numpy ndarray or a scipy sparse "
+                            "matrix")
 
-        prep = Preprocessing2D(x, "predict")
-        prep.called = self.x.preprocessing.called
-        prep.scaling_attributes = self.x.preprocessing.scaling_attributes
-        prep.call_in_order()
+        x = self._frozen_preprocessing().transform(new_data)
 
         reg = self.results.calibration.reg
         opt_compoments = self.results.optimal_number_component - 1
 
-        prediction = prep.data @ transform_array_1d_to_2d(reg[:, opt_compoments]) \
+        prediction = x @ transform_array_1d_to_2d(reg[:, opt_compoments]) \
                      + self.y.preprocessing.scaling_attributes.mean
 
-        return prediction
+        if row_labels is None:
+            return prediction
+
+        response_labels = self.y.data_class.variables.total_labels
+        if prediction.shape[1] == 1:
+            return pd.Series(prediction[:, 0], index=row_labels, name=response_labels[0])
+        return pd.DataFrame(prediction, index=row_labels, columns=response_labels)
+
+    def search_preprocessing(
+            self,
+            pipelines: list,
+            algorithm: str = "SIMPLS",
+            n_jobs: [int, None] = None,
+    ) -> pd.DataFrame:
+        """
+        Compare preprocessing pipelines of x with partial least squares (PLS) regression. Each pipeline is
+        cross-validated and calibrated as by pls, while the preprocessing of the model is left unchanged. Steps shared
+        by the start of several pipelines are only applied once, and the pipelines are cross-validated in parallel.
+
+        Parameters
+        ----------
+        pipelines : list
+            The pipelines. Each is the called methods of a preprocessing module, e.g. model.x.preprocessing.called, or
+            a list of steps, where a step is the name of a preprocessing method, or a tuple of the name followed by
+            a tuple of positional arguments and/or a dict of keyword arguments, e.g.
+            [("savitzky_golay", {"deriv": 2}), "snv", "autoscale"].
+        algorithm : str, optional
+            PLS algorithm to use, default is "SIMPLS". Implemented algorithms are SIMPLS and NIPALS
+        n_jobs : int or None, optional
+            The number of threads the pipelines are cross-validated on, by default None, which uses the default of
+            concurrent.futures.ThreadPoolExecutor.
+
+        Returns
+        -------
+        pd.DataFrame
+            A row for each pipeline with the optimal number of components and the metrics at it, ranked by RMSECV.
+        """
+        if algorithm not in list(PLS.keys()):
+            raise ValueError(
+                f"Please input {list(PLS.keys())} as algorithm. {algorithm} was input"
+            )
+        self._apply_options()
+
+        x = self.x.data_class.get_raw_data()
+        y = self.y.data_class.get_raw_data()
+
+        if any_nan(x):
+            raise ValueError("x contains missing values. Use the missing_data module to adress the problem")
+
+        if any_nan(y):
+            raise ValueError("y contains missing values. Use the missing_data module to adress the problem")
+
+        # Mean center a copy of y as pls would, so the preprocessing of the model is left unchanged
+        y_prep, y_called = self.y.data, self.y.preprocessing.called
+        if not self.y.preprocessing.data_is_centered:
+            if self.options.mean_center:
+                y_scaling = Scaling(y_prep)
+                y_scaling.mean_center()
+                y_prep = y_scaling.data
+                y_called = Called(
+                    y_called.function + y_scaling.called.function,
+                    y_called.args + y_scaling.called.args,
+                    y_called.kwargs + y_scaling.called.kwargs,
+                )
+
+        return search_preprocessing(
+            x=x,
+            y=y,
+            y_prep=y_prep,
+            y_called=y_called,
+            pipelines=pipelines,
+            algorithm=PLS[algorithm],
+            reg_results=RegressionResults["PLS"],
+            options=self.options,
+            n_jobs=n_jobs,
+        )
+
+    def _frozen_preprocessing(self) -> FrozenPipeline:
+        """
+        Returns the preprocessing of x as a FrozenPipeline, which selects the variables of the model. The pipeline is
+        cached until the data or the called preprocessing methods change, or a new model is made.
+
+        Returns
+        -------
+        FrozenPipeline
+            The frozen preprocessing of x.
+        """
+        fingerprint = self.x.data_class.fingerprint
+        cached = getattr(self, "_frozen", None)
+        if cached is None or cached[0] != fingerprint:
+            frozen = self.x.preprocessing.freeze(variables=self.x.data_class.variables.total)
+            cached = self._frozen = fingerprint, frozen
+        return cached[1]
 
     def __regresion_pileline__(self, algorithm: "TYPING_ALGORITHM_REGRESSION",
-                               reg_results: "TYPING_RESULTS_REGRESSION") -> None:
+                               reg_results: "TYPING_RESULTS_REGRESSION", model_type: str = "PLS") -> None:
         """
         Perform regression analysis using the provided algorithm and store the results in the RegressionModel instance.
 
@@ -114,15 +245,21 @@ class RegressionModel(BaseModel):
             The regression algorithm to use.
         reg_results : REGRESSION_RESULTS_TYPES
             The results container for the specific algorithm.
+        model_type : str, optional
+            The name of the method of the model, which is logged and called again when the data changes, default is
+            "PLS".
         """
+        self._apply_options()
+        self._frozen = None
+
         # Get raw data
         x = self.x.data_class.get_raw_data()
         y = self.y.data_class.get_raw_data()
 
-        if np.isnan(x).any():
+        if any_nan(x):
             raise ValueError("x contains missing values. Use the missing_data module to adress the problem")
 
-        if np.isnan(y).any():
+        if any_nan(y):
             raise ValueError("y contains missing values. Use the missing_data module to adress the problem")
 
         # mean center if not mean centered
@@ -162,7 +299,7 @@ class RegressionModel(BaseModel):
         diagnostics = DiagnosticsPLS(x_prep, calibration_results)
         n_components = choose_optimal_component(calibration_results.rmse, cv.results.rmse)
 
-        self.log.log_object.last_model_called = "PLS"
+        self.log.log_object.last_model_called = model_type
 
         # Set calibration and cross-validation results
         setattr(self.results, "cross_validation", cv.results)
@@ -26,7 +26,8 @@ class VariableSelection:
         if not (isinstance(range_min, int) and isinstance(range_max, int)):
             raise TypeError("Inputs need to be ints")
 
-        variables = tuple(i for i in range(self._model.x.data.shape[1]))
+        # The positions refer to the kept variables of the raw data, which preprocessing, e.g. bin, does not change
+        variables = tuple(i for i in range(self._model.x.data_class.variables.length_of_rows))
         outlier_index = tuple(val for val in variables if val < range_min or val > range_max)
         self._model.x.data_class.remove_columns("outlier_detection", outlier_index)
         self._model.x.preprocessing.call_in_order()
@@ -3,6 +3,7 @@ import numpy as np
 from me3cs.framework.helper_classes.options import dict_to_string_with_newline
 from me3cs.misc.metrics import explained_variance, rmse, mse, bias
 from me3cs.models.regression.mlr import MLR
+from me3cs.models.regression.opls import OPLS
 from me3cs.models.regression.pcr import PCR
 from me3cs.models.regression.pls import SIMPLS, NIPALS
 
@@ -64,7 +65,7 @@ class ResultsPLS(ResultsRegression):
             results: [SIMPLS, NIPALS],
     ):
         self.reg = results.reg
-        self.y_hat = np.dot(x, results.reg)
+        self.y_hat = x @ results.reg
         self.rmse = rmse(y, self.y_hat)
         self.mse = mse(y, self.y_hat)
         self.bias = bias(y, self.y_hat)
@@ -81,6 +82,38 @@ class ResultsPLS(ResultsRegression):
         self.cum_explained_var_x = np.cumsum(self.explained_var_x)
 
 
+class ResultsOPLS(ResultsPLS):
+    """
+    Class for storing and calculating the results of OPLS regression. The attributes of ResultsPLS are computed from
+    the regression matrix of the unfiltered data, and the weights and loadings of the filtered data.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Input data.
+    y : np.ndarray
+        Output data.
+    results : OPLS
+        Regression results object containing scores, loadings and the orthogonal components.
+
+    Attributes
+    ----------
+    orthogonal_weights : np.ndarray
+        Matrix of the weights of the orthogonal components.
+    orthogonal_loadings : np.ndarray
+        Matrix of the loadings of the orthogonal components.
+    """
+    def __init__(
+            self,
+            x: np.ndarray,
+            y: np.ndarray,
+            results: OPLS,
+    ):
+        super().__init__(x, y, results)
+        self.orthogonal_weights = results.orthogonal_weights
+        self.orthogonal_loadings = results.orthogonal_loadings
+
+
 class ResultsMLR:
     """
     Class for storing and calculating the results of MLR regression.
@@ -116,7 +149,7 @@ class ResultsMLR:
             results: MLR,
     ):
         self.__dict__.update(results.__dict__)
-        self.y_hat = np.dot(x, results.reg)
+        self.y_hat = x @ results.reg
         self.rmse = rmse(y, self.y_hat)
         self.mse = mse(y, self.y_hat)
         self.bias = bias(y, self.y_hat)
@@ -132,7 +165,7 @@ class ResultsPCR:
     ):
         self.__dict__.update(results.__dict__)
 
-        self.y_hat = np.dot(x, results.reg)
+        self.y_hat = x @ results.reg
         self.rmse = rmse(y, self.y_hat)
         self.mse = mse(y, self.y_hat)
         self.bias = bias(y, self.y_hat)
@@ -144,6 +177,7 @@ class ResultsSVM:
 
 RegressionResults = {
     "PLS": ResultsPLS,
+    "OPLS": ResultsOPLS,
     "MLR": ResultsMLR,
     "PCR": ResultsPCR,
     "SVM": ResultsSVM,
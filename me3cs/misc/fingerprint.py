@@ -0,0 +1,107 @@
+import hashlib
+
+import numpy as np
+from scipy import sparse
+
+DIGEST_SIZE = 16
+
+
+def new_hash() -> "hashlib._Hash":
+    """
+    Returns a new hash object, which all fingerprints are computed with.
+
+    Returns
+    -------
+    hashlib._Hash
+        A BLAKE2b hash object.
+    """
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def hash_array(data: [np.ndarray, sparse.spmatrix], block_size: int = 4096) -> str:
+    """
+    Computes a fingerprint of the contents of an array. The data type and shape are included, so arrays with the same
+    bytes but different layouts have different fingerprints. Arrays are hashed one block of rows at a time, so
+    memory-mapped arrays are not loaded into memory. Sparse matrices are hashed through their CSR components.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or scipy.sparse.spmatrix
+        The array to hash.
+    block_size : int, optional
+        The number of rows hashed at a time, by default 4096.
+
+    Returns
+    -------
+    str
+        The fingerprint as a hexadecimal string.
+    """
+    hash_object = new_hash()
+    hash_object.update(f"{'sparse' if sparse.issparse(data) else 'dense'}{data.dtype.str}{data.shape}".encode())
+    if sparse.issparse(data):
+        data = sparse.csr_matrix(data)
+        for component in (data.data, data.indices, data.indptr):
+            hash_object.update(np.ascontiguousarray(component).tobytes())
+        return hash_object.hexdigest()
+
+    data = np.asarray(data)
+    if data.ndim == 0:
+        hash_object.update(data.tobytes())
+        return hash_object.hexdigest()
+    for start in range(0, data.shape[0], block_size):
+        hash_object.update(np.ascontiguousarray(data[start: start + block_size]).tobytes())
+    return hash_object.hexdigest()
+
+
+def hash_object(obj: any) -> str:
+    """
+    Computes a fingerprint of an argument of a recorded function call. Arrays are hashed by their contents, functions
+    by their qualified name, and containers element by element. Any other object is hashed by its representation.
+
+    Parameters
+    ----------
+    obj : any
+        The object to hash.
+
+    Returns
+    -------
+    str
+        The fingerprint as a hexadecimal string.
+    """
+    hash_object_ = new_hash()
+    if isinstance(obj, np.ndarray) or sparse.issparse(obj):
+        hash_object_.update(hash_array(obj).encode())
+    elif callable(obj):
+        hash_object_.update(f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}".encode())
+    elif isinstance(obj, (list, tuple)):
+        hash_object_.update(type(obj).__name__.encode())
+        for element in obj:
+            hash_object_.update(hash_object(element).encode())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            hash_object_.update(repr(key).encode())
+            hash_object_.update(hash_object(obj[key]).encode())
+    else:
+        hash_object_.update(repr(obj).encode())
+    return hash_object_.hexdigest()
+
+
+def combine(*fingerprints: str) -> str:
+    """
+    Combines fingerprints into a single fingerprint. The order of the fingerprints matters.
+
+    Parameters
+    ----------
+    *fingerprints : str
+        The fingerprints to combine.
+
+    Returns
+    -------
+    str
+        The combined fingerprint as a hexadecimal string.
+    """
+    hash_object_ = new_hash()
+    for fingerprint in fingerprints:
+        hash_object_.update(fingerprint.encode())
+        hash_object_.update(b"\x00")
+    return hash_object_.hexdigest()
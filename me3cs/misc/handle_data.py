@@ -1,4 +1,9 @@
+import tempfile
+
 import numpy as np
+from scipy import sparse
+
+FLOAT_DTYPES = (np.dtype("float64"), np.dtype("float32"))
 
 
 def transform_array_1d_to_2d(data: np.ndarray) -> np.ndarray:
@@ -72,3 +77,56 @@ def handle_zeros_in_scale(
         if scale < 10 * np.finfo(float).eps:
             scale = 1.0
     return scale
+
+
+def scratch_memmap(shape: tuple[int, ...], dtype: [np.dtype, type] = float) -> np.memmap:
+    """
+    Allocate a writeable memory-mapped array in an anonymous temporary file. The file is removed by the operating
+    system, when the array is garbage collected.
+
+    Parameters
+    ----------
+    shape : tuple[int, ...]
+        The shape of the array.
+    dtype : numpy.dtype or type, optional
+        The data type of the array, by default float.
+
+    Returns
+    -------
+    numpy.memmap
+        The memory-mapped array.
+    """
+    with tempfile.TemporaryFile() as file:
+        return np.memmap(file, dtype=dtype, mode="w+", shape=shape)
+
+
+def as_float_array(data: np.ndarray, block_size: int = 4096) -> np.ndarray:
+    """
+    Return the data as an array of floats. Arrays of float32 or float64 are returned without a copy, any other data
+    type is converted to float64. Memory-mapped arrays are converted into a scratch memory-mapped array, one block of
+    rows at a time. Sparse matrices are kept sparse.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data to convert.
+    block_size : int, optional
+        The number of rows converted at a time for memory-mapped arrays, by default 4096.
+
+    Returns
+    -------
+    numpy.ndarray
+        The data as an array of floats.
+    """
+    if sparse.issparse(data):
+        return data if data.dtype in FLOAT_DTYPES else data.astype(float)
+    if not isinstance(data, np.memmap):
+        data = np.asarray(data)
+        return data if data.dtype in FLOAT_DTYPES else data.astype(float)
+    if data.dtype in FLOAT_DTYPES:
+        return data
+
+    new = scratch_memmap(data.shape, float)
+    for start in range(0, data.shape[0], block_size):
+        new[start: start + block_size] = data[start: start + block_size]
+    return new
@@ -1,7 +1,9 @@
 import numpy as np
 import scipy.stats as st
+from scipy import sparse
 
 from me3cs.misc.handle_data import handle_zeros_in_scale
+from me3cs.misc.sparse import CenteredSparse, is_sparse, row_squared_norms
 
 
 def normalise(data: np.ndarray) -> np.ndarray:
@@ -206,12 +208,43 @@ def q_residuals(residual_matrix: np.ndarray) -> np.ndarray:
     Returns
     -------
     np.ndarray
-        An array containing the Q-residuals for each observation in the residual matrix.
+        An array containing the Q-residuals for each observation in the residual matrix. The sums of squares are
+        accumulated in float64.
     """
-    results = np.einsum('ijk,ijk->ik', residual_matrix, residual_matrix)
+    results = np.einsum('ijk,ijk->ik', residual_matrix, residual_matrix, dtype=np.float64)
     return results
 
 
+def q_residuals_from_scores(x: [np.ndarray, sparse.spmatrix, CenteredSparse], scores: np.ndarray,
+                            loadings: np.ndarray) -> np.ndarray:
+    """
+    Computes the Q-residuals for each number of components from the data, scores and loadings, without forming the
+    residual matrix. The squared norm of the residuals is expanded as |x|² - 2·Σ t(x·p) + |Σ t·p|², so only products
+    of the data with the loadings are needed. Used for sparse data, which would otherwise be made dense.
+
+    Parameters
+    ----------
+    x : np.ndarray, scipy.sparse.spmatrix or CenteredSparse
+        The input data.
+    scores : np.ndarray
+        The scores of shape (n_samples, n_components).
+    loadings : np.ndarray
+        The loadings of shape (n_features, n_components).
+
+    Returns
+    -------
+    np.ndarray
+        The Q-residuals of shape (n_samples, n_components), in float64.
+    """
+    scores = scores.astype(np.float64)
+    loadings = loadings.astype(np.float64)
+    x_norms = row_squared_norms(x) if is_sparse(x) else np.einsum("ij,ij->i", x, x, dtype=np.float64)
+    cross = np.cumsum(scores * (x @ loadings), axis=1)
+    gram = loadings.T @ loadings
+    reconstruction = np.cumsum(np.square(scores) * np.diag(gram) + 2 * scores * (scores @ np.triu(gram, 1)), axis=1)
+    return x_norms[:, None] - 2 * cross + reconstruction
+
+
 def latent_variable(scores: np.ndarray, loadings: np.ndarray) -> np.ndarray:
     """
     Computes the estimated matrix of data from a given set of scores and loadings.
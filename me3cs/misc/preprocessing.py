@@ -1,10 +1,45 @@
+from functools import lru_cache
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft, sparse
+from scipy.interpolate import CubicSpline
+from scipy.ndimage import convolve1d
+from scipy.signal import firwin
 
 from me3cs.misc.handle_data import handle_zeros_in_scale
 
+# The number of Savitzky-Golay coefficient vectors kept in memory
+SAVGOL_CACHE_SIZE = 128
+# Windows at least this wide are convolved through the FFT, where it is faster than the direct convolution
+FFT_MIN_WIDTH = 51
+# The number of elements transformed at a time by the FFT convolution
+FFT_BLOCK_ELEMENTS = 1 << 20
+SAVGOL_METHODS = ("auto", "direct", "fft")
+# The number of elements of the scratch array of glog
+SCRATCH_ELEMENTS = 1 << 16
+BIN_METHODS = ("mean", "sum")
+# The number of taps of the anti-alias filter of resampling per unit of the factor, as in scipy.signal.decimate
+RESAMPLE_TAPS_PER_FACTOR = 20
+INTERPOLATION_METHODS = ("linear", "cubic")
+# The number of interpolation operators kept in memory
+INTERPOLATION_CACHE_SIZE = 32
+# Weights of the cubic spline operator smaller than this are dropped. The weights decay geometrically with the
+# distance from the target, so only a few dozen weights per target are kept
+SPLINE_TOLERANCE = 1e-12
+# The number of source variables the cubic spline operator is computed for at a time
+SPLINE_BLOCK_SIZE = 256
+# The central difference stencils of the derivatives of the segment derivatives, for a spacing of one variable
+DERIVATIVE_STENCILS = {
+    1: np.array([-1, 0, 1]) / 2,
+    2: np.array([1, -2, 1]),
+    3: np.array([-1, 2, 0, -2, 1]) / 2,
+    4: np.array([1, -4, 6, -4, 1]),
+}
+
 
 def savgol_coefficients(
-    width: int, polyorder: int, deriv: int, delta: int
+    width: int, polyorder: int, deriv: int, delta: int, dtype: [np.dtype, type] = float
 ) -> np.ndarray:
     """
     Computes Savitzky-Golay filter coefficients for the given parameters.
@@ -19,6 +54,8 @@ def savgol_coefficients(
         The order of the derivative to compute.
     delta : int
         The spacing of the data points.
+    dtype : numpy.dtype or type, optional
+        The data type of the coefficients, by default float. The coefficients are always computed in float64.
 
     Returns
     -------
@@ -37,6 +74,12 @@ def savgol_coefficients(
     .. [1] Savitzky, A., Golay, M. J. E. (1964). Smoothing and Differentiation of Data by
            Simplified Least Squares Procedures. Analytical Chemistry, 36(8), 1627–1639.
     """
+    return _savgol_coefficients(width, polyorder, deriv, delta).astype(dtype)
+
+
+@lru_cache(maxsize=SAVGOL_CACHE_SIZE)
+def _savgol_coefficients(width: int, polyorder: int, deriv: int, delta: int) -> np.ndarray:
+    # The coefficients are cached, so they are shared between calls and must not be changed
     halflen, rem = divmod(width, 2)
     x = np.arange(-halflen, width - halflen, dtype=float)
 
@@ -49,11 +92,177 @@ def savgol_coefficients(
 
     # Find the least-squares solution of A*c = y
     coeffs, _, _, _ = np.linalg.lstsq(A, y, rcond=None)
+    coeffs.flags.writeable = False
     return coeffs
 
 
+def baseline_projector(
+    polyorder: int, value_range: tuple[int, int], n_variables: int, dtype: [np.dtype, type] = float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the factors of the projector of a polynomial baseline. The polynomial is fitted by least squares to the
+    variables in value_range, and evaluated at every variable. The coefficients of each spectrum are the product of
+    the fitted variables with the fit inverse, and its baseline the product of the coefficients with the Vandermonde
+    matrix, so the cost is linear in the number of variables.
+
+    Parameters
+    ----------
+    polyorder : int
+        The order of the polynomial.
+    value_range : tuple[int, int]
+        The range of the variables the polynomial is fitted to.
+    n_variables : int
+        The number of variables.
+    dtype : numpy.dtype or type, optional
+        The data type of the factors, by default float. The factors are always computed in float64.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The Vandermonde matrix of shape (n_variables, polyorder + 1), and the fit inverse of shape
+        (polyorder + 1, value_range[1] - value_range[0]).
+    """
+    min_range, max_range = value_range
+    vandermonde, fit_inverse = _baseline_projector(polyorder, min_range, max_range, n_variables)
+    return vandermonde.astype(dtype), fit_inverse.astype(dtype)
+
+
+@lru_cache(maxsize=SAVGOL_CACHE_SIZE)
+def _baseline_projector(polyorder: int, min_range: int, max_range: int, n_variables: int) -> tuple[np.ndarray, ...]:
+    # The factors are cached, so they are shared between calls and must not be changed
+    fit_abscissa = np.linspace(min_range, 1, max_range)
+    full_abscissa = np.linspace(0, 1, n_variables)
+
+    fit_vandermonde = np.polynomial.polynomial.polyvander(fit_abscissa, polyorder)
+    full_vandermonde = np.polynomial.polynomial.polyvander(full_abscissa, polyorder)
+
+    # The columns are scaled to unit norm before the pseudo-inverse, as in numpy.polynomial.polynomial.polyfit
+    column_norms = handle_zeros_in_scale(np.sqrt(np.square(fit_vandermonde).sum(axis=0)))
+    fit_inverse = np.linalg.pinv(fit_vandermonde / column_norms) / column_norms[:, None]
+
+    full_vandermonde.flags.writeable = False
+    fit_inverse.flags.writeable = False
+    return full_vandermonde, fit_inverse
+
+
+def emsc_design(
+    reference: np.ndarray, poly_order: int = 2, interferents: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Computes the design matrix of Extended Multiplicative Scatter Correction (EMSC). Its columns are the reference
+    spectrum, a polynomial of the variables, and the interferent spectra.
+
+    Parameters
+    ----------
+    reference : numpy.ndarray
+        The reference spectrum of shape (n_features,).
+    poly_order : int, optional
+        The order of the polynomial, by default 2. The polynomial is evaluated on variables spaced evenly from -1 to 1.
+    interferents : numpy.ndarray or None, optional
+        Spectra of shape (n_interferents, n_features) or (n_features,), whose contributions are removed, by default
+        None.
+
+    Returns
+    -------
+    numpy.ndarray
+        The design matrix of shape (n_features, 2 + poly_order + n_interferents), in float64.
+
+    Raises
+    ------
+    ValueError
+        If poly_order is negative, or if the interferents do not have n_features variables.
+    """
+    if poly_order < 0:
+        raise ValueError(f"poly_order needs to be a non-negative integer, not {poly_order}")
+    reference = np.asarray(reference, dtype=np.float64).reshape(-1)
+    abscissa = np.linspace(-1, 1, reference.shape[0])
+    columns = [reference[:, None], np.polynomial.polynomial.polyvander(abscissa, poly_order)]
+
+    if interferents is not None:
+        interferents = np.atleast_2d(np.asarray(interferents, dtype=np.float64))
+        if interferents.shape[1] != reference.shape[0]:
+            raise ValueError(f"interferents need to have {reference.shape[0]} variables, not {interferents.shape[1]}")
+        columns.append(interferents.T)
+    return np.concatenate(columns, axis=1)
+
+
+def clipped_log10(data: np.ndarray, out: [np.ndarray, None] = None) -> np.ndarray:
+    """
+    Take the logarithm base 10 of the data, with negative values clipped to zero.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The input data.
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The logarithm of the data.
+    """
+    out = np.clip(data, 0, None, out=out)
+    return np.log10(out, out=out)
+
+
+def glog(data: np.ndarray, out: [np.ndarray, None] = None, lambd: float = 1.00e-09, data_0: float = 0) -> np.ndarray:
+    """
+    Apply the generalized logarithm, log((data - data_0) + sqrt((data - data_0)² + lambd)), to the data. It is
+    computed in the equivalent form arcsinh((data - data_0) / sqrt(lambd)) + log(lambd) / 2, since the sum cancels to
+    zero for negative values much larger than sqrt(lambd). Each block is computed in a float64 scratch array of at
+    most SCRATCH_ELEMENTS elements, and cast back to the data type of out.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The input data.
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data.
+    lambd : float, optional
+        Regularisation parameter, by default 1.00e-09.
+    data_0 : float, optional
+        Value to shift the data with, by default 0.
+
+    Returns
+    -------
+    numpy.ndarray
+        The generalized logarithm of the data.
+    """
+    out = np.subtract(data, data_0, out=out)
+    flat = out.reshape(out.shape[0], -1) if out.ndim > 1 else out.reshape(1, -1)
+    rows_per_block = max(1, SCRATCH_ELEMENTS // max(1, flat.shape[1]))
+    for start in range(0, flat.shape[0], rows_per_block):
+        block = flat[start: start + rows_per_block]
+        scratch = np.multiply(block, 1 / np.sqrt(lambd), dtype=np.float64)
+        np.arcsinh(scratch, out=scratch)
+        np.add(scratch, 0.5 * np.log(lambd), out=scratch)
+        np.copyto(block, scratch, casting="same_kind")
+    return out
+
+
+def t2a(data: np.ndarray, out: [np.ndarray, None] = None) -> np.ndarray:
+    """
+    Transform the data to absorbance values, log10(1 / data).
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The input data, e.g. transmittance or reflectance values.
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The absorbance values.
+    """
+    out = np.divide(1, data, out=out)
+    return np.log10(out, out=out)
+
+
 def preprocessing_scaling(
-    data: np.ndarray, constant: np.ndarray, scale: [np.ndarray, float]
+    data: np.ndarray, constant: np.ndarray, scale: [np.ndarray, float], out: [np.ndarray, None] = None
 ) -> np.ndarray:
     """
     Scale the input data and center it.
@@ -68,11 +277,14 @@ def preprocessing_scaling(
     scale : numpy.ndarray or float
         Array of scaling factors used to scale the data. If a scalar is provided, it will be
         broadcasted to match the number of features in the data.
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data, in
+        which case the data is scaled in place.
 
     Returns
     -------
     numpy.ndarray
-        Scaled and centered data.
+        Scaled and centered data, with the data type of the input data.
 
     Notes
     -----
@@ -81,9 +293,582 @@ def preprocessing_scaling(
     """
     dim = data.ndim - 1
     if np.isscalar(constant):
-        constant = np.asarray([constant for _ in range(data.shape[dim])])
+        constant = np.full(data.shape[dim], constant)
     if np.isscalar(scale):
-        scale = np.asarray([scale for _ in range(data.shape[dim])])
+        scale = np.full(data.shape[dim], scale)
 
     scale = handle_zeros_in_scale(scale)
-    return (data + constant) / scale
+    if out is None:
+        return (data + constant.astype(data.dtype, copy=False)) / scale.astype(data.dtype, copy=False)
+    np.add(data, constant.astype(data.dtype, copy=False), out=out)
+    return np.divide(out, scale.astype(data.dtype, copy=False), out=out)
+
+
+def snv(data: np.ndarray, out: [np.ndarray, None] = None) -> np.ndarray:
+    """
+    Center each row of the data and divide it by its standard deviation, i.e. Standard Normal Variate (SNV) scaling.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The scaled data.
+    """
+    constant = -data.mean(axis=1, dtype=np.float64)
+    scale = handle_zeros_in_scale(data.std(axis=1, dtype=np.float64))
+
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    preprocessing_scaling(data.T, constant, scale, out=out.T)
+    return out
+
+
+def msc(data: np.ndarray, reference: np.ndarray, out: [np.ndarray, None] = None) -> np.ndarray:
+    """
+    Perform Multiplicative Scatter Correction (MSC) of each row of the data against a reference spectrum. The offset
+    and slope of every row are computed in closed form, from the products of the rows with the centered reference.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    reference : numpy.ndarray
+        The reference spectrum of shape (n_features,), in float64.
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The corrected data.
+    """
+    # Least squares fit of data = offset + slope * reference for every row
+    reference_mean = reference.mean()
+    reference_centered = reference - reference_mean
+    slope = (data @ reference_centered.astype(data.dtype)).astype(np.float64) / (
+        reference_centered @ reference_centered
+    )
+    offset = data.mean(axis=1, dtype=np.float64) - slope * reference_mean
+
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    preprocessing_scaling(data.T, -offset, slope, out=out.T)
+    return out
+
+
+def emsc(
+    data: np.ndarray, design: np.ndarray, inverse: np.ndarray, out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Perform Extended Multiplicative Scatter Correction (EMSC) of each row of the data. The rows are fitted with the
+    pseudo-inverse of the design matrix, the fitted polynomial and interferents are subtracted, and the rows are
+    divided by the fitted scale of the reference.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    design : numpy.ndarray
+        The design matrix of shape (n_features, n_columns), see emsc_design.
+    inverse : numpy.ndarray
+        The pseudo-inverse of the design matrix, of shape (n_columns, n_features).
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It must not overlap the data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The corrected data.
+    """
+    coefficients = (data @ inverse.T.astype(data.dtype)).astype(np.float64)
+
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    np.matmul(coefficients[:, 1:].astype(data.dtype), design[:, 1:].T.astype(data.dtype), out=out)
+    np.subtract(data, out, out=out)
+    return np.divide(out, handle_zeros_in_scale(coefficients[:, 0])[:, None].astype(data.dtype), out=out)
+
+
+def normalise(data: np.ndarray, norm: str = "l2", out: [np.ndarray, None] = None) -> np.ndarray:
+    """
+    Divide each row of the data by its norm.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    norm : str, optional
+        The norm of the rows, either "l1", "l2" or "max", by default "l2".
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the input data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The normalised data.
+    """
+    match norm:
+        case "l1":
+            norms = np.abs(data).sum(axis=1, dtype=np.float64)
+        case "l2":
+            norms = np.sqrt(np.square(data, dtype=np.float64).sum(axis=1))
+        case "max":
+            norms = np.abs(data).max(axis=1).astype(np.float64)
+    scale = handle_zeros_in_scale(norms)
+
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    preprocessing_scaling(data.T, 0.0, scale, out=out.T)
+    return out
+
+
+def baseline(
+    data: np.ndarray, projector: tuple[np.ndarray, np.ndarray], value_range: tuple[int, int], fit_type: str = "data",
+    out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Subtract a polynomial baseline from each row of the data, see baseline_projector.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    projector : tuple[numpy.ndarray, numpy.ndarray]
+        The Vandermonde matrix and fit inverse of the baseline, in the data type of the data.
+    value_range : tuple[int, int]
+        The range of the variables the polynomial is fitted to.
+    fit_type : str, optional
+        "data" fits the polynomial to each row, "mean" to the mean of the rows, by default "data".
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It must not overlap the data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The corrected data.
+    """
+    min_range, max_range = value_range
+    vandermonde, fit_inverse = projector
+
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    if fit_type == "data":
+        fitted = np.matmul(data[:, min_range:max_range] @ fit_inverse.T, vandermonde.T, out=out)
+    else:
+        fitted = vandermonde @ (fit_inverse @ data[:, min_range:max_range].mean(axis=0, dtype=np.float64))
+    return np.subtract(data, fitted, out=out)
+
+
+def savgol_filter(
+    data: np.ndarray, width: int, polyorder: int, deriv: [int, tuple[int, ...]], delta: int = 1,
+    method: str = "auto", out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Filter each row of the data with a Savitzky-Golay filter. The edges are extended by reflection, as in
+    scipy.ndimage.convolve1d.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    width : int
+        The window size of the filter.
+    polyorder : int
+        The order of the polynomial to fit to the data.
+    deriv : int or tuple[int, ...]
+        The order of the derivative to compute. If several orders are given, they are all computed, and through the
+        FFT the data is only transformed once for all of them.
+    delta : int, optional
+        The spacing of the data points, by default 1.
+    method : str, optional
+        "direct" convolves the data directly, "fft" through the FFT, and "auto", by default, uses the FFT for windows
+        at least FFT_MIN_WIDTH wide.
+    out : numpy.ndarray or None, optional
+        Contiguous array the result is written to, by default None, which allocates a new array. It must not overlap
+        the data, and needs the shape of the result.
+
+    Returns
+    -------
+    numpy.ndarray
+        The filtered data, with the data type of the input data. If several derivative orders are given, the filtered
+        data of each order is stacked along the first axis, into shape (n_derivs, n_samples, n_features).
+
+    Raises
+    ------
+    ValueError
+        If method is not "auto", "direct" or "fft".
+    """
+    derivs = (deriv,) if np.isscalar(deriv) else tuple(deriv)
+    coeffs = [savgol_coefficients(width, polyorder, order, delta, dtype=data.dtype) for order in derivs]
+    stacked = convolve_rows(data, np.stack(coeffs), method, out=out)
+    return stacked[0] if np.isscalar(deriv) else stacked
+
+
+def convolve_rows(
+    data: np.ndarray, kernels: np.ndarray, method: str = "auto", out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Convolve each row of the data with each of the kernels. The edges are extended by reflection, as in
+    scipy.ndimage.convolve1d.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    kernels : numpy.ndarray
+        The kernels of shape (n_kernels, width), in the data type of the data.
+    method : str, optional
+        "direct" convolves the data directly, "fft" through the FFT, and "auto", by default, uses the FFT for kernels
+        at least FFT_MIN_WIDTH wide.
+    out : numpy.ndarray or None, optional
+        Contiguous array the result is written to, by default None, which allocates a new array. It must not overlap
+        the data, and needs the shape of the result.
+
+    Returns
+    -------
+    numpy.ndarray
+        The convolved data of shape (n_kernels, n_samples, n_features).
+
+    Raises
+    ------
+    ValueError
+        If method is not "auto", "direct" or "fft".
+    """
+    if method not in SAVGOL_METHODS:
+        raise ValueError(f"method needs to be one of {' or '.join(SAVGOL_METHODS)}. {method} was input")
+
+    width = kernels.shape[1]
+    if method == "auto":
+        method = "fft" if FFT_MIN_WIDTH <= width <= data.shape[1] else "direct"
+
+    if out is None:
+        out = np.empty((kernels.shape[0], *data.shape), dtype=data.dtype)
+    stacked = out.reshape(kernels.shape[0], *data.shape)
+
+    if method == "direct":
+        for kernel, filtered in zip(kernels, stacked):
+            convolve1d(data, kernel, output=filtered)
+    else:
+        _fft_convolve(data, kernels, stacked)
+    return stacked
+
+
+def _fft_convolve(data: np.ndarray, kernels: np.ndarray, new: np.ndarray) -> None:
+    # Convolves each row with each kernel into new, with the edges extended by reflection. Each block of rows is
+    # transformed once, and multiplied with the transform of every kernel.
+    n_kernels, width = kernels.shape
+    halflen = width // 2
+    n_features = data.shape[1]
+    length = fft.next_fast_len(n_features + 2 * halflen + width - 1, real=True)
+    kernel_transforms = fft.rfft(kernels, length, axis=1)
+
+    rows_per_block = max(1, FFT_BLOCK_ELEMENTS // length)
+    for start in range(0, data.shape[0], rows_per_block):
+        block = np.pad(data[start: start + rows_per_block], ((0, 0), (halflen, halflen)), mode="symmetric")
+        transform = fft.rfft(block, length, axis=1)
+        for i, kernel_transform in enumerate(kernel_transforms):
+            convolved = fft.irfft(transform * kernel_transform, length, axis=1)
+            new[i, start: start + rows_per_block] = convolved[:, width - 1: width - 1 + n_features]
+
+
+def bin_variables(data: np.ndarray, width: int, method: str = "mean", out: [np.ndarray, None] = None) -> np.ndarray:
+    """
+    Combine each run of width neighbouring variables into a single variable, by their mean or sum. If the number of
+    variables is not divisible by width, the last bin holds the remaining variables. The sums are accumulated in
+    float64.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    width : int
+        The number of variables of each bin.
+    method : str, optional
+        "mean" or "sum", by default "mean".
+    out : numpy.ndarray or None, optional
+        Array of shape (n_samples, ceil(n_features / width)) the result is written to, by default None, which
+        allocates a new array.
+
+    Returns
+    -------
+    numpy.ndarray
+        The binned data, with the data type of the input data.
+
+    Raises
+    ------
+    ValueError
+        If method is not "mean" or "sum".
+    """
+    if method not in BIN_METHODS:
+        raise ValueError(f"method needs to be one of {' or '.join(BIN_METHODS)}. {method} was input")
+
+    n_samples, n_features = data.shape
+    n_bins = -(-n_features // width)
+    if n_features % width == 0:
+        sums = data.reshape(n_samples, n_bins, width).sum(axis=2, dtype=np.float64)
+    else:
+        sums = np.add.reduceat(data, np.arange(0, n_features, width), axis=1, dtype=np.float64)
+
+    out = np.empty((n_samples, n_bins), dtype=data.dtype) if out is None else out
+    if method == "sum":
+        np.copyto(out, sums, casting="same_kind")
+        return out
+    counts = np.full(n_bins, width, dtype=np.float64)
+    counts[-1] = n_features - width * (n_bins - 1)
+    return np.divide(sums, counts, out=out, casting="same_kind")
+
+
+def resample_kernel(factor: int, dtype: [np.dtype, type] = float) -> np.ndarray:
+    """
+    Computes the anti-alias filter of resampling by an integer factor, a Hamming windowed low-pass FIR filter with
+    the cutoff at the new Nyquist frequency and unit gain, as in scipy.signal.decimate.
+
+    Parameters
+    ----------
+    factor : int
+        The resampling factor.
+    dtype : numpy.dtype or type, optional
+        The data type of the filter, by default float. The filter is always computed in float64.
+
+    Returns
+    -------
+    numpy.ndarray
+        The symmetric filter of shape (RESAMPLE_TAPS_PER_FACTOR * factor + 1,).
+    """
+    return _resample_kernel(factor).astype(dtype)
+
+
+@lru_cache(maxsize=SAVGOL_CACHE_SIZE)
+def _resample_kernel(factor: int) -> np.ndarray:
+    # The filter is cached, so it is shared between calls and must not be changed
+    kernel = firwin(RESAMPLE_TAPS_PER_FACTOR * factor + 1, 1 / factor, window="hamming")
+    kernel.flags.writeable = False
+    return kernel
+
+
+def resample_variables(
+    data: np.ndarray, kernel: np.ndarray, factor: int, out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Keep every factor-th variable of the data, starting with the first, after filtering each row with the
+    anti-alias filter. The filter is only evaluated at the kept variables, by accumulating one tap at a time over
+    strided views of the data. The edges are extended by reflection, as in scipy.ndimage.convolve1d.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    kernel : numpy.ndarray
+        The symmetric anti-alias filter of odd length, see resample_kernel, in the data type of the data.
+    factor : int
+        The resampling factor.
+    out : numpy.ndarray or None, optional
+        Array of shape (n_samples, ceil(n_features / factor)) the result is written to, by default None, which
+        allocates a new array. It must not overlap the data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The resampled data, with the data type of the input data.
+    """
+    n_samples, n_features = data.shape
+    n_kept = -(-n_features // factor)
+    halflen = kernel.shape[0] // 2
+    padded = np.pad(data, ((0, 0), (halflen, halflen)), mode="symmetric")
+
+    out = np.empty((n_samples, n_kept), dtype=data.dtype) if out is None else out
+    out.fill(0)
+    product = np.empty_like(out)
+    stop = factor * (n_kept - 1) + 1
+    for tap, coefficient in enumerate(kernel):
+        np.multiply(padded[:, tap: tap + stop: factor], coefficient, out=product)
+        np.add(out, product, out=out)
+    return out
+
+
+def interpolation_matrix(
+    source_axis: np.ndarray, target_axis: np.ndarray, method: str = "linear", dtype: [np.dtype, type] = float
+) -> sparse.csr_matrix:
+    """
+    Computes a sparse operator, which interpolates spectra sampled at the source axis onto the target axis. Targets
+    outside the source axis get the value of the nearest end, as in numpy.interp. The operators are cached for each
+    pair of axes and method, so only the first call with a pair of axes builds the operator.
+
+    Parameters
+    ----------
+    source_axis : numpy.ndarray
+        The axis the spectra are sampled at, e.g. the wavelengths, of shape (n_source,). It may be increasing or
+        decreasing, but its values need to be distinct.
+    target_axis : numpy.ndarray
+        The axis the spectra are interpolated onto, of shape (n_target,).
+    method : str, optional
+        "linear" for linear interpolation, or "cubic" for a not-a-knot cubic spline, as
+        scipy.interpolate.CubicSpline, by default "linear".
+    dtype : numpy.dtype or type, optional
+        The data type of the operator, by default float. The operator is always computed in float64.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        The operator of shape (n_target, n_source). The interpolated spectra are the product of the operator with the
+        spectra.
+
+    Raises
+    ------
+    ValueError
+        If method is not "linear" or "cubic", or if the source axis has fewer than two or repeated values.
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"method needs to be one of {' or '.join(INTERPOLATION_METHODS)}. {method} was input")
+    source = np.ascontiguousarray(source_axis, dtype=np.float64).reshape(-1)
+    target = np.ascontiguousarray(target_axis, dtype=np.float64).reshape(-1)
+    if source.shape[0] < 2:
+        raise ValueError(f"source_axis needs at least two values, not {source.shape[0]}")
+    return _interpolation_matrix(source.tobytes(), target.tobytes(), method).astype(dtype, copy=False)
+
+
+@lru_cache(maxsize=INTERPOLATION_CACHE_SIZE)
+def _interpolation_matrix(source_bytes: bytes, target_bytes: bytes, method: str) -> sparse.csr_matrix:
+    # The operator is cached, so it is shared between calls and must not be changed
+    source, target = np.frombuffer(source_bytes), np.frombuffer(target_bytes)
+    n_source, n_target = source.shape[0], target.shape[0]
+
+    order = np.argsort(source, kind="stable")
+    sorted_source = source[order]
+    if np.any(np.diff(sorted_source) == 0):
+        raise ValueError("source_axis needs to have distinct values")
+    target = np.clip(target, sorted_source[0], sorted_source[-1])
+
+    if method == "linear":
+        right = np.clip(np.searchsorted(sorted_source, target, side="right"), 1, n_source - 1)
+        left = right - 1
+        weight = (target - sorted_source[left]) / (sorted_source[right] - sorted_source[left])
+        targets = np.arange(n_target)
+        operator = sparse.csr_matrix(
+            (np.concatenate([1 - weight, weight]), (np.tile(targets, 2), np.concatenate([order[left], order[right]]))),
+            shape=(n_target, n_source),
+        )
+    else:
+        # The spline is linear in the spectra, so the weights of the source variables are the splines of the unit
+        # vectors
+        blocks = []
+        for start in range(0, n_source, SPLINE_BLOCK_SIZE):
+            size = min(SPLINE_BLOCK_SIZE, n_source - start)
+            unit_vectors = np.zeros((n_source, size))
+            unit_vectors[start + np.arange(size), np.arange(size)] = 1
+            weights = CubicSpline(sorted_source, unit_vectors, axis=0)(target)
+            weights[np.abs(weights) < SPLINE_TOLERANCE] = 0
+            blocks.append(sparse.csc_matrix(weights))
+        operator = sparse.hstack(blocks, format="csc")
+        inverse_order = np.empty_like(order)
+        inverse_order[order] = np.arange(n_source)
+        operator = operator[:, inverse_order].tocsr()
+
+    operator.sum_duplicates()
+    operator.eliminate_zeros()
+    return operator
+
+
+def interpolate_variables(
+    data: np.ndarray, operator: sparse.csr_matrix, out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Interpolate each row of the data onto a new axis with an operator from interpolation_matrix, as a single sparse
+    product.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_source).
+    operator : scipy.sparse.csr_matrix
+        The operator of shape (n_target, n_source), in the data type of the data.
+    out : numpy.ndarray or None, optional
+        Array of shape (n_samples, n_target) the result is written to, by default None, which allocates a new array.
+
+    Returns
+    -------
+    numpy.ndarray
+        The interpolated data, with the data type of the input data.
+    """
+    out = np.empty((data.shape[0], operator.shape[0]), dtype=data.dtype) if out is None else out
+    np.copyto(out, (operator @ data.T).T, casting="same_kind")
+    return out
+
+
+def segment_derivative(
+    data: np.ndarray, segment: int, spacing: int, deriv: int = 1, out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Compute the derivative of each row of the data from the means of segments of neighbouring variables, as in the
+    gap-segment and Norris-Williams derivatives. The segment means are differences of the cumulative sum of the rows,
+    and the derivative a central difference of the means spaced spacing variables apart, over a sliding window view,
+    so the cost does not depend on the segment size or spacing. The edges are extended by reflection, as in
+    savgol_filter.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    segment : int
+        The odd number of variables of each segment.
+    spacing : int
+        The number of variables between the centres of neighbouring segments of the difference.
+    deriv : int, optional
+        The order of the derivative, from 1 to 4, by default 1.
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It must not overlap the data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The derivative, in units of the variable spacing, with the data type of the input data.
+    """
+    stencil = DERIVATIVE_STENCILS[deriv] / spacing ** deriv
+    half_window = (len(stencil) // 2) * spacing
+    pad = half_window + segment // 2
+    n_variables = data.shape[1]
+
+    # The derivatives do not depend on the level of the rows, so the first variable is subtracted to keep the
+    # cumulative sums small
+    padded = np.pad(data, ((0, 0), (pad, pad)), mode="symmetric").astype(np.float64)
+    padded -= padded[:, :1]
+    cumulative = np.zeros((padded.shape[0], padded.shape[1] + 1))
+    np.cumsum(padded, axis=1, out=cumulative[:, 1:])
+    means = (cumulative[:, segment:] - cumulative[:, :-segment]) / segment
+
+    windows = sliding_window_view(means, 2 * half_window + 1, axis=1)[:, :n_variables, ::spacing]
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    np.copyto(out, windows @ stencil, casting="same_kind")
+    return out
+
+
+def orthogonal_filter(
+    data: np.ndarray, weights: np.ndarray, loadings: np.ndarray, offset: np.ndarray, out: [np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Remove orthogonal components, e.g. from orthogonal signal correction, from each row of the data with two matrix
+    products. The scores of the rows are data @ weights - offset, and the filtered data is data - scores @ loadings.T.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    weights : numpy.ndarray
+        The weights of the components, of shape (n_features, n_components), in terms of the unfiltered data.
+    loadings : numpy.ndarray
+        The loadings of the components, of shape (n_features, n_components).
+    offset : numpy.ndarray
+        The scores of the mean the components were computed around, of shape (n_components,).
+    out : numpy.ndarray or None, optional
+        Array the result is written to, by default None, which allocates a new array. It may be the data itself.
+
+    Returns
+    -------
+    numpy.ndarray
+        The filtered data, with the data type of the input data.
+    """
+    scores = data @ weights - offset
+    out = np.empty(data.shape, dtype=data.dtype) if out is None else out
+    np.subtract(data, scores @ loadings.T, out=out, casting="same_kind")
+    return out
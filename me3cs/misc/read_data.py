@@ -0,0 +1,83 @@
+import numpy as np
+
+
+def read_npy(path: str, mmap_mode: [str, None] = "r") -> np.ndarray:
+    """
+    Read an array from a .npy file. By default the array is memory-mapped, so it is read from disk when it is used
+    instead of being loaded into memory.
+
+    Parameters
+    ----------
+    path : str
+        The path to the .npy file.
+    mmap_mode : str or None, optional
+        The mode used to memory-map the file, see `numpy.load`. None loads the array into memory, by default "r".
+
+    Returns
+    -------
+    numpy.ndarray
+        The array, as a numpy.memmap if mmap_mode is not None.
+    """
+    return np.load(path, mmap_mode=mmap_mode)
+
+
+def read_hdf5(path: str, key: str) -> np.ndarray:
+    """
+    Read a dataset from an HDF5 file. Contiguous and uncompressed datasets are memory-mapped directly from the file.
+    Chunked or compressed datasets are loaded into memory. Requires the optional dependency h5py.
+
+    Parameters
+    ----------
+    path : str
+        The path to the HDF5 file.
+    key : str
+        The name of the dataset in the file.
+
+    Returns
+    -------
+    numpy.ndarray
+        The dataset, as a read-only numpy.memmap if it can be memory-mapped.
+
+    Raises
+    ------
+    ImportError
+        If h5py is not installed.
+    """
+    try:
+        import h5py
+    except ImportError as error:
+        raise ImportError("Reading HDF5 files requires h5py. Install it with 'pip install h5py'") from error
+
+    with h5py.File(path, "r") as file:
+        dataset = file[key]
+        offset = dataset.id.get_offset()
+        if offset is None or dataset.chunks is not None or dataset.compression is not None:
+            return dataset[()]
+        return np.memmap(path, dtype=dataset.dtype, mode="r", offset=offset, shape=dataset.shape)
+
+
+def read_parquet(path: str) -> any:
+    """
+    Read a Parquet file into an Arrow table. Requires the optional dependency pyarrow.
+
+    Parameters
+    ----------
+    path : str
+        The path to the Parquet file.
+
+    Returns
+    -------
+    pyarrow.Table
+        The table read from the file.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("Reading Parquet files requires pyarrow. Install it with 'pip install pyarrow'") from error
+
+    return pq.read_table(path)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator, aslinearoperator
+
+from me3cs.misc.handle_data import handle_zeros_in_scale
+
+
+class CenteredSparse(LinearOperator):
+    """
+    A sparse matrix with column offsets subtracted implicitly, X - 1·offsetᵀ. The offsets are never broadcast into
+    the matrix, so centering sparse data keeps it sparse. Products with dense arrays are computed from the sparse
+    matrix and corrected with the offsets.
+
+    Parameters
+    ----------
+    matrix : scipy.sparse.spmatrix
+        The sparse matrix.
+    offset : numpy.ndarray
+        The offset subtracted from each column.
+
+    Attributes
+    ----------
+    matrix : scipy.sparse.csr_matrix
+        The sparse matrix.
+    offset : numpy.ndarray
+        The offset subtracted from each column.
+    """
+
+    def __init__(self, matrix: sparse.spmatrix, offset: np.ndarray) -> None:
+        self.matrix = sparse.csr_matrix(matrix)
+        self.offset = np.broadcast_to(np.asarray(offset, dtype=self.matrix.dtype), (self.matrix.shape[1],)).copy()
+        super().__init__(self.matrix.dtype, self.matrix.shape)
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    def _matmat(self, other: np.ndarray) -> np.ndarray:
+        return np.asarray(self.matrix @ other) - self.offset @ other
+
+    def _matvec(self, other: np.ndarray) -> np.ndarray:
+        return self._matmat(other.reshape(-1, 1)).reshape(-1)
+
+    def _rmatmat(self, other: np.ndarray) -> np.ndarray:
+        return np.asarray(self.matrix.T @ other) - np.outer(self.offset, other.sum(axis=0))
+
+    def _rmatvec(self, other: np.ndarray) -> np.ndarray:
+        return self._rmatmat(other.reshape(-1, 1)).reshape(-1)
+
+    def _adjoint(self) -> LinearOperator:
+        return LinearOperator(self.dtype, self.shape[::-1], matvec=self._rmatvec, rmatvec=self._matvec,
+                              matmat=self._rmatmat, rmatmat=self._matmat)
+
+    def astype(self, dtype: [str, np.dtype]) -> CenteredSparse:
+        """
+        Returns the centered matrix in another data type.
+
+        Parameters
+        ----------
+        dtype : str or numpy.dtype
+            The data type.
+
+        Returns
+        -------
+        CenteredSparse
+            The centered matrix in the data type.
+        """
+        if np.dtype(dtype) == self.dtype:
+            return self
+        return CenteredSparse(self.matrix.astype(dtype), self.offset.astype(dtype))
+
+    def toarray(self) -> np.ndarray:
+        """
+        Returns the centered matrix as a dense array.
+
+        Returns
+        -------
+        numpy.ndarray
+            The dense centered matrix.
+        """
+        return self.matrix.toarray() - self.offset
+
+
+def is_sparse(data: any) -> bool:
+    """
+    Check if the data is a scipy sparse matrix or an implicitly centered sparse matrix.
+
+    Parameters
+    ----------
+    data : any
+        The data to check.
+
+    Returns
+    -------
+    bool
+        True if the data is sparse.
+    """
+    return sparse.issparse(data) or isinstance(data, CenteredSparse)
+
+
+def as_linear_operator(data: [np.ndarray, sparse.spmatrix, CenteredSparse]) -> LinearOperator:
+    """
+    Return the data as a linear operator, e.g. for the iterative solvers of scipy.sparse.linalg.
+
+    Parameters
+    ----------
+    data : numpy.ndarray, scipy.sparse.spmatrix or CenteredSparse
+        The data.
+
+    Returns
+    -------
+    LinearOperator
+        The data as a linear operator.
+    """
+    if isinstance(data, LinearOperator):
+        return data
+    return aslinearoperator(data)
+
+
+def any_nan(data: [np.ndarray, sparse.spmatrix, CenteredSparse]) -> bool:
+    """
+    Check if any value of dense or sparse data is NaN. For sparse data only the stored values are checked, since the
+    values which are not stored are zeros.
+
+    Parameters
+    ----------
+    data : numpy.ndarray, scipy.sparse.spmatrix or CenteredSparse
+        The data.
+
+    Returns
+    -------
+    bool
+        True if any value is NaN.
+    """
+    if not is_sparse(data):
+        return bool(np.isnan(data).any())
+    matrix = data.matrix if isinstance(data, CenteredSparse) else data.tocsr()
+    return bool(np.isnan(matrix.data).any() or np.isnan(getattr(data, "offset", 0.0)).any())
+
+
+def sparse_column_statistic(data: [sparse.spmatrix, CenteredSparse], statistic: str) -> np.ndarray:
+    """
+    Compute a statistic of each column of sparse data, without converting it to a dense array. The mean and standard
+    deviation are accumulated in float64.
+
+    Parameters
+    ----------
+    data : scipy.sparse.spmatrix or CenteredSparse
+        The sparse data.
+    statistic : str
+        The statistic, either "mean", "std" or "median".
+
+    Returns
+    -------
+    numpy.ndarray
+        The statistic of each column.
+
+    Raises
+    ------
+    ValueError
+        If the statistic is not "mean", "std" or "median".
+    """
+    if isinstance(data, CenteredSparse):
+        # The offset shifts the location of the columns, but not their spread
+        value = sparse_column_statistic(data.matrix, statistic)
+        return value if statistic == "std" else value - data.offset
+
+    n_rows = data.shape[0]
+    match statistic:
+        case "mean":
+            return np.asarray(data.sum(axis=0, dtype=np.float64)).ravel() / n_rows
+        case "std":
+            mean = np.asarray(data.sum(axis=0, dtype=np.float64)).ravel() / n_rows
+            mean_of_squares = np.asarray(data.multiply(data).sum(axis=0, dtype=np.float64)).ravel() / n_rows
+            return np.sqrt(np.maximum(mean_of_squares - np.square(mean), 0))
+        case "median":
+            data = sparse.csc_matrix(data)
+            median = np.zeros(data.shape[1])
+            for column in np.flatnonzero(np.diff(data.indptr) >= n_rows / 2):
+                values = data.data[data.indptr[column]: data.indptr[column + 1]]
+                values = np.concatenate([values, np.zeros(n_rows - values.shape[0], dtype=values.dtype)])
+                median[column] = np.median(values)
+            return median
+    raise ValueError(f"statistic needs to be mean, std or median. {statistic} was input")
+
+
+def sparse_scaling(data: [sparse.spmatrix, CenteredSparse], constant: [np.ndarray, float],
+                   scale: [np.ndarray, float]) -> CenteredSparse:
+    """
+    Compute (data + constant) / scale for sparse data. The columns of the sparse matrix are scaled, and the constant
+    is kept as an implicit offset, so the result stays sparse.
+
+    Parameters
+    ----------
+    data : scipy.sparse.spmatrix or CenteredSparse
+        The sparse data.
+    constant : numpy.ndarray or float
+        Constant added to each column.
+    scale : numpy.ndarray or float
+        Scale each column is divided by.
+
+    Returns
+    -------
+    CenteredSparse
+        The scaled data, with the constant as offset.
+    """
+    if isinstance(data, CenteredSparse):
+        matrix, offset = data.matrix, data.offset
+    else:
+        matrix, offset = sparse.csr_matrix(data), np.zeros(data.shape[1], dtype=data.dtype)
+
+    inverse_scale = np.broadcast_to(1 / np.asarray(scale, dtype=np.float64), (matrix.shape[1],))
+    new_matrix = (matrix @ sparse.diags(inverse_scale)).astype(matrix.dtype)
+    new_offset = (offset - np.asarray(constant, dtype=np.float64)) * inverse_scale
+    return CenteredSparse(new_matrix, new_offset)
+
+
+def sparse_normalise(data: sparse.spmatrix, norm: str = "l2") -> sparse.csr_matrix:
+    """
+    Divide each row of sparse data by its norm. The rows are scaled, so the data stays sparse.
+
+    Parameters
+    ----------
+    data : scipy.sparse.spmatrix
+        The sparse data.
+    norm : str, optional
+        The norm of the rows, either "l1", "l2" or "max", by default "l2".
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        The normalised data, in the data type of the data.
+    """
+    absolute = abs(sparse.csr_matrix(data))
+    match norm:
+        case "l1":
+            norms = absolute.sum(axis=1, dtype=np.float64)
+        case "l2":
+            norms = np.sqrt(absolute.multiply(absolute).sum(axis=1, dtype=np.float64))
+        case "max":
+            norms = absolute.max(axis=1).toarray()
+    scale = handle_zeros_in_scale(np.asarray(norms, dtype=np.float64).ravel())
+    return sparse.csr_matrix(sparse.diags(1 / scale) @ data).astype(data.dtype, copy=False)
+
+
+def row_squared_norms(data: [sparse.spmatrix, CenteredSparse]) -> np.ndarray:
+    """
+    Compute the squared norm of each row of sparse data, in float64.
+
+    Parameters
+    ----------
+    data : scipy.sparse.spmatrix or CenteredSparse
+        The sparse data.
+
+    Returns
+    -------
+    numpy.ndarray
+        The squared norm of each row.
+    """
+    matrix = data.matrix if isinstance(data, CenteredSparse) else sparse.csr_matrix(data)
+    norms = np.asarray(matrix.multiply(matrix).sum(axis=1, dtype=np.float64)).ravel()
+    if isinstance(data, CenteredSparse):
+        # |m - o|² = |m|² - 2 (m - o)·o - |o|²
+        offset = data.offset.astype(np.float64)
+        norms = norms - 2 * (data @ offset) - offset @ offset
+    return norms
@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import numpy as np
+
+# Medians of data with at most this many elements are computed exactly, and of larger data with a QuantileSketch
+EXACT_MEDIAN_ELEMENTS = 1 << 24
+SKETCH_COMPRESSION = 1000
+
+
+class RunningMoments:
+    """
+    Column means and variances accumulated over blocks of rows. The blocks are combined with the parallel algorithm of
+    Chan et al., so the moments of two accumulators can be merged, e.g. when the blocks are read by different workers.
+    The moments are accumulated in float64.
+
+    Attributes
+    ----------
+    count : int
+        The number of rows accumulated.
+    mean : numpy.ndarray or None
+        The mean of each column.
+    m2 : numpy.ndarray or None
+        The sum of squared deviations from the mean of each column.
+    minimum : numpy.ndarray or None
+        The minimum of each column.
+    maximum : numpy.ndarray or None
+        The maximum of each column.
+
+    References
+    ----------
+    Chan, Tony F., Gene H. Golub, and Randall J. LeVeque. "Updating formulae and a pairwise algorithm for computing
+    sample variances." COMPSTAT 1982 (1982): 30-41.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean: [np.ndarray, None] = None
+        self.m2: [np.ndarray, None] = None
+        self.minimum: [np.ndarray, None] = None
+        self.maximum: [np.ndarray, None] = None
+
+    def update(self, block: np.ndarray) -> RunningMoments:
+        """
+        Add a block of rows to the moments.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A block of rows, with the same number of columns as the previous blocks.
+
+        Returns
+        -------
+        RunningMoments
+            The updated accumulator.
+        """
+        block = np.asarray(block)
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        if block.shape[0] == 0:
+            return self
+
+        other = RunningMoments()
+        other.count = block.shape[0]
+        other.mean = block.mean(axis=0, dtype=np.float64)
+        other.m2 = np.square(block - other.mean, dtype=np.float64).sum(axis=0)
+        other.minimum = block.min(axis=0).astype(np.float64)
+        other.maximum = block.max(axis=0).astype(np.float64)
+        return self.merge(other)
+
+    def merge(self, other: RunningMoments) -> RunningMoments:
+        """
+        Merge the moments of another accumulator into this one.
+
+        Parameters
+        ----------
+        other : RunningMoments
+            The accumulator to merge.
+
+        Returns
+        -------
+        RunningMoments
+            The updated accumulator.
+
+        Raises
+        ------
+        ValueError
+            If the accumulators do not have the same number of columns.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean, self.m2 = other.mean.copy(), other.m2.copy()
+            self.minimum, self.maximum = other.minimum.copy(), other.maximum.copy()
+            return self
+        if other.mean.shape != self.mean.shape:
+            raise ValueError(f"The number of columns ({other.mean.shape[0]}) does not match the accumulated columns "
+                             f"({self.mean.shape[0]})")
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + np.square(delta) * (self.count * other.count / count)
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+        self.count = count
+        return self
+
+    def variance(self, ddof: int = 0) -> np.ndarray:
+        """
+        Returns the variance of each column.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            The delta degrees of freedom, by default 0.
+
+        Returns
+        -------
+        numpy.ndarray
+            The variance of each column.
+        """
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof: int = 0) -> np.ndarray:
+        """
+        Returns the standard deviation of each column.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            The delta degrees of freedom, by default 0.
+
+        Returns
+        -------
+        numpy.ndarray
+            The standard deviation of each column.
+        """
+        return np.sqrt(self.variance(ddof))
+
+
+class RunningCrossProducts:
+    """
+    Cross-products of x with itself and with y, accumulated over blocks of rows. The co-moments around the means are
+    accumulated with the parallel algorithm of Chan et al., so the centered cross-products do not suffer from the
+    cancellation of the uncentered sums. The cross-products are accumulated in float64.
+
+    Attributes
+    ----------
+    count : int
+        The number of rows accumulated.
+    x_mean : numpy.ndarray or None
+        The mean of each column of x.
+    y_mean : numpy.ndarray or None
+        The mean of each column of y.
+    xx : numpy.ndarray or None
+        The co-moment of x around its mean, of shape (n_features, n_features).
+    xy : numpy.ndarray or None
+        The co-moment of x and y around their means, of shape (n_features, n_response).
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.x_mean: [np.ndarray, None] = None
+        self.y_mean: [np.ndarray, None] = None
+        self.xx: [np.ndarray, None] = None
+        self.xy: [np.ndarray, None] = None
+
+    def update(self, x_block: np.ndarray, y_block: [np.ndarray, None] = None) -> RunningCrossProducts:
+        """
+        Add a block of rows to the cross-products.
+
+        Parameters
+        ----------
+        x_block : numpy.ndarray
+            A block of rows of x.
+        y_block : numpy.ndarray, optional
+            The same block of rows of y, by default None.
+
+        Returns
+        -------
+        RunningCrossProducts
+            The updated accumulator.
+        """
+        x_block = np.asarray(x_block, dtype=np.float64)
+        if x_block.shape[0] == 0:
+            return self
+
+        other = RunningCrossProducts()
+        other.count = x_block.shape[0]
+        other.x_mean = x_block.mean(axis=0)
+        x_centered = x_block - other.x_mean
+        other.xx = x_centered.T @ x_centered
+        if y_block is not None:
+            y_block = np.asarray(y_block, dtype=np.float64).reshape(x_block.shape[0], -1)
+            other.y_mean = y_block.mean(axis=0)
+            other.xy = x_centered.T @ (y_block - other.y_mean)
+        return self.merge(other)
+
+    def merge(self, other: RunningCrossProducts) -> RunningCrossProducts:
+        """
+        Merge the cross-products of another accumulator into this one.
+
+        Parameters
+        ----------
+        other : RunningCrossProducts
+            The accumulator to merge.
+
+        Returns
+        -------
+        RunningCrossProducts
+            The updated accumulator.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.x_mean, self.xx = other.count, other.x_mean.copy(), other.xx.copy()
+            if other.xy is not None:
+                self.y_mean, self.xy = other.y_mean.copy(), other.xy.copy()
+            return self
+
+        count = self.count + other.count
+        weight = self.count * other.count / count
+        x_delta = other.x_mean - self.x_mean
+        self.xx = self.xx + other.xx + np.outer(x_delta, x_delta) * weight
+        self.x_mean = self.x_mean + x_delta * (other.count / count)
+        if self.xy is not None:
+            y_delta = other.y_mean - self.y_mean
+            self.xy = self.xy + other.xy + np.outer(x_delta, y_delta) * weight
+            self.y_mean = self.y_mean + y_delta * (other.count / count)
+        self.count = count
+        return self
+
+    def xtx(self, center: bool = True, x_scale: [np.ndarray, None] = None) -> np.ndarray:
+        """
+        Returns XᵀX of the accumulated x.
+
+        Parameters
+        ----------
+        center : bool, optional
+            Whether x is mean centered, by default True.
+        x_scale : numpy.ndarray, optional
+            The scale each column of x is divided by, e.g. its standard deviation, by default None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The cross-product of shape (n_features, n_features).
+        """
+        xtx = self.xx if center else self.xx + self.count * np.outer(self.x_mean, self.x_mean)
+        if x_scale is not None:
+            xtx = xtx / np.outer(x_scale, x_scale)
+        return xtx
+
+    def xty(self, center: bool = True, x_scale: [np.ndarray, None] = None,
+            y_scale: [np.ndarray, None] = None) -> np.ndarray:
+        """
+        Returns Xᵀy of the accumulated x and y.
+
+        Parameters
+        ----------
+        center : bool, optional
+            Whether x and y are mean centered, by default True.
+        x_scale : numpy.ndarray, optional
+            The scale each column of x is divided by, by default None.
+        y_scale : numpy.ndarray, optional
+            The scale each column of y is divided by, by default None.
+
+        Returns
+        -------
+        numpy.ndarray
+            The cross-product of shape (n_features, n_response).
+
+        Raises
+        ------
+        ValueError
+            If no y has been accumulated.
+        """
+        if self.xy is None:
+            raise ValueError("No y has been accumulated")
+        xty = self.xy if center else self.xy + self.count * np.outer(self.x_mean, self.y_mean)
+        if x_scale is not None:
+            xty = xty / np.asarray(x_scale).reshape(-1, 1)
+        if y_scale is not None:
+            xty = xty / np.asarray(y_scale).reshape(1, -1)
+        return xty
+
+    def covariance(self, ddof: int = 1) -> np.ndarray:
+        """
+        Returns the covariance matrix of the accumulated x.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            The delta degrees of freedom, by default 1 as in numpy.cov.
+
+        Returns
+        -------
+        numpy.ndarray
+            The covariance matrix of shape (n_features, n_features).
+        """
+        return self.xx / (self.count - ddof)
+
+
+class RunningHistogram:
+    """
+    Histograms of each column over fixed bins, accumulated over blocks of rows. Used to approximate quantiles, such as
+    the median, without holding the columns in memory. The error of the quantiles is at most the width of one bin.
+
+    Parameters
+    ----------
+    minimum : numpy.ndarray
+        The lower edge of the bins of each column.
+    maximum : numpy.ndarray
+        The upper edge of the bins of each column.
+    n_bins : int, optional
+        The number of bins of each column, by default 2048.
+
+    Attributes
+    ----------
+    counts : numpy.ndarray
+        The counts of each bin, of shape (n_columns, n_bins).
+    """
+
+    def __init__(self, minimum: np.ndarray, maximum: np.ndarray, n_bins: int = 2048) -> None:
+        self.minimum = np.asarray(minimum, dtype=np.float64)
+        self.n_bins = n_bins
+        width = (np.asarray(maximum, dtype=np.float64) - self.minimum) / n_bins
+        self.width = np.where(width > 0, width, 1.0)
+        self.counts = np.zeros((self.minimum.shape[0], n_bins), dtype=np.int64)
+
+    def update(self, block: np.ndarray) -> RunningHistogram:
+        """
+        Add a block of rows to the histograms.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A block of rows.
+
+        Returns
+        -------
+        RunningHistogram
+            The updated accumulator.
+        """
+        bins = np.floor((np.asarray(block, dtype=np.float64) - self.minimum) / self.width)
+        bins = np.clip(bins, 0, self.n_bins - 1).astype(np.int64)
+        bins += np.arange(self.minimum.shape[0]) * self.n_bins
+        self.counts += np.bincount(bins.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other: RunningHistogram) -> RunningHistogram:
+        """
+        Merge the counts of another accumulator over the same bins into this one.
+
+        Parameters
+        ----------
+        other : RunningHistogram
+            The accumulator to merge.
+
+        Returns
+        -------
+        RunningHistogram
+            The updated accumulator.
+        """
+        self.counts += other.counts
+        return self
+
+    def quantile(self, q: float) -> np.ndarray:
+        """
+        Returns the approximate quantile of each column, interpolated linearly within the bin holding it.
+
+        Parameters
+        ----------
+        q : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        numpy.ndarray
+            The quantile of each column.
+        """
+        cumulative = self.counts.cumsum(axis=1)
+        target = q * cumulative[:, -1]
+        bins = (cumulative < target[:, None]).sum(axis=1).clip(max=self.n_bins - 1)
+        rows = np.arange(bins.shape[0])
+        below = np.where(bins > 0, cumulative[rows, bins - 1], 0)
+        inside = np.maximum(self.counts[rows, bins], 1)
+        fraction = np.clip((target - below) / inside, 0, 1)
+        return self.minimum + (bins + fraction) * self.width
+
+
+class QuantileSketch:
+    """
+    A t-digest of each column, accumulated over blocks of rows. Each column is summarized by at most
+    compression // 2 + 1 centroids, whose sizes follow the arcsine scale function of the t-digest, so the quantiles
+    are approximated closely with little memory. Two sketches are merged by compressing their centroids together,
+    e.g. when the blocks are read by different workers. The sketch is accumulated in float64.
+
+    Parameters
+    ----------
+    compression : int, optional
+        The compression of the digest, by default SKETCH_COMPRESSION. Larger values give more accurate quantiles.
+
+    Attributes
+    ----------
+    count : int
+        The number of rows accumulated.
+    means : numpy.ndarray or None
+        The means of the centroids of each column, sorted, of shape (n_columns, n_centroids).
+    weights : numpy.ndarray or None
+        The number of rows of the centroids, of shape (n_columns, n_centroids).
+    minimum : numpy.ndarray or None
+        The minimum of each column.
+    maximum : numpy.ndarray or None
+        The maximum of each column.
+
+    References
+    ----------
+    Dunning, Ted, and Otmar Ertl. "Computing extremely accurate quantiles using t-digests." arXiv preprint
+    arXiv:1902.04023 (2019).
+    """
+
+    def __init__(self, compression: int = SKETCH_COMPRESSION) -> None:
+        if compression < 2:
+            raise ValueError(f"compression needs to be an integer of at least 2, not {compression}")
+        self.compression = compression
+        self.count = 0
+        self.means: [np.ndarray, None] = None
+        self.weights: [np.ndarray, None] = None
+        self.minimum: [np.ndarray, None] = None
+        self.maximum: [np.ndarray, None] = None
+
+    def update(self, block: np.ndarray) -> QuantileSketch:
+        """
+        Add a block of rows to the sketch.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A block of rows, with the same number of columns as the previous blocks.
+
+        Returns
+        -------
+        QuantileSketch
+            The updated sketch.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        if block.shape[0] == 0:
+            return self
+
+        other = QuantileSketch(self.compression)
+        other.count = block.shape[0]
+        # The centroids of a column are contiguous, so they are sorted quickly
+        other.means, other.weights = np.ascontiguousarray(block.T), np.ones(block.shape[::-1])
+        other.minimum, other.maximum = block.min(axis=0), block.max(axis=0)
+        return self.merge(other)
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        """
+        Merge the centroids of another sketch into this one.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            The sketch to merge.
+
+        Returns
+        -------
+        QuantileSketch
+            The updated sketch.
+
+        Raises
+        ------
+        ValueError
+            If the sketches do not have the same number of columns.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            means, weights = other.means, other.weights
+            self.minimum, self.maximum = other.minimum.copy(), other.maximum.copy()
+        else:
+            if other.means.shape[0] != self.means.shape[0]:
+                raise ValueError(f"The number of columns ({other.means.shape[0]}) does not match the accumulated "
+                                 f"columns ({self.means.shape[0]})")
+            means = np.concatenate([self.means, other.means], axis=1)
+            weights = np.concatenate([self.weights, other.weights], axis=1)
+            self.minimum = np.minimum(self.minimum, other.minimum)
+            self.maximum = np.maximum(self.maximum, other.maximum)
+        self.count += other.count
+        self._compress(means, weights)
+        return self
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        # Sort the centroids of each column and assign them to clusters by the arcsine scale function of their
+        # quantile. The clusters are merged into weighted means, and empty clusters are moved to the end.
+        order = np.argsort(means, axis=1)
+        means = np.take_along_axis(means, order, axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+
+        n_columns, n_clusters = means.shape[0], self.compression // 2 + 1
+        quantile = (np.cumsum(weights, axis=1) - weights / 2) / self.count
+        scale = self.compression / (2 * np.pi) * (np.arcsin(np.clip(2 * quantile - 1, -1, 1)) + np.pi / 2)
+        clusters = np.minimum(scale.astype(np.int64), n_clusters - 1)
+        clusters += np.arange(n_columns)[:, None] * n_clusters
+
+        size = n_columns * n_clusters
+        cluster_weights = np.bincount(clusters.ravel(), weights.ravel(), minlength=size).reshape(n_columns, -1)
+        cluster_sums = np.bincount(clusters.ravel(), (weights * means).ravel(), minlength=size).reshape(n_columns, -1)
+
+        empty = cluster_weights == 0
+        cluster_means = np.divide(cluster_sums, cluster_weights, out=np.zeros_like(cluster_sums), where=~empty)
+        order = np.argsort(empty, axis=1, kind="stable")
+        self.weights = np.take_along_axis(cluster_weights, order, axis=1)
+        self.means = np.take_along_axis(np.where(empty, self.maximum[:, None], cluster_means), order, axis=1)
+
+    def quantile(self, q: float) -> np.ndarray:
+        """
+        Returns the approximate quantile of each column, interpolated linearly between the centroids.
+
+        Parameters
+        ----------
+        q : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        numpy.ndarray
+            The quantile of each column.
+
+        Raises
+        ------
+        ValueError
+            If no rows have been accumulated.
+        """
+        if self.count == 0:
+            raise ValueError("No rows have been accumulated")
+
+        # The centroids are placed at the middle of their rows, between the minimum and maximum of the column
+        centers = np.cumsum(self.weights, axis=1) - self.weights / 2
+        n_columns = centers.shape[0]
+        positions = np.concatenate([np.zeros((n_columns, 1)), centers, np.full((n_columns, 1), float(self.count))],
+                                   axis=1)
+        values = np.concatenate([self.minimum[:, None], self.means, self.maximum[:, None]], axis=1)
+
+        target = q * self.count
+        right = np.minimum((positions <= target).sum(axis=1), positions.shape[1] - 1)
+        left = right - 1
+        columns = np.arange(n_columns)
+        x0, x1 = positions[columns, left], positions[columns, right]
+        y0, y1 = values[columns, left], values[columns, right]
+        fraction = np.divide(target - x0, x1 - x0, out=np.zeros_like(x0), where=x1 > x0)
+        return y0 + np.clip(fraction, 0, 1) * (y1 - y0)
@@ -4,6 +4,7 @@ import warnings
 import numpy as np
 
 from me3cs.framework.data import Data, count_false
+from me3cs.misc.sparse import any_nan
 from me3cs.missing_data.imputation import imputation_algorithms
 from me3cs.missing_data.interpolation import interpolation_algorithms
 from me3cs.preprocessing.called import Called, set_called
@@ -27,7 +28,7 @@ def check_nan(data: np.ndarray) -> None:
         If `data` contains NaN values.
 
     """
-    has_nan = np.isnan(data).any()
+    has_nan = any_nan(data)
     if has_nan:
         warnings.warn("Dataset contain missing values. Consider using the missing_values module.")
 
@@ -80,6 +81,16 @@ class MissingData:
         self._branches = branches
         self.called = Called(list(), list(), list())
 
+    @property
+    def called(self) -> Called:
+        return self._called
+
+    @called.setter
+    def called(self, called: Called) -> None:
+        # The called methods are part of the fingerprint of the data
+        self._called = called
+        self.data_class.pipelines["missing_data"] = called
+
     @property
     def data(self):
         return self.data_class.data
@@ -109,7 +120,7 @@ class MissingData:
         """
         self._check_algorithm_type(algorithm, interpolation_algorithms)
         func = interpolation_algorithms.get(algorithm)
-        result = func(self.data_class.raw.get())
+        result = func(self.data_class.get_missing_data())
         self.data = result
 
     @set_called
@@ -130,7 +141,7 @@ class MissingData:
         """
         self._check_algorithm_type(algorithm, imputation_algorithms)
         func = imputation_algorithms.get(algorithm)
-        result = func(self.data_class.raw.get())
+        result = func(self.data_class.get_missing_data())
         self.data = result
 
     @set_called
@@ -192,7 +203,8 @@ class MissingData:
         """
         resets the data to the `raw data`.
         """
-        [branch.data_class.reset_index("all") for branch in self._branches]
+        [branch.data_class.reset_index("all", dimension="all") for branch in self._branches]
+        [branch.data_class.missing_data.reset() for branch in self._branches]
         self.called.reset()
 
     def call_in_order(self):
@@ -1,8 +1,10 @@
 from dataclasses import dataclass
 
 import numpy as np
+from scipy.sparse.linalg import svds
 
 from me3cs.misc.handle_data import transform_array_1d_to_2d
+from me3cs.misc.sparse import as_linear_operator, is_sparse
 
 EPS = np.finfo(float).eps
 MAX_ITER = 150
@@ -22,8 +24,9 @@ class BaseClassPCA:
         self.init_result()
 
     def init_result(self) -> None:
-        self.scores = np.empty((self.x.shape[0], self.n_components))
-        self.loadings = np.empty((self.x.shape[1], self.n_components))
+        dtype = self.x.dtype
+        self.scores = np.empty((self.x.shape[0], self.n_components), dtype=dtype)
+        self.loadings = np.empty((self.x.shape[1], self.n_components), dtype=dtype)
         self.explained_variance = np.empty((1, self.n_components))
         self.cumulative_explained_variance = np.empty((1, self.n_components))
 
@@ -35,7 +38,10 @@ class SVD(BaseClassPCA):
         self.fit()
 
     def fit(self) -> None:
-        x = self.x.copy()
+        if is_sparse(self.x) and self.n_components < min(self.x.shape):
+            self._fit_sparse()
+            return
+        x = self.x.toarray() if is_sparse(self.x) else self.x.copy()
         U, S, V = np.linalg.svd(x, full_matrices=False)
         scores = np.matmul(U, np.diag(S))
         self.loadings = V[: self.n_components, :].T
@@ -44,6 +50,15 @@ class SVD(BaseClassPCA):
             S[: self.n_components]
         ).sum(axis=0)
 
+    def _fit_sparse(self) -> None:
+        # Only the leading singular triplets are computed, from products of the sparse data with dense vectors
+        U, S, V = svds(as_linear_operator(self.x), k=self.n_components)
+        order = np.argsort(S)[::-1]
+        U, S, V = U[:, order], S[order], V[order]
+        self.loadings = V.T.astype(self.x.dtype)
+        self.scores = (U * S).astype(self.x.dtype)
+        self.explained_variance = np.square(S) / np.square(S).sum(axis=0)
+
 
 @dataclass
 class EigenDecomposition(BaseClassPCA):
@@ -51,20 +66,53 @@ class EigenDecomposition(BaseClassPCA):
         super().__post_init__()
         self.fit()
 
-    def fit(self) -> None:
-        x = self.x.copy()
-        cov_mat = np.cov(x, rowvar=False)
-
+    @classmethod
+    def from_covariance(cls, cov_mat: np.ndarray, n_components: int,
+                        dtype: [str, np.dtype] = np.float64) -> "EigenDecomposition":
+        """
+        Fit the decomposition from a covariance matrix, e.g. accumulated over blocks of rows by
+        ChunkedData.cross_products, without the data. The scores are not computed, but can be computed one block
+        at a time with ChunkedData.project(loadings / np.linalg.norm(loadings, axis=0)).
+
+        Parameters
+        ----------
+        cov_mat : np.ndarray
+            The covariance matrix of shape (n_features, n_features).
+        n_components : int
+            The number of components.
+        dtype : str or np.dtype, optional
+            The data type of the loadings, by default float64.
+
+        Returns
+        -------
+        EigenDecomposition
+            The fitted decomposition, without x and scores.
+        """
+        new = cls.__new__(cls)
+        new.x, new.n_components, new.scores = None, n_components, None
+        new.cumulative_explained_variance = np.empty((1, n_components))
+        new._fit_covariance(cov_mat, np.dtype(dtype))
+        return new
+
+    def _fit_covariance(self, cov_mat: np.ndarray, dtype: np.dtype) -> np.ndarray:
         eigen_values, eigen_vectors = np.linalg.eigh(cov_mat)
         sorted_index = np.argsort(eigen_values)[::-1][: self.n_components]
         sorted_eigenvalues = eigen_values[sorted_index]
         sorted_eigenvectors = eigen_vectors[:, sorted_index]
 
-        eigenvector_subset = sorted_eigenvectors[:, 0 : self.n_components]
+        eigenvector_subset = sorted_eigenvectors[:, 0 : self.n_components].astype(dtype)
 
-        self.loadings = eigenvector_subset * np.sqrt(sorted_eigenvalues)
-        self.scores = np.dot(x, eigenvector_subset)
+        self.loadings = eigenvector_subset * np.sqrt(sorted_eigenvalues).astype(dtype)
         self.explained_variance = sorted_eigenvalues / np.sum(sorted_eigenvalues)
+        return eigenvector_subset
+
+    def fit(self) -> None:
+        x = self.x.copy()
+        # The covariance matrix is accumulated in float64
+        cov_mat = np.cov(x, rowvar=False, dtype=np.float64)
+
+        eigenvector_subset = self._fit_covariance(cov_mat, x.dtype)
+        self.scores = np.dot(x, eigenvector_subset)
 
 
 @dataclass
@@ -1,7 +1,12 @@
 # TODO: create mlr algorithm class
 import numpy as np
+from scipy.sparse.linalg import lsqr
 
+from me3cs.misc.handle_data import transform_array_1d_to_2d
 from me3cs.misc.metrics import moore_penrose_inverse
+from me3cs.misc.sparse import as_linear_operator, is_sparse
+
+LSQR_TOLERANCE = 1e-10
 
 
 class MLR:
@@ -14,4 +19,12 @@ class MLR:
     def fit(self) -> None:
         x = self.x
         y = self.y
+        if is_sparse(x):
+            # The minimum norm least squares solution is found iteratively, without the pseudo-inverse of x
+            operator = as_linear_operator(x)
+            y = transform_array_1d_to_2d(np.asarray(y))
+            self.reg = np.column_stack(
+                [lsqr(operator, y[:, i], atol=LSQR_TOLERANCE, btol=LSQR_TOLERANCE)[0] for i in range(y.shape[1])]
+            )
+            return
         self.reg = np.dot(moore_penrose_inverse(x), y)
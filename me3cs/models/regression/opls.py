@@ -0,0 +1,134 @@
+import numpy as np
+
+from me3cs.misc.handle_data import transform_array_1d_to_2d
+from me3cs.models.regression.pls import SIMPLS
+
+
+def orthogonal_components(xtx: np.ndarray, xty: np.ndarray, n_components: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the y-orthogonal components of centered data from its cross-products XᵀX and XᵀY, as in orthogonal
+    projections to latent structures (OPLS). Each component is the direction of the x loadings of the predictive
+    scores, which is orthogonal to the predictive weights XᵀY, so its scores are uncorrelated with y. The data is never
+    deflated. Instead the weights of each component are expressed in terms of the undeflated data, and the
+    cross-products of the deflated data are computed from XᵀX and the previous components.
+
+    Parameters
+    ----------
+    xtx : numpy.ndarray
+        The cross-product XᵀX of the centered data, of shape (n_features, n_features).
+    xty : numpy.ndarray
+        The cross-product XᵀY of the centered data and centered responses, of shape (n_features, n_response).
+    n_components : int
+        The number of orthogonal components.
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        The weights and loadings of the orthogonal components, each of shape (n_features, n_components). The
+        orthogonal scores of centered data X are X @ weights, and the filtered data is X - X @ weights @ loadings.T.
+        Components beyond the orthogonal variation of the data are zero.
+
+    References
+    ----------
+    1. Trygg, Johan, and Svante Wold. "Orthogonal projections to latent structures (O-PLS)." Journal of
+       Chemometrics 16.3 (2002): 119-128.
+    """
+    xtx = np.asarray(xtx, dtype=np.float64)
+    xty = transform_array_1d_to_2d(np.asarray(xty, dtype=np.float64))
+    n_features = xtx.shape[0]
+
+    # An orthonormal basis of the predictive weights
+    basis, singular_values, _ = np.linalg.svd(xty, full_matrices=False)
+    tolerance = singular_values[0] * max(xty.shape) * np.finfo(np.float64).eps
+    predictive = basis[:, singular_values > tolerance]
+    tolerance = np.finfo(np.float64).eps * max(1, n_features) * np.trace(xtx)
+
+    weights = np.zeros((n_features, n_components))
+    loadings = np.zeros((n_features, n_components))
+    if predictive.shape[1] == 0:
+        return weights, loadings
+
+    for a in range(n_components):
+        previous_weights, previous_loadings = weights[:, :a], loadings[:, :a]
+
+        # The deflated data is X (I - R Pᵀ), so its cross-product with the predictive scores is computed from XᵀX
+        projected = predictive - previous_weights @ (previous_loadings.T @ predictive)
+        covariance = xtx @ projected
+        covariance -= previous_loadings @ (previous_weights.T @ covariance)
+        predictive_loadings = np.linalg.solve(predictive.T @ covariance, covariance.T).T
+
+        # The variation of the predictive loadings, which is orthogonal to y
+        orthogonal = predictive_loadings - predictive @ (predictive.T @ predictive_loadings)
+        if np.linalg.norm(orthogonal) <= np.sqrt(tolerance):
+            break
+        orthogonal_weights = np.linalg.svd(orthogonal, full_matrices=False)[0][:, 0]
+
+        # The weights in terms of the undeflated data, and the loadings of the deflated data
+        orthogonal_weights = orthogonal_weights - previous_weights @ (previous_loadings.T @ orthogonal_weights)
+        covariance = xtx @ orthogonal_weights
+        squared_norm = orthogonal_weights @ covariance
+        if squared_norm <= tolerance:
+            break
+        weights[:, a] = orthogonal_weights
+        loadings[:, a] = (covariance - previous_loadings @ (previous_weights.T @ covariance)) / squared_norm
+
+    return weights, loadings
+
+
+class OPLS(SIMPLS):
+    """
+    Perform orthogonal projections to latent structures (OPLS) regression. The y-orthogonal variation of the
+    predictor variables is removed with orthogonal_components, computed from the cross-products of the data, and a
+    SIMPLS model is fitted to the filtered data. The regression matrix is folded with the orthogonal filter, so it
+    predicts from the unfiltered data, as the other regression algorithms. The predictor variables are expected to be
+    centered.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        The predictor variables.
+    y : numpy.ndarray
+        The response variables.
+    n_components : int, optional
+        Number of predictive components to use (default is 10).
+    n_orthogonal : int, optional
+        Number of orthogonal components to remove (default is 1).
+
+    Attributes
+    ----------
+    n_orthogonal : int
+        Number of orthogonal components removed.
+    orthogonal_weights : numpy.ndarray
+        The weights of the orthogonal components, of shape (n_features, n_orthogonal).
+    orthogonal_loadings : numpy.ndarray
+        The loadings of the orthogonal components, of shape (n_features, n_orthogonal).
+    reg : numpy.ndarray
+        The regression matrix of the unfiltered data.
+
+    The other attributes are the ones of SIMPLS, for the filtered data.
+
+    References
+    ----------
+    1. Trygg, Johan, and Svante Wold. "Orthogonal projections to latent structures (O-PLS)." Journal of
+       Chemometrics 16.3 (2002): 119-128.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, n_components: int = 10, n_orthogonal: int = 1) -> None:
+        self.n_orthogonal = n_orthogonal
+        super().__init__(x, y, n_components)
+        self.reg = self.reg - self.orthogonal_weights @ (self.orthogonal_loadings.T @ self.reg)
+
+    def fit(self) -> None:
+        """
+        Remove the orthogonal components, and fit the SIMPLS model to the filtered data.
+        """
+        x = np.asarray(self.x)
+        y = transform_array_1d_to_2d(self.y)
+        weights, loadings = orthogonal_components(x.T @ x, x.T @ y, self.n_orthogonal)
+        self.orthogonal_weights = weights.astype(self.x_weight.dtype)
+        self.orthogonal_loadings = loadings.astype(self.x_weight.dtype)
+
+        # The data is filtered once, with a single low-rank update
+        self.x = x - (x @ self.orthogonal_weights) @ self.orthogonal_loadings.T
+        super().fit()
+        self.x = x
@@ -46,12 +46,13 @@ class BasePLS(ABC):
         self.x = x
         self.y = y
         self.n_components = n_components
-        self.x_weight = np.ndarray((x.shape[1], n_components))
-        self.x_scores = np.ndarray((x.shape[0], n_components))
-        self.x_loadings = np.ndarray((x.shape[1], n_components))
-        self.x_loadings_orthogonal = np.ndarray((x.shape[1], n_components))
-        self.y_loadings = np.ndarray((y.shape[1], n_components))
-        self.y_scores = np.ndarray((y.shape[0], n_components))
+        dtype = np.result_type(x.dtype, y.dtype)
+        self.x_weight = np.ndarray((x.shape[1], n_components), dtype=dtype)
+        self.x_scores = np.ndarray((x.shape[0], n_components), dtype=dtype)
+        self.x_loadings = np.ndarray((x.shape[1], n_components), dtype=dtype)
+        self.x_loadings_orthogonal = np.ndarray((x.shape[1], n_components), dtype=dtype)
+        self.y_loadings = np.ndarray((y.shape[1], n_components), dtype=dtype)
+        self.y_scores = np.ndarray((y.shape[0], n_components), dtype=dtype)
         self.fit()
         self.reg = np.einsum("ij, kj -> ij", self.x_weight, self.y_loadings).cumsum(
             axis=1
@@ -122,8 +123,8 @@ class SIMPLS(BasePLS):
 
     Parameters
     ----------
-    x : numpy.ndarray
-        The predictor variables.
+    x : numpy.ndarray, scipy.sparse.spmatrix or CenteredSparse
+        The predictor variables. Sparse data is only used through products with dense arrays.
     y : numpy.ndarray
         The response variables.
     n_components : int, optional
@@ -173,12 +174,90 @@ class SIMPLS(BasePLS):
        18.3 (1993): 251-263.
     """
 
+    @classmethod
+    def from_cross_products(cls, xtx: np.ndarray, xty: np.ndarray, n_components: int = 10,
+                            dtype: [str, np.dtype] = np.float64) -> "SIMPLS":
+        """
+        Fit the SIMPLS model from the cross-products XᵀX and Xᵀy, e.g. accumulated over blocks of rows by
+        ChunkedData.cross_products, without the data. The weights, loadings and regression matrix are the same as
+        from the data. The scores are not computed, but the x scores can be computed one block at a time with
+        ChunkedData.project(x_weight).
+
+        Parameters
+        ----------
+        xtx : numpy.ndarray
+            The cross-product XᵀX of shape (n_features, n_features).
+        xty : numpy.ndarray
+            The cross-product Xᵀy of shape (n_features, n_response).
+        n_components : int, optional
+            Number of components to use (default is 10).
+        dtype : str or numpy.dtype, optional
+            The data type of the results, by default float64.
+
+        Returns
+        -------
+        SIMPLS
+            The fitted model, without x, y and scores.
+        """
+        xty = transform_array_1d_to_2d(np.asarray(xty))
+        new = cls.__new__(cls)
+        new.x, new.y, new.n_components = None, None, n_components
+        new.x_weight = np.ndarray((xtx.shape[0], n_components), dtype=dtype)
+        new.x_loadings = np.ndarray((xtx.shape[0], n_components), dtype=dtype)
+        new.x_loadings_orthogonal = np.ndarray((xtx.shape[0], n_components), dtype=dtype)
+        new.y_loadings = np.ndarray((xty.shape[1], n_components), dtype=dtype)
+        new.x_scores, new.y_scores = None, None
+        new._fit_cross_products(xtx, xty)
+        new.reg = np.einsum("ij, kj -> ij", new.x_weight, new.y_loadings).cumsum(axis=1)
+        return new
+
+    def _fit_cross_products(self, xtx: np.ndarray, xty: np.ndarray) -> None:
+        """
+        Fit the SIMPLS model from the cross-products. The norm of the x scores is computed as the square root of
+        wᵀXᵀXw, and the x loadings as XᵀXw.
+        """
+        cov_matrix = xty
+        single_response = xty.shape[1] == 1
+
+        for a in range(self.n_components):
+            if single_response:
+                y_weights = transform_array_1d_to_2d(np.ones([1]))
+            else:
+                y_weights = transform_array_1d_to_2d(
+                    np.linalg.eigh(cov_matrix.T @ cov_matrix)[1][:, 0]
+                )
+
+            x_weights = cov_matrix @ y_weights
+            x_loadings = xtx @ x_weights
+            normt = np.sqrt(x_weights.T @ x_loadings).item()
+            x_weights = x_weights / normt
+            x_loadings = x_loadings / normt
+            y_loadings = xty.T @ x_weights
+
+            x_loadings_orthogonal = x_loadings
+            if a > 0:
+                x_loadings_orthogonal = (
+                        x_loadings_orthogonal
+                        - self.x_loadings_orthogonal[:, :a]
+                        @ (self.x_loadings_orthogonal[:, :a].T @ x_loadings)
+                )
+            x_loadings_orthogonal = x_loadings_orthogonal / np.sqrt(np.square(x_loadings_orthogonal).sum())
+
+            cov_matrix = cov_matrix - x_loadings_orthogonal @ (
+                    x_loadings_orthogonal.T @ cov_matrix
+            )
+
+            self.x_weight[:, a] = x_weights.flatten()
+            self.x_loadings[:, a] = x_loadings.flatten()
+            self.x_loadings_orthogonal[:, a] = x_loadings_orthogonal.flatten()
+            self.y_loadings[:, a] = y_loadings.flatten()
+
     def fit(self) -> None:
         """
         Fit the SIMPLS model.
         """
-        # Get data
-        x = self.x.copy()
+        # Get data. x is only read, so sparse and implicitly centered data is used as it is
+        x = self.x
         y = transform_array_1d_to_2d(self.y.copy())
 
         # Assert if PLS1 or PLS2
@@ -202,8 +281,8 @@ class SIMPLS(BasePLS):
             x_weights = cov_matrix @ y_weights  # Calculate x weights
             x_scores = x @ x_weights  # Calculate x scores
 
-            # Normalise x scores and weights
-            normt = np.sqrt(x_scores.T @ x_scores)
+            # Normalise x scores and weights. The norm is accumulated in float64
+            normt = np.sqrt(np.square(x_scores, dtype=np.float64).sum()).astype(x_scores.dtype)
             x_scores = x_scores / normt
             x_weights = x_weights / normt
 
@@ -223,7 +302,7 @@ class SIMPLS(BasePLS):
                 )  # Make y scores perpendicular to previous x scores
 
             x_loadings_orthogonal = x_loadings_orthogonal / (
-                np.sqrt(x_loadings_orthogonal.T @ x_loadings_orthogonal)
+                np.sqrt(np.square(x_loadings_orthogonal, dtype=np.float64).sum()).astype(x_loadings.dtype)
             )  # Normalise orthogonal x loadings
 
             cov_matrix = cov_matrix - x_loadings_orthogonal @ (
@@ -1,10 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
 import numpy as np
 
 from me3cs.framework.data import Data, Index
+from me3cs.misc.sparse import is_sparse
+from me3cs.misc.statistics import QuantileSketch, RunningMoments
 from me3cs.preprocessing.called import Called
+from me3cs.preprocessing.frozen import FrozenPipeline
+from me3cs.preprocessing.plan import PrefixCache, compile_plan
+
+# The number of elements of the blocks of rows, which row-wise preprocessing methods are split into on several threads
+ROW_BLOCK_ELEMENTS = 1 << 18
+
+
+def map_row_blocks(function, data: np.ndarray, out: np.ndarray, *args, n_workers: int = 1,
+                   block_size: int = ROW_BLOCK_ELEMENTS, **kwargs) -> np.ndarray:
+    """
+    Apply a row-wise function to blocks of rows of the data on a thread pool. NumPy and SciPy release the GIL in
+    their array operations, so the blocks are transformed in parallel. With a single worker, or data of a single
+    block, the function is applied to all the data at once.
+
+    Parameters
+    ----------
+    function : function
+        A function transforming each row independently of the others, called as
+        function(block, *args, out=out_block, **kwargs).
+    data : numpy.ndarray
+        The data of shape (n_samples, n_features).
+    out : numpy.ndarray
+        Array of shape (n_samples, ...) the result is written to. Its blocks of rows are passed to the function.
+    *args : any
+        Positional arguments of the function.
+    n_workers : int, optional
+        The number of threads, by default 1.
+    block_size : int, optional
+        The number of elements of each block of rows, by default ROW_BLOCK_ELEMENTS.
+    **kwargs : any
+        Keyword arguments of the function.
+
+    Returns
+    -------
+    numpy.ndarray
+        The result, out.
+    """
+    rows_per_block = max(1, block_size // max(1, data.shape[1]))
+    if n_workers <= 1 or data.shape[0] <= rows_per_block:
+        function(data, *args, out=out, **kwargs)
+        return out
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [
+            executor.submit(function, data[start: start + rows_per_block], *args,
+                            out=out[start: start + rows_per_block], **kwargs)
+            for start in range(0, data.shape[0], rows_per_block)
+        ]
+        for future in futures:
+            future.result()
+    return out
+
+
+def dense_only(func):
+    """
+    Decorator for preprocessing methods, which would turn sparse data into dense data, e.g. by centering each row.
+    The method raises a TypeError for sparse data, before it is recorded as called.
+    """
+    @wraps(func)
+    def inner(self, *args, **kwargs):
+        if is_sparse(self.data):
+            raise TypeError(f"{func.__name__} is not supported for sparse data, since it would make the data dense")
+        return func(self, *args, **kwargs)
+    return inner
 
 
 def sort_function_order(func):
+    @wraps(func)
     def inner(self, *args, **kwargs):
         func(self, *args, **kwargs)
         self._sort_order()
@@ -16,6 +86,15 @@ class ScalingAttributes:
         self.median: [None, np.ndarray] = None
         self.std: [None, np.ndarray] = None
         self.sqrt_std: [None, np.ndarray] = None
+        self.msc_reference: [None, np.ndarray] = None
+        self.emsc_reference: [None, np.ndarray] = None
+        self.emsc_design: [None, np.ndarray] = None
+        self.emsc_inverse: [None, np.ndarray] = None
+        self.osc_weights: [None, np.ndarray] = None
+        self.osc_loadings: [None, np.ndarray] = None
+        self.osc_offset: [None, np.ndarray] = None
+        self.moments: [None, RunningMoments] = None
+        self.median_sketch: [None, QuantileSketch] = None
 
 
 class PreprocessingBaseClass:
@@ -24,8 +103,9 @@ class PreprocessingBaseClass:
 
     Parameters
     ----------
-    data : Data or numpy.ndarray
-        The input data to be preprocessed. Can be a Data object from the me3cs framework or a numpy ndarray.
+    data : Data, numpy.ndarray or scipy.sparse.spmatrix
+        The input data to be preprocessed. Can be a Data object from the me3cs framework, a numpy ndarray or a
+        sparse matrix.
 
     Attributes
     ----------
@@ -35,6 +115,25 @@ class PreprocessingBaseClass:
         An instance of the Called class for storing information about preprocessing functions called.
     data_is_centered : bool
         Indicates whether the data has been mean centered or not.
+    prefix_cache : PrefixCache
+        A cache of the intermediate results of the called preprocessing functions, so only the functions after an
+        unchanged prefix are called again when the functions are called in order.
+    inplace : bool
+        Whether the preprocessing functions write their output to one of two buffers, instead of a new array. A
+        chain of functions then uses two arrays in total, so the peak memory is lower, but arrays previously
+        returned by data are overwritten by the following functions. The prefix cache is not used. Default is False.
+    response : Data or None
+        The reference data of the model the data belongs to, which supervised functions, e.g. osc, are fitted to with
+        the rows currently kept. A model sets it to the data of its y branch. Default is None.
+    options : Options or None
+        The options of the model the data belongs to. When set, n_workers and block_size are read from and written to
+        the options, so changes to the options of the model apply to the following calls. Default is None.
+    n_workers : int
+        The number of threads row-wise preprocessing functions, e.g. snv and savitzky_golay, are applied on. Default
+        is 1.
+    block_size : int
+        The number of elements of the blocks of rows, which are distributed to the threads. Default is
+        ROW_BLOCK_ELEMENTS.
 
     Methods
     -------
@@ -44,12 +143,14 @@ class PreprocessingBaseClass:
         Updates the data_is_centered attribute based on the flag provided.
     call_in_order():
         Calls the preprocessing functions in the correct order.
+    freeze(variables=None):
+        Returns the called preprocessing functions as a FrozenPipeline.
     """
     MODES = ("preprocess", "predict", "cross_validation")
 
     def __init__(self, data: [Data, np.ndarray], mode: str = "preprocess"):
 
-        if isinstance(data, np.ndarray):
+        if not isinstance(data, Data):
             data = Data(data, Index(data.shape[0]), Index(data.shape[1]))
         self.data_class = data
 
@@ -61,6 +162,45 @@ class PreprocessingBaseClass:
         self.data_is_centered = False
         self._reference: [None, np.ndarray] = None
         self.scaling_attributes = ScalingAttributes()
+        self.prefix_cache = PrefixCache()
+        self.inplace = False
+        self._buffers = [None, None]
+        self.response: [Data, None] = None
+        self.options = None
+        self._n_workers = 1
+        self._block_size = ROW_BLOCK_ELEMENTS
+
+    @property
+    def called(self) -> Called:
+        return self._called
+
+    @called.setter
+    def called(self, called: Called) -> None:
+        # The called methods are part of the fingerprint of the data
+        self._called = called
+        self.data_class.pipelines["preprocessing"] = called
+
+    @property
+    def n_workers(self) -> int:
+        return self._n_workers if self.options is None else self.options.n_workers
+
+    @n_workers.setter
+    def n_workers(self, n_workers: int) -> None:
+        if self.options is None:
+            self._n_workers = n_workers
+        else:
+            self.options.n_workers = n_workers
+
+    @property
+    def block_size(self) -> int:
+        return self._block_size if self.options is None else self.options.block_size
+
+    @block_size.setter
+    def block_size(self, block_size: int) -> None:
+        if self.options is None:
+            self._block_size = block_size
+        else:
+            self.options.block_size = block_size
 
     @property
     def data(self):
@@ -72,15 +212,56 @@ class PreprocessingBaseClass:
 
     @data.setter
     def data(self, data):
+        if is_sparse(data):
+            data = data.astype(self.data_class.dtype)
+        else:
+            data = np.asarray(data, dtype=self.data_class.dtype)
         self.data_class.preprocessing_data.set(data)
 
+    def _output(self, shape: [tuple[int, ...], None] = None) -> np.ndarray:
+        """
+        Returns an array for the output of a preprocessing function, in the data type of the data. In inplace mode it
+        is one of two buffers, which does not hold the current data, otherwise it is a new array.
+
+        Parameters
+        ----------
+        shape : tuple[int, ...] or None, optional
+            The shape of the output, by default the shape of the data.
+
+        Returns
+        -------
+        numpy.ndarray
+            An uninitialized array.
+        """
+        data = self.data
+        shape = data.shape if shape is None else tuple(shape)
+        dtype = self.data_class.dtype
+        if not self.inplace:
+            return np.empty(shape, dtype=dtype)
+
+        for i, buffer in enumerate(self._buffers):
+            if buffer is not None and np.may_share_memory(buffer, data):
+                continue
+            if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+                buffer = np.empty(shape, dtype=dtype)
+                self._buffers[i] = buffer
+            return buffer
+        # Both buffers overlap the data, e.g. a view of one buffer was set as data
+        return np.empty(shape, dtype=dtype)
+
+    def _map_rows(self, function, data: np.ndarray, out: np.ndarray, *args, **kwargs) -> np.ndarray:
+        """
+        Apply a row-wise function to the data with map_row_blocks, on n_workers threads.
+        """
+        return map_row_blocks(function, data, out, *args, n_workers=self.n_workers, block_size=self.block_size,
+                              **kwargs)
+
     def update_is_centered(self, flag: bool) -> None:
 
         setattr(self, "data_is_centered", flag)
 
     def reset(self) -> None:
-        new_data = self.data_class.outlier_detection.get()
-        self.data_class.preprocessing_data.set(new_data)
+        self.data_class.preprocessing_data.reset()
         self.update_is_centered(False)
         self.called.reset()
 
@@ -108,10 +289,28 @@ class PreprocessingBaseClass:
             self.call_in_order()
 
     def call_in_order(self):
-        for function, args, kwargs in zip(
-                self.called.function, self.called.args, self.called.kwargs
-        ):
-            function(self, *args, **kwargs)
+        # Consecutive elementwise methods are fused and scaling is applied in place, see preprocessing.plan. Only the
+        # methods after the longest prefix found in the prefix cache are applied again. The buffers of inplace mode
+        # are overwritten, so they are not cached
+        compile_plan(self.called).execute(self, None if self.inplace else self.prefix_cache)
+
+    def freeze(self, variables: [np.ndarray, None] = None) -> FrozenPipeline:
+        """
+        Returns the called preprocessing functions as a FrozenPipeline, with the parameters fitted to the data fixed.
+        The pipeline transforms new data as the functions do in predict mode.
+
+        Parameters
+        ----------
+        variables : numpy.ndarray or None, optional
+            A boolean index of the variables of new data which are kept before the functions are applied, by default
+            None, which keeps all variables.
+
+        Returns
+        -------
+        FrozenPipeline
+            The frozen pipeline.
+        """
+        return FrozenPipeline.from_preprocessing(self, variables)
 
     def __repr__(self):
         return f"Preprocessing module\n" \
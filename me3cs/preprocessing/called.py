@@ -1,3 +1,8 @@
+from functools import wraps
+
+from me3cs.misc.fingerprint import combine, hash_object
+
+
 def set_called(func):
     """
     Decorator that adds the decorated function to the `self.called` list of the object,
@@ -15,6 +20,7 @@ def set_called(func):
         A wrapped function that calls `func` and updates the `self.called` list with information about the
         function call.
     """
+    @wraps(func)
     def inner(self, *args, **kwargs):
         func(self, *args, **kwargs)
         self.called.function.append(func)
@@ -54,6 +60,20 @@ class Called:
         self.args.clear()
         self.kwargs.clear()
 
+    @property
+    def fingerprint(self) -> str:
+        """
+        Returns a fingerprint of the called functions and their arguments, in the order they are called. Array
+        arguments are hashed by their contents.
+
+        Returns
+        -------
+        str
+            The fingerprint as a hexadecimal string.
+        """
+        return combine(*(hash_object((function, args, kwargs))
+                         for function, args, kwargs in zip(self.function, self.args, self.kwargs)))
+
     def __repr__(self):
         called_functions = [x.__name__ for x in self.function]
         if len(called_functions) == 0:
@@ -1,8 +1,12 @@
 import numpy as np
-from scipy.ndimage import convolve1d
 
-from me3cs.misc.preprocessing import savgol_coefficients
-from me3cs.preprocessing.base import PreprocessingBaseClass, sort_function_order
+from me3cs.misc.handle_data import transform_array_1d_to_2d
+from me3cs.misc.preprocessing import (BIN_METHODS, DERIVATIVE_STENCILS, INTERPOLATION_METHODS, baseline,
+                                      baseline_projector, bin_variables, interpolate_variables, interpolation_matrix,
+                                      orthogonal_filter, resample_kernel, resample_variables, savgol_filter,
+                                      segment_derivative)
+from me3cs.models.regression.opls import orthogonal_components
+from me3cs.preprocessing.base import PreprocessingBaseClass, dense_only, sort_function_order
 from me3cs.preprocessing.called import set_called
 
 
@@ -12,19 +16,33 @@ class Filtering(PreprocessingBaseClass):
 
     Methods
     -------
-    savitzky_golay(width=15, polyorder=2, deriv=1, delta=1):
+    savitzky_golay(width=15, polyorder=2, deriv=1, delta=1, method='auto'):
         Filter data using the Savitzky-Golay algorithm.
+    gap_segment(segment=5, gap=5, deriv=1):
+        Compute the gap-segment derivative of the data.
+    norris_williams(segment=5, gap=5, deriv=1):
+        Compute the Norris-Williams derivative of the data.
     baseline(polyorder=1, value_range=None, fit_type='data'):
         Perform baseline correction on data.
+    bin(width=2, method='mean'):
+        Combine neighbouring variables into bins.
+    resample(factor=2):
+        Keep every factor-th variable, after an anti-alias filter.
+    interpolate(source_axis, target_axis, method='linear'):
+        Interpolate the spectra from their axis onto another axis.
+    osc(n_components=1):
+        Remove the variation of the data, which is orthogonal to the reference data.
 
     """
     @sort_function_order
     @set_called
+    @dense_only
     def savitzky_golay(
-        self, width: int = 15, polyorder: int = 2, deriv: int = 1, delta: int = 1
+        self, width: int = 15, polyorder: int = 2, deriv: int = 1, delta: int = 1, method: str = "auto"
     ) -> None:
         """
-        Filter data using the Savitzky-Golay algorithm.
+        Filter data using the Savitzky-Golay algorithm. The filter coefficients are cached, and wide windows are
+        convolved through the FFT.
 
         Parameters
         ----------
@@ -36,11 +54,15 @@ class Filtering(PreprocessingBaseClass):
             The derivative order to use for filtering, by default 1.
         delta : int, optional
             The spacing between points to use for filtering, by default 1.
+        method : str, optional
+            The convolution method, "direct", "fft" or "auto", by default "auto", which uses the FFT for wide
+            windows. See misc.preprocessing.savgol_filter.
 
         Raises
         ------
         ValueError
-            If width is not an odd number greater or equal to 3 or if deriv is greater than polyorder.
+            If width is not an odd number greater or equal to 3, if deriv is greater than polyorder or if method is
+            not "auto", "direct" or "fft".
 
         """
         if width < 3 or width % 2 == 0:
@@ -49,20 +71,94 @@ class Filtering(PreprocessingBaseClass):
         if polyorder < deriv:
             raise ValueError("deriv needs to be smaller or equal to order")
 
-        data = self.data
-        coeffs = savgol_coefficients(width, polyorder, deriv, delta)
+        new = self._map_rows(savgol_filter, self.data, self._output(), width, polyorder, deriv, delta, method=method)
+
+        self.data = new
+
+    @staticmethod
+    def _check_segment_derivative(segment: int, gap: int, deriv: int) -> None:
+        if not isinstance(segment, (int, np.integer)) or segment < 1 or segment % 2 == 0:
+            raise ValueError(f"segment needs to be a positive odd integer. {segment} was input")
+        if not isinstance(gap, (int, np.integer)) or gap < 1:
+            raise ValueError(f"gap needs to be a positive integer. {gap} was input")
+        if deriv not in DERIVATIVE_STENCILS:
+            raise ValueError(f"deriv needs to be one of {', '.join(map(str, DERIVATIVE_STENCILS))}. {deriv} was input")
+
+    @sort_function_order
+    @set_called
+    @dense_only
+    def gap_segment(self, segment: int = 5, gap: int = 5, deriv: int = 1) -> None:
+        """
+        Compute the gap-segment derivative of the data. The first derivative at a variable is the difference of the
+        means of the segments on either side of it, which are separated by a gap of variables centred on it. Higher
+        derivatives are central differences of segment means with the same spacing. The segment means are computed
+        from cumulative sums, so the cost does not depend on the segment and gap sizes. The edges are extended by
+        reflection.
+
+        Parameters
+        ----------
+        segment : int, optional
+            The odd number of variables averaged in each segment, by default 5.
+        gap : int, optional
+            The odd number of variables between the segments, by default 5.
+        deriv : int, optional
+            The derivative order, from 1 to 4, by default 1.
+
+        Raises
+        ------
+        ValueError
+            If segment or gap is not a positive odd integer, or if deriv is not 1, 2, 3 or 4.
+
+        """
+        self._check_segment_derivative(segment, gap, deriv)
+        if gap % 2 == 0:
+            raise ValueError(f"gap needs to be a positive odd integer. {gap} was input")
+
+        spacing = (segment + gap) // 2
+        new = self._map_rows(segment_derivative, self.data, self._output(), segment, spacing, deriv)
+
+        self.data = new
+
+    @sort_function_order
+    @set_called
+    @dense_only
+    def norris_williams(self, segment: int = 5, gap: int = 5, deriv: int = 1) -> None:
+        """
+        Compute the Norris-Williams derivative of the data. The data is smoothed with a moving average over segment
+        variables, and the derivative is the central difference of the smoothed data gap variables either side of
+        each variable. The moving average is computed from cumulative sums, so the cost does not depend on the segment
+        and gap sizes. The edges are extended by reflection.
+
+        Parameters
+        ----------
+        segment : int, optional
+            The odd number of variables of the moving average, by default 5.
+        gap : int, optional
+            The distance in variables of the difference, by default 5.
+        deriv : int, optional
+            The derivative order, from 1 to 4, by default 1.
+
+        Raises
+        ------
+        ValueError
+            If segment is not a positive odd integer, gap is not a positive integer, or if deriv is not 1, 2, 3 or 4.
+
+        """
+        self._check_segment_derivative(segment, gap, deriv)
 
-        new = convolve1d(data, coeffs)
+        new = self._map_rows(segment_derivative, self.data, self._output(), segment, gap, deriv)
 
         self.data = new
 
     @sort_function_order
     @set_called
+    @dense_only
     def baseline(
         self, polyorder: int = 1, value_range: tuple = None, fit_type: str = "data"
     ) -> None:
         """
-        Perform baseline correction on data.
+        Perform baseline correction on data. The polynomial is fitted and evaluated through the factors of a
+        projector, which are cached for each polyorder, value_range and number of variables.
 
         Parameters
         ----------
@@ -99,20 +195,172 @@ class Filtering(PreprocessingBaseClass):
                 f'Please input "data" or "mean" as fit_type. {fit_type} was input.'
             )
 
+        # The baseline is the product of the fitted variables with the cached factors of a projector, which fit and
+        # evaluate the polynomial
+        min_range, max_range = value_range
+        projector = baseline_projector(polyorder, (min_range, max_range), data.shape[1], dtype=data.dtype)
+
         if fit_type == "data":
-            poly_x = data
+            new = self._map_rows(baseline, data, self._output(), projector, (min_range, max_range))
         else:
-            poly_x = np.tile(data.mean(axis=0), data.shape[0]).reshape(data.shape)
+            new = baseline(data, projector, (min_range, max_range), fit_type, out=self._output())
 
-        min_range, max_range = value_range
-        poly_x = poly_x[:, min_range:max_range]
+        self.data = new
+
+    @sort_function_order
+    @set_called
+    @dense_only
+    def bin(self, width: int = 2, method: str = "mean") -> None:
+        """
+        Combine each run of width neighbouring variables into a single variable, by their mean or sum. If the number
+        of variables is not divisible by width, the last bin holds the remaining variables. The number of variables is
+        reduced by the factor width, which speeds up the following methods and models. The binning is recorded with
+        the other called methods, so it is also applied to new data in predict.
+
+        Parameters
+        ----------
+        width : int, optional
+            The number of variables of each bin, by default 2.
+        method : str, optional
+            "mean" or "sum", by default "mean".
 
-        a = np.linspace(min_range, 1, max_range)
-        a_full = np.linspace(0, 1, data.shape[1])
+        Raises
+        ------
+        ValueError
+            If width is not a positive integer or if method is not "mean" or "sum".
+
+        """
+        if not isinstance(width, (int, np.integer)) or width < 1:
+            raise ValueError(f"width needs to be a positive integer. {width} was input")
+        if method not in BIN_METHODS:
+            raise ValueError(f"method needs to be one of {' or '.join(BIN_METHODS)}. {method} was input")
+
+        data = self.data
+        n_bins = -(-data.shape[1] // width)
+        new = self._map_rows(bin_variables, data, self._output((data.shape[0], n_bins)), width, method)
 
-        coef = np.polynomial.polynomial.polyfit(a, poly_x.T, deg=polyorder)
+        self.data = new
+
+    @sort_function_order
+    @set_called
+    @dense_only
+    def resample(self, factor: int = 2) -> None:
+        """
+        Keep every factor-th variable, starting with the first, after filtering the data with an anti-alias filter,
+        as in scipy.signal.decimate. The filter is only evaluated at the kept variables. The resampling is recorded
+        with the other called methods, so it is also applied to new data in predict.
+
+        Parameters
+        ----------
+        factor : int, optional
+            The resampling factor, by default 2.
+
+        Raises
+        ------
+        ValueError
+            If factor is not a positive integer.
+
+        """
+        if not isinstance(factor, (int, np.integer)) or factor < 1:
+            raise ValueError(f"factor needs to be a positive integer. {factor} was input")
+
+        data = self.data
+        kernel = resample_kernel(factor, dtype=data.dtype)
+        n_kept = -(-data.shape[1] // factor)
+        new = self._map_rows(resample_variables, data, self._output((data.shape[0], n_kept)), kernel, factor)
+
+        self.data = new
+
+    @sort_function_order
+    @set_called
+    @dense_only
+    def interpolate(self, source_axis: np.ndarray, target_axis: np.ndarray, method: str = "linear") -> None:
+        """
+        Interpolate the spectra from the axis they are sampled at onto another axis, e.g. to bring spectra from
+        instruments with different wavelengths onto a common grid. The interpolation is a sparse operator, which is
+        built once and cached for each pair of axes and method, and applied to all spectra as a single sparse product.
+        The interpolation is recorded with the other called methods, so new data, sampled at the source axis, is
+        interpolated with the cached operator in predict. Targets outside the source axis get the value of the
+        nearest end of the spectrum.
+
+        Parameters
+        ----------
+        source_axis : numpy.ndarray
+            The axis the spectra are sampled at, with a value for each variable. It may be increasing or decreasing.
+        target_axis : numpy.ndarray
+            The axis the spectra are interpolated onto.
+        method : str, optional
+            "linear" or "cubic", by default "linear". "cubic" uses a not-a-knot cubic spline, as
+            scipy.interpolate.CubicSpline.
+
+        Raises
+        ------
+        ValueError
+            If source_axis does not have a distinct value for each variable, or if method is not "linear" or
+            "cubic".
+
+        """
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"method needs to be one of {' or '.join(INTERPOLATION_METHODS)}. {method} was input")
+
+        data = self.data
+        if np.size(source_axis) != data.shape[1]:
+            raise ValueError(
+                f"source_axis needs a value for each of the {data.shape[1]} variables. It has {np.size(source_axis)}"
+            )
+        operator = interpolation_matrix(source_axis, target_axis, method, dtype=data.dtype)
+        new = self._map_rows(interpolate_variables, data, self._output((data.shape[0], operator.shape[0])), operator)
+
+        self.data = new
+
+    @sort_function_order
+    @set_called
+    @dense_only
+    def osc(self, n_components: int = 1) -> None:
+        """
+        Perform orthogonal signal correction (OSC), which removes the variation of the data that is orthogonal to the
+        reference data, as the orthogonal components of OPLS. The reference data is read from response, with the rows
+        currently kept, so the components follow outlier removal and missing data. The components are computed from
+        the cross-products of the centered data and reference data, without deflating the data, see
+        models.regression.opls.orthogonal_components. The weights, loadings and the scores of the mean are stored in
+        scaling_attributes, so in predict mode new data is filtered with two matrix products.
+
+        OSC is fitted to the reference data, so cross-validation fits it, and the non-scaling methods after it, to the
+        training set of each fold instead of to all samples, see cross_validation_preprocessing.split_supervised.
+
+        Parameters
+        ----------
+        n_components : int, optional
+            The number of orthogonal components to remove, by default 1.
+
+        Raises
+        ------
+        ValueError
+            If n_components is not a positive integer, if there is no reference data, or if the reference data does
+            not have a row for each row of the data.
+
+        """
+        if not isinstance(n_components, (int, np.integer)) or n_components < 1:
+            raise ValueError(f"n_components needs to be a positive integer. {n_components} was input")
+
+        data = self.data
+        attributes = self.scaling_attributes
+
+        if self.mode != "predict" or attributes.osc_weights is None:
+            if self.response is None:
+                raise ValueError("osc needs reference data. Use the x preprocessing of a model with y")
+            y = transform_array_1d_to_2d(np.asarray(self.response.get_raw_data(), dtype=np.float64))
+            if y.shape[0] != data.shape[0]:
+                raise ValueError(f"y needs a row for each of the {data.shape[0]} rows of the data. It has {y.shape[0]}")
+            mean = data.mean(axis=0, dtype=np.float64)
+            centered = data - mean
+            weights, loadings = orthogonal_components(
+                centered.T @ centered, centered.T @ (y - y.mean(axis=0)), n_components
+            )
+            attributes.osc_weights, attributes.osc_loadings = weights, loadings
+            attributes.osc_offset = mean @ weights
 
-        baseline = np.polynomial.polynomial.polyval(a_full, coef)
-        new = data - baseline
+        new = self._map_rows(orthogonal_filter, data, self._output(), attributes.osc_weights, attributes.osc_loadings,
+                             attributes.osc_offset)
 
         self.data = new
@@ -0,0 +1,370 @@
+import inspect
+
+import numpy as np
+from scipy import sparse
+
+from me3cs.misc.preprocessing import (baseline, baseline_projector, bin_variables, clipped_log10, convolve_rows, emsc,
+                                      glog, interpolate_variables, interpolation_matrix, msc, normalise, orthogonal_filter,
+                                      preprocessing_scaling, resample_kernel, resample_variables, savgol_coefficients,
+                                      segment_derivative, snv, t2a)
+from me3cs.misc.sparse import CenteredSparse, sparse_normalise, sparse_scaling
+from me3cs.preprocessing.plan import SCALING_METHODS
+
+
+def _freeze_savitzky_golay(prep, dtype: np.dtype, width: int, polyorder: int, deriv: int, delta: int,
+                           method: str) -> dict:
+    return {"kernels": savgol_coefficients(width, polyorder, deriv, delta, dtype=dtype)[None, :], "method": method}
+
+
+def _freeze_baseline(prep, dtype: np.dtype, polyorder: int, value_range: [tuple, None], fit_type: str) -> dict:
+    # The number of variables at the step is only known when it is applied, since later steps, e.g. bin, change the
+    # number of variables of the data. An empty value_range fits all variables
+    value_range = np.zeros(0, dtype=int) if value_range is None else np.asarray(value_range, dtype=int)
+    return {"polyorder": polyorder, "value_range": value_range, "fit_type": fit_type}
+
+
+def _freeze_resample(prep, dtype: np.dtype, factor: int) -> dict:
+    return {"kernel": resample_kernel(factor, dtype=dtype), "factor": factor}
+
+
+def _freeze_interpolate(prep, dtype: np.dtype, source_axis: np.ndarray, target_axis: np.ndarray,
+                        method: str) -> dict:
+    # The axes are stored instead of the operator, which is taken from the cache of interpolation_matrix when applied
+    return {"source_axis": np.asarray(source_axis, dtype=np.float64),
+            "target_axis": np.asarray(target_axis, dtype=np.float64), "method": method}
+
+
+def _freeze_msc(prep, dtype: np.dtype, reference: [np.ndarray, None]) -> dict:
+    if prep.scaling_attributes.msc_reference is None:
+        raise ValueError("msc has not been called")
+    return {"reference": prep.scaling_attributes.msc_reference}
+
+
+def _freeze_emsc(prep, dtype: np.dtype, **kwargs) -> dict:
+    if prep.scaling_attributes.emsc_inverse is None:
+        raise ValueError("emsc has not been called")
+    return {"design": prep.scaling_attributes.emsc_design, "inverse": prep.scaling_attributes.emsc_inverse}
+
+
+def _freeze_osc(prep, dtype: np.dtype, **kwargs) -> dict:
+    attributes = prep.scaling_attributes
+    if attributes.osc_weights is None:
+        raise ValueError("osc has not been called")
+    return {"weights": attributes.osc_weights, "loadings": attributes.osc_loadings, "offset": attributes.osc_offset}
+
+
+def _freeze_scaling(prep, dtype: np.dtype, method: str) -> dict:
+    constant, scale = prep._stored_scaling_parameters(method)
+    n_variables = prep.data.shape[1] if prep.data.ndim > 1 else 1
+    if np.isscalar(scale):
+        scale = np.full(n_variables, scale)
+    return {"constant": np.asarray(constant, dtype=np.float64), "scale": np.asarray(scale, dtype=np.float64)}
+
+
+def _freeze_arguments(prep, dtype: np.dtype, **kwargs) -> dict:
+    return kwargs
+
+
+def _freeze_arithmic_operation(prep, dtype: np.dtype, func, args: tuple, variable_range: [list, tuple, None]) -> dict:
+    return {"func": func, "args": args, "variable_range": variable_range}
+
+
+def _apply_savitzky_golay(data: np.ndarray, out: [np.ndarray, None], kernels: np.ndarray,
+                          method: str) -> np.ndarray:
+    return convolve_rows(data, kernels, method)[0]
+
+
+def _apply_gap_segment(data: np.ndarray, out: [np.ndarray, None], segment: int, gap: int, deriv: int) -> np.ndarray:
+    return segment_derivative(data, segment, (segment + gap) // 2, deriv)
+
+
+def _apply_baseline(data: np.ndarray, out: [np.ndarray, None], polyorder: int, value_range: np.ndarray,
+                    fit_type: str) -> np.ndarray:
+    value_range = (0, data.shape[1]) if len(value_range) == 0 else (int(value_range[0]), int(value_range[1]))
+    projector = baseline_projector(int(polyorder), value_range, data.shape[1], dtype=data.dtype)
+    return baseline(data, projector, value_range, fit_type)
+
+
+def _apply_interpolate(data: np.ndarray, out: [np.ndarray, None], source_axis: np.ndarray, target_axis: np.ndarray,
+                       method: str) -> np.ndarray:
+    return interpolate_variables(data, interpolation_matrix(source_axis, target_axis, method, dtype=data.dtype))
+
+
+def _apply_scaling(data: np.ndarray, out: [np.ndarray, None], constant: np.ndarray,
+                   scale: np.ndarray) -> np.ndarray:
+    return preprocessing_scaling(data, constant, scale, out=out)
+
+
+def _apply_sparse_log10(data: sparse.spmatrix, out: None) -> sparse.spmatrix:
+    # As Standardisation.log10, the logarithm is taken of the stored values, and the other values are kept as zeros
+    new = data.copy()
+    new.data = np.log10(new.data.clip(min=0))
+    return new
+
+
+def _apply_arithmic_operation(data: np.ndarray, out: [np.ndarray, None], func, args: tuple,
+                              variable_range: [list, tuple, None]) -> np.ndarray:
+    if variable_range is None:
+        variable_range = [0, data.shape[1]]
+    new = data.copy()
+    new[:, variable_range[0]: variable_range[1]] = func(data[:, variable_range[0]: variable_range[1]], args)
+    return new
+
+
+# The steps a recorded preprocessing method is frozen into. Each entry maps the qualified name of the method to the
+# name of the step, and a function computing the fixed parameters of the step from the preprocessing object, the
+# data type and the arguments of the method
+FREEZE = {
+    "Filtering.savitzky_golay": ("savitzky_golay", _freeze_savitzky_golay),
+    "Filtering.gap_segment": ("gap_segment", _freeze_arguments),
+    "Filtering.norris_williams": ("norris_williams", _freeze_arguments),
+    "Filtering.baseline": ("baseline", _freeze_baseline),
+    "Filtering.bin": ("bin", _freeze_arguments),
+    "Filtering.resample": ("resample", _freeze_resample),
+    "Filtering.interpolate": ("interpolate", _freeze_interpolate),
+    "Filtering.osc": ("osc", _freeze_osc),
+    "Normalisation.snv": ("snv", _freeze_arguments),
+    "Normalisation.msc": ("msc", _freeze_msc),
+    "Normalisation.emsc": ("emsc", _freeze_emsc),
+    "Normalisation.normalise": ("normalise", _freeze_arguments),
+    "Standardisation.absolute_value": ("absolute_value", _freeze_arguments),
+    "Standardisation.arithmic_operation": ("arithmic_operation", _freeze_arithmic_operation),
+    "Standardisation.log10": ("log10", _freeze_arguments),
+    "Standardisation.glog": ("glog", _freeze_arguments),
+    "Standardisation.t2a": ("t2a", _freeze_arguments),
+    **{f"Scaling.{method}": ("scaling", _freeze_scaling) for method in SCALING_METHODS},
+}
+
+# The functions applying each step. A step is called with the data, an array the result may be written to, which is
+# either None or the data itself, and its parameters
+APPLY = {
+    "savitzky_golay": _apply_savitzky_golay,
+    "gap_segment": _apply_gap_segment,
+    "norris_williams": lambda data, out, segment, gap, deriv: segment_derivative(data, segment, gap, deriv),
+    "baseline": _apply_baseline,
+    "bin": lambda data, out, width, method: bin_variables(data, width, method),
+    "resample": lambda data, out, kernel, factor: resample_variables(data, kernel, factor),
+    "interpolate": _apply_interpolate,
+    "osc": lambda data, out, weights, loadings, offset: orthogonal_filter(data, weights, loadings, offset, out=out),
+    "snv": lambda data, out: snv(data, out=out),
+    "msc": lambda data, out, reference: msc(data, reference, out=out),
+    "emsc": lambda data, out, design, inverse: emsc(data, design, inverse),
+    "normalise": lambda data, out, norm: normalise(data, norm, out=out),
+    "absolute_value": lambda data, out: np.abs(data, out=out),
+    "arithmic_operation": _apply_arithmic_operation,
+    "log10": lambda data, out: clipped_log10(data, out=out),
+    "glog": lambda data, out, lambd, data_0: glog(data, out, lambd, data_0),
+    "t2a": lambda data, out: t2a(data, out=out),
+    "scaling": _apply_scaling,
+}
+
+# The functions applying the steps which keep sparse data sparse, called as the functions of APPLY with out None.
+# Scaling returns a CenteredSparse, so it is the last step applied to sparse data
+SPARSE_APPLY = {
+    "absolute_value": lambda data, out: abs(data),
+    "arithmic_operation": _apply_arithmic_operation,
+    "log10": _apply_sparse_log10,
+    "normalise": lambda data, out, norm: sparse_normalise(data, norm),
+    "scaling": lambda data, out, constant, scale: sparse_scaling(data, constant, scale),
+}
+
+# The steps which transform the data in place, when it is an array allocated by a previous step
+IN_PLACE = ("snv", "msc", "normalise", "osc", "absolute_value", "log10", "glog", "t2a", "scaling")
+
+
+class FrozenPipeline:
+    """
+    The recorded preprocessing methods of a preprocessing object, with all the parameters fitted to the data fixed,
+    e.g. the Savitzky-Golay coefficients, the baseline polynomial, the MSC reference and the scaling vectors. New data
+    is transformed with plain array operations, without creating Data, Index or preprocessing objects, so it gives
+    the same result as the preprocessing object in predict mode, at a fraction of the overhead. The pipeline can be
+    saved to and loaded from a compressed .npz file.
+
+    Parameters
+    ----------
+    steps : list[tuple[str, dict]]
+        The name and parameters of each step, in the order they are applied.
+    dtype : numpy.dtype or str, optional
+        The data type new data is transformed in, by default float64.
+    variables : numpy.ndarray or None, optional
+        A boolean index of the variables of new data which are kept before the steps are applied, by default None,
+        which keeps all variables.
+
+    Methods
+    -------
+    from_preprocessing(prep, variables=None):
+        Freeze the recorded preprocessing methods of a preprocessing object.
+    transform(x):
+        Apply the steps to new data.
+    transform_sparse(x):
+        Apply the steps to new sparse data, which stays sparse.
+    save(path):
+        Save the pipeline to a .npz file.
+    load(path):
+        Load a pipeline saved with save.
+    """
+    def __init__(self, steps: list[tuple[str, dict]], dtype: [np.dtype, str] = np.float64,
+                 variables: [np.ndarray, None] = None) -> None:
+        for name, _ in steps:
+            if name not in APPLY:
+                raise ValueError(f"{name} is not a step of a frozen pipeline")
+        self.steps = steps
+        self.dtype = np.dtype(dtype)
+        self.variables = None if variables is None else np.asarray(variables, dtype=bool)
+
+    @classmethod
+    def from_preprocessing(cls, prep, variables: [np.ndarray, None] = None) -> "FrozenPipeline":
+        """
+        Freeze the recorded preprocessing methods of a preprocessing object, with the parameters fitted in preprocess
+        mode. The data of the preprocessing object is not changed.
+
+        Parameters
+        ----------
+        prep : PreprocessingBaseClass
+            The preprocessing object.
+        variables : numpy.ndarray or None, optional
+            A boolean index of the variables of new data which are kept, by default None.
+
+        Returns
+        -------
+        FrozenPipeline
+            The frozen pipeline.
+
+        Raises
+        ------
+        ValueError
+            If a method cannot be frozen, or if the parameters of a method have not been computed.
+        """
+        dtype = prep.data_class.dtype
+        steps = []
+        for function, args, kwargs in zip(prep.called.function, prep.called.args, prep.called.kwargs):
+            if function.__qualname__ not in FREEZE:
+                raise ValueError(f"{function.__name__} cannot be frozen")
+            name, freeze = FREEZE[function.__qualname__]
+
+            arguments = inspect.signature(function).bind(prep, *args, **kwargs)
+            arguments.apply_defaults()
+            arguments = dict(list(arguments.arguments.items())[1:])
+            if name == "scaling":
+                arguments = {"method": function.__name__}
+            steps.append((name, freeze(prep, dtype, **arguments)))
+        return cls(steps, dtype, variables)
+
+    def transform(self, x: [np.ndarray, sparse.spmatrix]) -> [np.ndarray, sparse.csr_matrix, CenteredSparse]:
+        """
+        Apply the steps to new data. Sparse data stays sparse, see transform_sparse.
+
+        Parameters
+        ----------
+        x : numpy.ndarray or scipy.sparse.spmatrix
+            The new data of shape (n_samples, n_features), or a single spectrum of shape (n_features,).
+
+        Returns
+        -------
+        numpy.ndarray, scipy.sparse.csr_matrix or CenteredSparse
+            The transformed data of shape (n_samples, n_variables), in the data type of the pipeline.
+        """
+        if sparse.issparse(x):
+            return self.transform_sparse(x)
+
+        data = np.asarray(x)
+        if data.ndim == 1:
+            data = data[None, :]
+        if self.variables is not None:
+            data = data[:, self.variables]
+        data = data.astype(self.dtype, copy=False)
+
+        # The input is never written to, while arrays allocated by a step are transformed in place by the next
+        owned = not np.may_share_memory(data, x)
+        for name, parameters in self.steps:
+            out = data if owned and name in IN_PLACE else None
+            data = APPLY[name](data, out, **parameters)
+            owned = True
+        return data
+
+    def transform_sparse(self, x: sparse.spmatrix) -> [sparse.csr_matrix, CenteredSparse]:
+        """
+        Apply the steps to new sparse data, which stays sparse. Scaling keeps the centering as an implicit offset, as
+        the scaling methods of the preprocessing module do for sparse data.
+
+        Parameters
+        ----------
+        x : scipy.sparse.spmatrix
+            The new data of shape (n_samples, n_features).
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix or CenteredSparse
+            The transformed data of shape (n_samples, n_variables), in the data type of the pipeline. It is a
+            CenteredSparse if the pipeline scales the data.
+
+        Raises
+        ------
+        TypeError
+            If a step would make the data dense, e.g. snv or savitzky_golay.
+        """
+        data = sparse.csr_matrix(x)
+        if self.variables is not None:
+            data = data[:, self.variables]
+        data = data.astype(self.dtype, copy=False)
+
+        for name, parameters in self.steps:
+            if name not in SPARSE_APPLY or (isinstance(data, CenteredSparse) and name != "scaling"):
+                raise TypeError(f"{name} is not supported for sparse data, since it would make the data dense")
+            data = SPARSE_APPLY[name](data, None, **parameters)
+        return data
+
+    def save(self, path: str) -> None:
+        """
+        Save the pipeline to a compressed .npz file, which can be loaded without pickling.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Raises
+        ------
+        ValueError
+            If the pipeline contains an arithmic_operation, whose function cannot be saved.
+        """
+        arrays = {"dtype": np.array(self.dtype.str), "steps": np.array([name for name, _ in self.steps], dtype=str)}
+        if self.variables is not None:
+            arrays["variables"] = self.variables
+        for i, (name, parameters) in enumerate(self.steps):
+            if name == "arithmic_operation":
+                raise ValueError("A pipeline with an arithmic_operation cannot be saved")
+            for parameter, value in parameters.items():
+                arrays[f"{i}.{parameter}"] = np.asarray(value)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "FrozenPipeline":
+        """
+        Load a pipeline saved with save.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Returns
+        -------
+        FrozenPipeline
+            The loaded pipeline.
+        """
+        with np.load(path, allow_pickle=False) as file:
+            arrays = dict(file)
+        steps = [(str(name), {}) for name in arrays.pop("steps")]
+        dtype = str(arrays.pop("dtype"))
+        variables = arrays.pop("variables", None)
+        for key, value in arrays.items():
+            i, parameter = key.split(".", 1)
+            steps[int(i)][1][parameter] = value.item() if value.ndim == 0 else value
+        return cls(steps, dtype, variables)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __repr__(self) -> str:
+        return f"FrozenPipeline({' -> '.join(name for name, _ in self.steps) or 'None'})"
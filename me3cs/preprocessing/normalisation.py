@@ -1,8 +1,9 @@
 import numpy as np
+from scipy import sparse
 
-from me3cs.misc.handle_data import handle_zeros_in_scale
-from me3cs.misc.preprocessing import preprocessing_scaling
-from me3cs.preprocessing.base import PreprocessingBaseClass, sort_function_order
+from me3cs.misc.preprocessing import emsc, emsc_design, msc, normalise, snv
+from me3cs.misc.sparse import sparse_normalise
+from me3cs.preprocessing.base import PreprocessingBaseClass, dense_only, sort_function_order
 from me3cs.preprocessing.called import set_called
 
 
@@ -18,26 +19,31 @@ class Normalisation(PreprocessingBaseClass):
 
     msc(reference: np.ndarray = None):
         Perform Multiplicative Scatter Correction (MSC) on the spectral data.
+    emsc(poly_order: int = 2, interferents: np.ndarray = None, reference: np.ndarray = None):
+        Perform Extended Multiplicative Scatter Correction (EMSC) on the spectral data.
+    normalise(norm: str = "l2"):
+        Divide each spectrum by its norm.
     """
 
+    NORMS = ("l1", "l2", "max")
+
     @sort_function_order
     @set_called
+    @dense_only
     def snv(self) -> None:
         """
         Perform Standard Normal Variate (SNV) scaling on the spectral data.
         """
-        data = self.data
-        constant = -data.mean(axis=1)
-        scale = handle_zeros_in_scale(data.std(axis=1))
-
-        new = preprocessing_scaling(data.T, constant, scale)
-        self.data = new.T
+        self.data = self._map_rows(snv, self.data, self._output())
 
     @sort_function_order
     @set_called
+    @dense_only
     def msc(self, reference: np.ndarray = None) -> None:
         """
-        Perform Multiplicative Scatter Correction (MSC) on the spectral data.
+        Perform Multiplicative Scatter Correction (MSC) on the spectral data. The offset and slope of every spectrum
+        against the reference are computed in closed form, from the products of the spectra with the centered
+        reference. The reference is stored in scaling_attributes, and reused in predict mode.
 
         Parameters:
         -----------
@@ -46,18 +52,74 @@ class Normalisation(PreprocessingBaseClass):
             of the spectral data will be used as reference.
         """
         data = self.data
-        
-        if self.mode == "predict":
-            reference = self.scaling_attributes.mean
 
-        if reference is None:
+        if self.mode == "predict" and self.scaling_attributes.msc_reference is not None:
+            ref = self.scaling_attributes.msc_reference
+        elif reference is None:
             # Set reference data
-            ref = data.mean(axis=0)
+            ref = data.mean(axis=0, dtype=np.float64)
+        else:
+            ref = np.asarray(reference, dtype=np.float64).reshape(-1)
+        self.scaling_attributes.msc_reference = ref
+
+        self.data = self._map_rows(msc, data, self._output(), ref)
 
+    @sort_function_order
+    @set_called
+    @dense_only
+    def emsc(self, poly_order: int = 2, interferents: np.ndarray = None, reference: np.ndarray = None) -> None:
+        """
+        Perform Extended Multiplicative Scatter Correction (EMSC) on the spectral data. Every spectrum is modelled as
+        a scaled reference, plus a polynomial and the interferent spectra, and is corrected by subtracting the
+        polynomial and interferents and dividing by the scale. All spectra are fitted with the same pseudo-inverse of
+        the design matrix, which is stored in scaling_attributes with the reference, and reused in predict mode.
+
+        Parameters:
+        -----------
+        poly_order : int, optional
+            The order of the polynomial. Default is 2.
+        interferents : np.ndarray, optional
+            Spectra of shape (n_interferents, n_features), whose contributions are removed. Default is None.
+        reference : np.ndarray, optional
+            A numpy array containing the reference spectrum. If not provided, the mean
+            of the spectral data will be used as reference.
+        """
+        data = self.data
+        attributes = self.scaling_attributes
+
+        if self.mode == "predict" and attributes.emsc_inverse is not None:
+            design, inverse = attributes.emsc_design, attributes.emsc_inverse
         else:
-            ref = reference
+            ref = data.mean(axis=0, dtype=np.float64) if reference is None else reference
+            design = emsc_design(ref, poly_order, interferents)
+            inverse = np.linalg.pinv(design)
+            attributes.emsc_reference = design[:, 0]
+            attributes.emsc_design, attributes.emsc_inverse = design, inverse
+
+        self.data = self._map_rows(emsc, data, self._output(), design, inverse)
+
+    @sort_function_order
+    @set_called
+    def normalise(self, norm: str = "l2") -> None:
+        """
+        Divide each spectrum by its norm. The spectra are not centered, so sparse data stays sparse.
+
+        Parameters:
+        -----------
+        norm : str, optional
+            The norm of the spectra, either "l1", "l2" or "max". Default is "l2".
 
-        fit = np.polynomial.polynomial.polyfit(ref, data.T, deg=1)
-        new = (data.T - fit[0]) / handle_zeros_in_scale(fit[1])
+        Raises:
+        -------
+        ValueError
+            If norm is not "l1", "l2" or "max".
+        """
+        if norm not in self.NORMS:
+            raise ValueError(f"norm needs to be one of {' or '.join(self.NORMS)}. {norm} was input")
+
+        data = self.data
+        if sparse.issparse(data):
+            self.data = sparse_normalise(data, norm)
+            return
 
-        self.data = new.T
+        self.data = self._map_rows(normalise, data, self._output(), norm)
@@ -0,0 +1,329 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from me3cs.misc.fingerprint import combine, hash_object
+from me3cs.misc.preprocessing import clipped_log10, glog, preprocessing_scaling, t2a
+from me3cs.preprocessing.called import Called
+
+# The number of elements processed at a time by a fused stage, so the intermediate results of a block of rows stay
+# in the cache while all the fused steps are applied to it
+BLOCK_ELEMENTS = 1 << 16
+
+
+# Kernels of the preprocessing methods, which transform each element independently of the others. A kernel writes
+# the transformed block to out, which may be the block itself, and gives the same result as the method
+ELEMENTWISE = {
+    "Standardisation.absolute_value": np.absolute,
+    "Standardisation.log10": clipped_log10,
+    "Standardisation.glog": glog,
+    "Standardisation.t2a": t2a,
+}
+
+SCALING_METHODS = ("autoscale", "mean_center", "pareto", "median_center")
+
+# Methods fitted to the reference data. Cross-validation fits them to the training set of each fold, since applied
+# before the split they would leak the reference data of the test sets into the training sets
+SUPERVISED_METHODS = ("osc",)
+
+# The number of intermediate results kept by a prefix cache
+PREFIX_CACHE_ENTRIES = 4
+
+
+class PrefixCache:
+    """
+    A least recently used cache of the intermediate results of a plan. Each result is stored under a key, which
+    combines the fingerprint of the data the plan started from with the methods and arguments of every stage up to
+    and including the stage that produced it. A plan whose first stages are unchanged therefore only recomputes the
+    stages after them. The scaling attributes set by the stages are stored with each result, since stages such as msc
+    store their reference in them.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        The maximum number of results kept, by default PREFIX_CACHE_ENTRIES.
+    """
+    def __init__(self, max_entries: int = PREFIX_CACHE_ENTRIES) -> None:
+        if max_entries < 0:
+            raise ValueError(f"max_entries needs to be a non-negative integer, not {max_entries}")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> [tuple[np.ndarray, dict], None]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: str, data: np.ndarray, attributes: dict) -> None:
+        if self.max_entries == 0:
+            return
+        if isinstance(data, np.ndarray):
+            data.flags.writeable = False
+        self._entries[key] = data, attributes
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def source_key(prep) -> [str, None]:
+    """
+    Returns a fingerprint of the data a plan starts from, if the data is a level of the data hierarchy whose
+    contents are known from the fingerprints of the data, i.e. the raw data with the indices applied, possibly with
+    missing data imputed.
+
+    Parameters
+    ----------
+    prep : PreprocessingBaseClass
+        The preprocessing object.
+
+    Returns
+    -------
+    str or None
+        The fingerprint, or None if the contents of the data are not known.
+    """
+    data_class = prep.data_class
+    key = (data_class.raw_fingerprint, data_class.dtype.str, data_class.rows.fingerprint,
+           data_class.variables.fingerprint)
+
+    if not data_class.preprocessing_data.is_set:
+        if data_class.outlier_detection.is_set:
+            return None
+        if not data_class.missing_data.is_set:
+            return combine(*key)
+        missing_data = data_class.pipelines.get("missing_data")
+        return None if missing_data is None else combine(*key, missing_data.fingerprint)
+
+    # The data was reset to the raw data with the indices applied, e.g. after the order of the methods changed
+    if prep.data is data_class._raw_data:
+        return combine(*key)
+    return None
+
+
+class CallStage:
+    """
+    A step of the plan, which calls the recorded preprocessing method, e.g. a filter which depends on the
+    neighbouring variables.
+
+    Parameters
+    ----------
+    function : function
+        The recorded preprocessing method.
+    args : tuple
+        The positional arguments of the method.
+    kwargs : dict
+        The keyword arguments of the method.
+    """
+    def __init__(self, function, args: tuple, kwargs: dict) -> None:
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    cacheable = True
+
+    def execute(self, prep, buffer: [np.ndarray, None]) -> None:
+        self.function(prep, *self.args, **self.kwargs)
+        return None
+
+    @property
+    def fingerprint(self) -> str:
+        return hash_object((self.function, self.args, self.kwargs))
+
+    def __repr__(self) -> str:
+        return f"Call({self.function.__name__})"
+
+
+class FusedStage:
+    """
+    Consecutive elementwise steps of the plan, which are applied to one block of rows at a time. The data is read
+    once and written once, instead of once per step, and only a single output array is allocated.
+
+    Parameters
+    ----------
+    steps : list[tuple[function, tuple, dict]]
+        The recorded methods and their arguments.
+    """
+    cacheable = True
+
+    def __init__(self, steps: list) -> None:
+        self.steps = steps
+
+    @property
+    def fingerprint(self) -> str:
+        return combine(*(hash_object(step) for step in self.steps))
+
+    def execute(self, prep, buffer: [np.ndarray, None]) -> [np.ndarray, None]:
+        data = prep.data
+        if not isinstance(data, np.ndarray) or data.ndim != 2:
+            for function, args, kwargs in self.steps:
+                function(prep, *args, **kwargs)
+            return None
+
+        if buffer is not data:
+            buffer = prep._output()
+        prep._map_rows(self._apply, data, buffer)
+        prep.data = buffer
+        return buffer
+
+    def _apply(self, data: np.ndarray, out: np.ndarray) -> np.ndarray:
+        # Applies the steps to one small block of rows at a time
+        rows_per_block = max(1, BLOCK_ELEMENTS // max(1, data.shape[1]))
+        for start in range(0, data.shape[0], rows_per_block):
+            block = data[start: start + rows_per_block]
+            block_out = out[start: start + rows_per_block]
+            for function, args, kwargs in self.steps:
+                ELEMENTWISE[function.__qualname__](block, block_out, *args, **kwargs)
+                block = block_out
+        return out
+
+    def __repr__(self) -> str:
+        return f"Fused({', '.join(function.__name__ for function, _, _ in self.steps)})"
+
+
+class AffineStage(CallStage):
+    """
+    A scaling step of the plan, which computes the constant and scale of the method and applies them to the data in
+    place, when the data is an array allocated by the plan. The data is never written to otherwise. The stage is
+    not cached, since its parameters depend on the mode.
+    """
+    cacheable = False
+
+    def execute(self, prep, buffer: [np.ndarray, None]) -> [np.ndarray, None]:
+        data = prep.data
+        if not hasattr(prep, "_scaling_parameters") or not isinstance(data, np.ndarray):
+            return super().execute(prep, buffer)
+
+        try:
+            parameters = prep._scaling_parameters(self.function.__name__)
+        except ValueError as error:
+            print(error)
+            return buffer
+        if parameters is None:
+            return buffer
+
+        if buffer is not data:
+            buffer = prep._output()
+        preprocessing_scaling(data, *parameters, out=buffer)
+        prep.data = buffer
+        prep.update_is_centered(True)
+        return buffer
+
+    def __repr__(self) -> str:
+        return f"Affine({self.function.__name__})"
+
+
+class Plan:
+    """
+    A compiled sequence of preprocessing steps.
+
+    Parameters
+    ----------
+    stages : list
+        The stages of the plan, in the order they are applied.
+    """
+    def __init__(self, stages: list) -> None:
+        self.stages = stages
+
+    def keys(self, prep) -> list[str]:
+        """
+        Returns the cache keys of the results of the leading cacheable stages.
+
+        Parameters
+        ----------
+        prep : PreprocessingBaseClass
+            The preprocessing object whose data is transformed.
+
+        Returns
+        -------
+        list[str]
+            The cache key of each leading cacheable stage. Empty if the data the plan starts from is not known.
+        """
+        key = source_key(prep)
+        if key is None:
+            return []
+        keys = []
+        for stage in self.stages:
+            if not stage.cacheable:
+                break
+            key = combine(key, stage.fingerprint)
+            keys.append(key)
+        return keys
+
+    def execute(self, prep, cache: [PrefixCache, None] = None) -> None:
+        """
+        Apply the plan to the data of a preprocessing object. An array allocated by a stage is reused by the
+        following stages, as long as it holds the current data, while the raw data is never written to.
+
+        Parameters
+        ----------
+        prep : PreprocessingBaseClass
+            The preprocessing object whose data is transformed.
+        cache : PrefixCache or None, optional
+            A cache of intermediate results, by default None. The longest prefix of the plan found in the cache is
+            not recomputed, and the results of the other leading cacheable stages are added to it.
+        """
+        keys = self.keys(prep) if cache is not None else []
+        initial = dict(vars(prep.scaling_attributes))
+        start = 0
+        for position in range(len(keys), 0, -1):
+            entry = cache.get(keys[position - 1])
+            if entry is not None:
+                data, attributes = entry
+                prep.data = data
+                vars(prep.scaling_attributes).update(attributes)
+                start = position
+                break
+
+        buffer = None
+        for position in range(start, len(self.stages)):
+            buffer = self.stages[position].execute(prep, buffer)
+            if position < len(keys):
+                # The cached result is read-only, so it is not reused as the buffer of the next stage
+                attributes = {name: value for name, value in vars(prep.scaling_attributes).items()
+                              if initial.get(name) is not value}
+                cache.put(keys[position], prep.data, attributes)
+                buffer = None
+
+    def __repr__(self) -> str:
+        return f"Plan({' -> '.join(repr(stage) for stage in self.stages)})"
+
+
+def compile_plan(called: Called, include: [tuple, None] = None) -> Plan:
+    """
+    Compile the recorded preprocessing methods into a plan. Consecutive elementwise methods are fused into a single
+    blocked pass over the data, and scaling methods are applied in place.
+
+    Parameters
+    ----------
+    called : Called
+        The recorded preprocessing methods.
+    include : tuple or None, optional
+        The names of the preprocessing classes whose methods are included, by default None, which includes all.
+
+    Returns
+    -------
+    Plan
+        The compiled plan.
+    """
+    stages = []
+    for function, args, kwargs in zip(called.function, called.args, called.kwargs):
+        prep_type = function.__qualname__.split(".")[0]
+        if include is not None and prep_type not in include:
+            continue
+
+        if function.__qualname__ in ELEMENTWISE:
+            if stages and isinstance(stages[-1], FusedStage):
+                stages[-1].steps.append((function, args, kwargs))
+            else:
+                stages.append(FusedStage([(function, args, kwargs)]))
+        elif prep_type == "Scaling" and function.__name__ in SCALING_METHODS:
+            stages.append(AffineStage(function, args, kwargs))
+        else:
+            stages.append(CallStage(function, args, kwargs))
+    return Plan(stages)
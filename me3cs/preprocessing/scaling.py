@@ -1,10 +1,16 @@
 import numpy as np
 
+from me3cs.framework.data import ChunkedData
 from me3cs.misc.handle_data import handle_zeros_in_scale
 from me3cs.misc.preprocessing import preprocessing_scaling
+from me3cs.misc.sparse import is_sparse, sparse_column_statistic, sparse_scaling
+from me3cs.misc.statistics import EXACT_MEDIAN_ELEMENTS, QuantileSketch, RunningMoments
 from me3cs.preprocessing.base import PreprocessingBaseClass
 from me3cs.preprocessing.called import set_called
 
+# The number of elements of the blocks of rows the median of large data is sketched over
+SKETCH_BLOCK_ELEMENTS = 1 << 22
+
 
 def scale_once(func):
     """Decorator function to ensure scaling functions are only called once.
@@ -42,11 +48,7 @@ def scale_once(func):
 
                 func(self, *args, **kwargs)
                 self.data = self.data_class.get_raw_data()
-
-                for function, args, kwargs in zip(
-                        self.called.function, self.called.args, self.called.kwargs
-                ):
-                    function(self, *args, **kwargs)
+                self.call_in_order()
 
     return inner
 
@@ -65,11 +67,55 @@ class Scaling(PreprocessingBaseClass):
         Scale the data using square root of standard deviation.
     median_center()
         Subtract the median from the data.
+    partial_fit(chunk)
+        Accumulate the column moments of a chunk of rows.
+    merge_partial_fit(other)
+        Merge the accumulated moments of another scaling object.
+    finalize()
+        Set the scaling attributes from the accumulated moments.
     """
 
+    def _column_statistic(self, statistic: str) -> np.ndarray:
+        """
+        Compute a statistic of each column of the data. If the data is ChunkedData, which has not been changed from
+        the raw data, the statistic is streamed over its blocks of rows instead of computed on the full matrix. The
+        statistics of sparse data are computed without making it dense. The median of data with more than
+        EXACT_MEDIAN_ELEMENTS elements, e.g. memory-mapped data, is approximated with a QuantileSketch over blocks of
+        rows.
+
+        Parameters
+        ----------
+        statistic : str
+            The statistic, either "mean", "std" or "median".
+
+        Returns
+        -------
+        numpy.ndarray
+            The statistic of each column.
+        """
+        if isinstance(self.data_class, ChunkedData) and self.data_class.levels_are_raw:
+            return getattr(self.data_class, statistic)()
+        if is_sparse(self.data):
+            return sparse_column_statistic(self.data, statistic)
+
+        match statistic:
+            case "mean":
+                return self.data.mean(axis=0, dtype=np.float64)
+            case "std":
+                return self.data.std(axis=0, dtype=np.float64)
+            case "median":
+                if self.data.size <= EXACT_MEDIAN_ELEMENTS:
+                    return np.median(self.data, axis=0)
+                sketch = QuantileSketch()
+                rows_per_block = max(1, SKETCH_BLOCK_ELEMENTS // max(1, self.data.shape[1]))
+                for start in range(0, self.data.shape[0], rows_per_block):
+                    sketch.update(self.data[start: start + rows_per_block])
+                return sketch.quantile(0.5)
+
     def _scale_pipeline(self, constant: [np.ndarray | float], scale: [np.ndarray | float]) -> None:
         """
         Perform scaling of data using specified constant and scale. updates the is_centered instance variable to True.
+        Sparse data is centered implicitly, so it stays sparse.
 
         Parameters
         ----------
@@ -81,38 +127,122 @@ class Scaling(PreprocessingBaseClass):
         """
         data = self.data
 
-        new = preprocessing_scaling(data, constant, scale)
+        if is_sparse(data):
+            new = sparse_scaling(data, constant, scale)
+        else:
+            new = preprocessing_scaling(data, constant, scale, out=self._output())
         self.data = new
         self.update_is_centered(True)
 
-    @scale_once
-    @set_called
-    def autoscale(self) -> None:
-        """
-        Scale the data to have zero mean and unit variance.
+    def _scaling_parameters(self, method: str) -> [tuple[np.ndarray | float, np.ndarray | float], None]:
         """
+        Compute the constant and scale of a scaling method for the current mode. In preprocess mode the parameters
+        are computed from the data and stored in scaling_attributes, in predict mode the stored parameters are used.
 
+        Parameters
+        ----------
+        method : str
+            The name of the scaling method, either "autoscale", "mean_center", "pareto" or "median_center".
+
+        Returns
+        -------
+        tuple[numpy.ndarray or float, numpy.ndarray or float] or None
+            The constant added to the data and the scale the data is divided by, or None if the mode does not scale.
+
+        Raises
+        ------
+        ValueError
+            If the parameters are needed from scaling_attributes in predict mode, but have not been computed.
+        """
         match self.mode:
             case "preprocess":
-                constant = self.data.mean(axis=0)
-                self.scaling_attributes.mean = constant
+                if method == "median_center":
+                    constant = self._column_statistic("median")
+                    self.scaling_attributes.median = constant
+                    return -constant, 1.0
 
-                scale = handle_zeros_in_scale(self.data.std(axis=0))
-                self.scaling_attributes.std = scale
-                self._scale_pipeline(-constant, scale)
+                constant = self._column_statistic("mean")
+                self.scaling_attributes.mean = constant
+                match method:
+                    case "autoscale":
+                        scale = handle_zeros_in_scale(self._column_statistic("std"))
+                        self.scaling_attributes.std = scale
+                    case "pareto":
+                        scale = handle_zeros_in_scale(np.sqrt(self._column_statistic("std")))
+                        self.scaling_attributes.sqrt_std = scale
+                    case _:
+                        scale = 1.0
+                return -constant, scale
 
             case "reference":
-                constant = self._reference.mean(axis=0)
-                scale = handle_zeros_in_scale(self._reference.std(axis=0))
-                self._scale_pipeline(-constant, scale)
+                if method == "median_center":
+                    return -np.median(self._reference, axis=0), 1.0
+
+                constant = self._reference.mean(axis=0, dtype=np.float64)
+                match method:
+                    case "autoscale":
+                        scale = handle_zeros_in_scale(self._reference.std(axis=0, dtype=np.float64))
+                    case "pareto":
+                        scale = handle_zeros_in_scale(np.sqrt(self._reference.std(axis=0, dtype=np.float64)))
+                    case _:
+                        scale = 1.0
+                return -constant, scale
 
             case "predict":
-                try:
-                    constant = self.scaling_attributes.mean
-                    scale = self.scaling_attributes.std
-                    self._scale_pipeline(-constant, scale)
-                except ValueError:
-                    print("Autoscaling has not been called")
+                return self._stored_scaling_parameters(method)
+
+        return None
+
+    def _stored_scaling_parameters(self, method: str) -> tuple[np.ndarray, np.ndarray | float]:
+        """
+        Returns the constant and scale of a scaling method from scaling_attributes, as used in predict mode.
+
+        Parameters
+        ----------
+        method : str
+            The name of the scaling method, either "autoscale", "mean_center", "pareto" or "median_center".
+
+        Returns
+        -------
+        tuple[numpy.ndarray, numpy.ndarray or float]
+            The constant added to the data and the scale the data is divided by.
+
+        Raises
+        ------
+        ValueError
+            If the parameters have not been computed.
+        """
+        attributes = self.scaling_attributes
+        constant = attributes.median if method == "median_center" else attributes.mean
+        scale = {"autoscale": attributes.std, "pareto": attributes.sqrt_std}.get(method, 1.0)
+        if constant is None or scale is None:
+            raise ValueError(f"{method} has not been called")
+        return -constant, scale
+
+    def _scale(self, method: str) -> None:
+        """
+        Scale the data with a scaling method.
+
+        Parameters
+        ----------
+        method : str
+            The name of the scaling method.
+        """
+        try:
+            parameters = self._scaling_parameters(method)
+        except ValueError as error:
+            print(error)
+            return
+        if parameters is not None:
+            self._scale_pipeline(*parameters)
+
+    @scale_once
+    @set_called
+    def autoscale(self) -> None:
+        """
+        Scale the data to have zero mean and unit variance.
+        """
+        self._scale("autoscale")
 
     @scale_once
     @set_called
@@ -120,22 +250,7 @@ class Scaling(PreprocessingBaseClass):
         """
         Subtract the mean from the data.
         """
-        match self.mode:
-            case "preprocess":
-                constant = self.data.mean(axis=0)
-                self.scaling_attributes.mean = constant
-                self._scale_pipeline(-constant, 1.0)
-
-            case "reference":
-                constant = self._reference.mean(axis=0)
-                self._scale_pipeline(-constant, 1.0)
-
-            case "predict":
-                try:
-                    constant = self.scaling_attributes.mean
-                    self._scale_pipeline(-constant, 1.0)
-                except ValueError:
-                    print("mean_center has not been called")
+        self._scale("mean_center")
 
     @scale_once
     @set_called
@@ -143,29 +258,7 @@ class Scaling(PreprocessingBaseClass):
         """
         Scale the data using square root of standard deviation, and subtracts the mean.
         """
-        match self.mode:
-            case "preprocess":
-                constant = self.data.mean(axis=0)
-                self.scaling_attributes.mean = constant
-
-                scale = handle_zeros_in_scale(np.sqrt(self.data.std(axis=0)))
-                self.scaling_attributes.sqrt_std = scale
-
-                self._scale_pipeline(-constant, scale)
-
-            case "reference":
-                constant = self._reference.mean(axis=0)
-                scale = handle_zeros_in_scale(np.sqrt(self._reference.std(axis=0)))
-                self._scale_pipeline(-constant, scale)
-
-            case "predict":
-                try:
-                    constant = self.scaling_attributes.mean
-                    scale = self.scaling_attributes.sqrt_std
-                    self._scale_pipeline(-constant, scale)
-
-                except ValueError:
-                    print("Autoscaling has not been called")
+        self._scale("pareto")
 
     @scale_once
     @set_called
@@ -173,19 +266,85 @@ class Scaling(PreprocessingBaseClass):
         """
         Subtract the median from the data.
         """
-        match self.mode:
-            case "preprocess":
-                constant = np.median(self.data, axis=0)
-                self.scaling_attributes.median = constant
-                self._scale_pipeline(-constant, 1.0)
+        self._scale("median_center")
 
-            case "reference":
-                constant = np.median(self._reference, axis=0)
-                self._scale_pipeline(-constant, 1.0)
+    def partial_fit(self, chunk: np.ndarray, median: bool = False) -> None:
+        """
+        Accumulate the column means and variances of a chunk of rows in scaling_attributes.moments, e.g. of data
+        streamed from disk or an instrument. The moments are combined with the algorithm of Chan et al., so the
+        chunks can have any size. The chunks should already have the other preprocessing methods applied. Call
+        finalize() to set the scaling attributes, which are then used by the scaling methods in predict mode.
 
-            case "predict":
-                try:
-                    constant = self.scaling_attributes.median
-                    self._scale_pipeline(-constant, 1.0)
-                except ValueError:
-                    print("mean_center has not been called")
+        Parameters
+        ----------
+        chunk : numpy.ndarray
+            A chunk of rows, with the same number of columns as the previous chunks.
+        median : bool, optional
+            Whether the columns are also accumulated in scaling_attributes.median_sketch, a QuantileSketch from
+            which finalize() approximates the median for median_center. Default is False.
+
+        Raises
+        ------
+        ValueError
+            If the chunk does not have the same number of columns as the previous chunks.
+        """
+        if is_sparse(chunk):
+            chunk = chunk.toarray()
+        if self.scaling_attributes.moments is None:
+            self.scaling_attributes.moments = RunningMoments()
+        self.scaling_attributes.moments.update(chunk)
+        if median:
+            if self.scaling_attributes.median_sketch is None:
+                self.scaling_attributes.median_sketch = QuantileSketch()
+            self.scaling_attributes.median_sketch.update(chunk)
+
+    def merge_partial_fit(self, other: ["Scaling", RunningMoments]) -> None:
+        """
+        Merge the moments and median sketch accumulated by another scaling object, e.g. in another worker process,
+        into the ones of this one.
+
+        Parameters
+        ----------
+        other : Scaling or RunningMoments
+            The scaling object, or its accumulated moments.
+
+        Raises
+        ------
+        ValueError
+            If the moments do not have the same number of columns.
+        """
+        if isinstance(other, RunningMoments):
+            moments, sketch = other, None
+        else:
+            moments, sketch = other.scaling_attributes.moments, other.scaling_attributes.median_sketch
+
+        if moments is not None:
+            if self.scaling_attributes.moments is None:
+                self.scaling_attributes.moments = RunningMoments()
+            self.scaling_attributes.moments.merge(moments)
+        if sketch is not None:
+            if self.scaling_attributes.median_sketch is None:
+                self.scaling_attributes.median_sketch = QuantileSketch(sketch.compression)
+            self.scaling_attributes.median_sketch.merge(sketch)
+
+    def finalize(self) -> None:
+        """
+        Set the mean, standard deviation and square root of the standard deviation in scaling_attributes from the
+        accumulated moments, and the median from the median sketch, if it was accumulated. More chunks can be
+        accumulated afterwards, and finalize called again.
+
+        Raises
+        ------
+        ValueError
+            If no chunks have been accumulated.
+        """
+        moments = self.scaling_attributes.moments
+        if moments is None or moments.count == 0:
+            raise ValueError("partial_fit needs to be called before finalize")
+
+        std = moments.std()
+        self.scaling_attributes.mean = moments.mean.copy()
+        self.scaling_attributes.std = handle_zeros_in_scale(std)
+        self.scaling_attributes.sqrt_std = handle_zeros_in_scale(np.sqrt(std))
+        if self.scaling_attributes.median_sketch is not None:
+            self.scaling_attributes.median = self.scaling_attributes.median_sketch.quantile(0.5)
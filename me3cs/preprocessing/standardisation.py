@@ -1,6 +1,8 @@
 import numpy as np
+from scipy import sparse
 
-from me3cs.preprocessing.base import PreprocessingBaseClass, sort_function_order
+from me3cs.misc.preprocessing import clipped_log10, glog, t2a
+from me3cs.preprocessing.base import PreprocessingBaseClass, dense_only, sort_function_order
 from me3cs.preprocessing.called import set_called
 
 
@@ -27,10 +29,10 @@ class Standardisation(PreprocessingBaseClass):
     @set_called
     def absolute_value(self) -> None:
         """
-        Converts the data to absolute values.
+        Converts the data to absolute values. Sparse data stays sparse.
         """
         data = self.data
-        new = np.abs(data)
+        new = abs(data) if sparse.issparse(data) else np.abs(data, out=self._output())
         self.data = new
 
     @sort_function_order
@@ -63,7 +65,11 @@ class Standardisation(PreprocessingBaseClass):
         if not isinstance(variable_range, (list, tuple)):
             raise TypeError("Please input list or tuple as variable_range")
 
-        new = data
+        if sparse.issparse(data):
+            new = data.copy()
+        else:
+            new = self._output()
+            np.copyto(new, data)
         new[:, variable_range[0]: variable_range[1]] = func(
             data[:, variable_range[0]: variable_range[1]], args
         )
@@ -74,16 +80,22 @@ class Standardisation(PreprocessingBaseClass):
     @set_called
     def log10(self) -> None:
         """
-        Take the logarithm base 10 of the data.
+        Take the logarithm base 10 of the data. For sparse data the logarithm is taken of the stored values, and the
+        values which are not stored are kept as zeros, so the data stays sparse.
         """
         data = self.data
 
-        data = data.clip(min=0)
+        if sparse.issparse(data):
+            new = data.copy()
+            new.data = np.log10(new.data.clip(min=0))
+            self.data = new
+            return
 
-        self.data = np.log10(data)
+        self.data = clipped_log10(data, out=self._output())
 
     @sort_function_order
     @set_called
+    @dense_only
     def glog(self, lambd: float = 1.00e-09, data_0: float = 0) -> None:
         """
         Apply the generalized logarithm to the data.
@@ -97,11 +109,12 @@ class Standardisation(PreprocessingBaseClass):
         """
         data = self.data
 
-        new = np.log((data - data_0) + np.sqrt((data - data_0) ** 2 + lambd))
+        new = self._map_rows(glog, data, self._output(), lambd=lambd, data_0=data_0)
         self.data = new
 
     @sort_function_order
     @set_called
+    @dense_only
     def t2a(self) -> None:
         """
         Transform the data to absorbance values.
@@ -109,6 +122,6 @@ class Standardisation(PreprocessingBaseClass):
 
         data = self.data
 
-        new = np.log10(1 / data)
+        new = t2a(data, out=self._output())
 
         self.data = new
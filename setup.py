@@ -13,6 +13,7 @@ setup(
     install_requires=["pandas",
                       "numpy",
                       "scipy"],
+    extras_require={"hdf5": ["h5py"], "parquet": ["pyarrow"]},
 
 )
 